@@ -0,0 +1,69 @@
+# BACKEND/asignacion.py
+
+from django.db import transaction
+from django.utils import timezone
+
+from FRONTEND.models import Pedidos
+from BACKEND.bolsa import tipos_compatibles
+from BACKEND.estadisticas import registrar_cambio
+from BACKEND.eventos import publicar_evento_bolsa, publicar_eventos_bolsa
+
+
+def reclamar_pedido(pedido, conductor):
+    """
+    Asigna un pedido PENDIENTE al conductor con un único UPDATE condicional
+    (WHERE id=? AND estado='PENDIENTE'), que además copia la 'foto' del vehículo.
+
+    Si varios conductores aceptan a la vez, la base de datos serializa los UPDATE
+    sobre la fila y solo el primero la encuentra PENDIENTE. Devuelve True si este
+    conductor ganó el pedido; en ese caso 'pedido' queda actualizado en memoria.
+
+    Un pedido de una carga consolidada APROBADA no se reclama suelto: el conductor se lleva
+    todo el viaje (ver _reclamar_carga) o nada.
+    """
+    cambios = {
+        'estado': 'ASIGNADO',
+        'conductor': conductor,
+        'placas_asignadas': conductor.placas,
+        'marca_asignada': conductor.marca_vehiculo,
+        'referencia_asignada': conductor.referencia_vehiculo,
+        'tipo_vehiculo_asignado': conductor.tipo_vehiculo,
+        'fecha_actualizacion': timezone.now(),
+    }
+    with transaction.atomic():
+        carga = Pedidos.objects.filter(pk=pedido.pk, carga__estado='APROBADA').values_list(
+            'carga_id', 'carga__tipo_vehiculo').first()
+        if carga:
+            if not _reclamar_carga(*carga, conductor, cambios):
+                return False
+        else:
+            ganado = Pedidos.objects.filter(pk=pedido.pk, estado='PENDIENTE').update(**cambios)
+            if not ganado:
+                return False
+            # update() no dispara señales: se mantienen a mano los contadores y la bolsa en vivo
+            registrar_cambio('PEDIDOS', 'PENDIENTE', 'ASIGNADO')
+            publicar_evento_bolsa('TOMADO', pedido)
+
+    for campo, valor in cambios.items():
+        setattr(pedido, campo, valor)
+    pedido._clave_contada = 'ASIGNADO'
+    return True
+
+
+def _reclamar_carga(carga_id, tipo_vehiculo, conductor, cambios):
+    """
+    Asigna al conductor todos los pedidos de una carga aprobada, si su vehículo la lleva y
+    ninguno se ha tomado aún. Se ejecuta dentro de la transacción de reclamar_pedido.
+    """
+    if tipo_vehiculo not in tipos_compatibles(conductor.tipo_vehiculo):
+        return False
+    # Bloqueados hasta el commit: de dos conductores que reclaman el mismo viaje, el segundo
+    # espera y luego los encuentra ASIGNADOS
+    del_viaje = list(Pedidos.objects.select_for_update().filter(carga_id=carga_id).only('id', 'estado'))
+    if any(otro.estado != 'PENDIENTE' for otro in del_viaje):
+        return False
+    Pedidos.objects.filter(pk__in=[otro.pk for otro in del_viaje]).update(**cambios)
+    for _ in del_viaje:
+        registrar_cambio('PEDIDOS', 'PENDIENTE', 'ASIGNADO')
+    publicar_eventos_bolsa('TOMADO', del_viaje)
+    return True
@@ -1,11 +1,46 @@
 # BACKEND/backends.py
 
+import hashlib
+import uuid
+
 from django.contrib.auth.backends import BaseBackend 
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import router
 from django.db.models import Q 
 
+from FRONTEND.models import normalizar_email
+
 UserModel = get_user_model()
 
+# ============================================================
+# CACHÉ DEL USUARIO DE SESIÓN (entre peticiones)
+# ============================================================
+#
+# Dentro de una petición, AuthenticationMiddleware ya guarda request.user; esta caché
+# evita además la consulta del usuario en cada página vista.
+# Cada usuario tiene una "generación" (token aleatorio) que cambia al guardarlo o borrarlo
+# (ver BACKEND/signals.py). La fila se guarda junto con la generación con la que se leyó:
+# si una petición concurrente guardó una copia vieja, su generación ya no coincide y se ignora.
+
+USUARIO_CACHE_SEGUNDOS = 300
+_CAMPOS_USUARIO = [campo.attname for campo in UserModel._meta.concrete_fields]
+# Las columnas forman parte de la clave: tras una migración las copias con el esquema anterior no se usan
+_ESQUEMA = hashlib.sha1(','.join(_CAMPOS_USUARIO).encode()).hexdigest()[:8]
+
+
+def _clave_usuario(user_id):
+    return f'auth:usuario:{_ESQUEMA}:{user_id}'
+
+
+def _clave_generacion(user_id):
+    return f'auth:usuario:{user_id}:generacion'
+
+
+def invalidar_usuario_en_cache(user_id):
+    """Cambia la generación del usuario: las copias guardadas con la anterior dejan de servir."""
+    cache.set(_clave_generacion(user_id), uuid.uuid4().hex, None)
+
 class EmailAuthBackend(BaseBackend): 
     """
     Backend de autenticación personalizado, puro.
@@ -21,9 +56,8 @@ class EmailAuthBackend(BaseBackend):
             return None
         
         try:
-            # Buscar al usuario por el email (case-insensitive)
-            # Nota: Si usas Q, debes importar Q de django.db.models
-            user = UserModel.objects.get(email__iexact=email) 
+            # Buscar al usuario por el email normalizado (igualdad exacta sobre el índice único)
+            user = UserModel.objects.get(email_normalizado=normalizar_email(email))
         except UserModel.DoesNotExist:
             return None
 
@@ -42,8 +76,23 @@ class EmailAuthBackend(BaseBackend):
         return None
         
     def get_user(self, user_id):
-        """Método necesario para la gestión de sesiones."""
+        """Método necesario para la gestión de sesiones. Se sirve desde la caché mientras el usuario no cambie."""
+        clave, clave_generacion = _clave_usuario(user_id), _clave_generacion(user_id)
+        guardado = cache.get_many([clave, clave_generacion])
+        generacion, fila = guardado.get(clave_generacion), guardado.get(clave)
+        if generacion is not None and fila is not None and fila[0] == generacion:
+            return UserModel.from_db(router.db_for_read(UserModel), _CAMPOS_USUARIO, fila[1])
+
         try:
-            return UserModel.objects.get(pk=user_id)
+            user = UserModel.objects.get(pk=user_id)
         except UserModel.DoesNotExist:
-            return None
\ No newline at end of file
+            return None
+
+        if generacion is None:
+            # Primera vez (o caché vaciada): add() falla si otro proceso invalidó mientras tanto
+            generacion = uuid.uuid4().hex
+            if not cache.add(clave_generacion, generacion, None):
+                return user
+        valores = tuple(getattr(user, campo) for campo in _CAMPOS_USUARIO)
+        cache.set(clave, (generacion, valores), USUARIO_CACHE_SEGUNDOS)
+        return user
\ No newline at end of file
@@ -0,0 +1,119 @@
+# BACKEND/bolsa.py
+
+import heapq
+from itertools import islice
+
+from django.db.models import Q
+
+from BACKEND.distancias import motor_distancias
+from BACKEND.pagination import PAGE_SIZE_DEFAULT, KeysetPage, _parse_page_size, decode_cursor, encode_cursor
+from BACKEND.rutas import zona_actual_conductor
+from FRONTEND.models import CAPACIDAD_VEHICULO, CLASE_SIN_VEHICULO, Pedidos
+
+# Localidades que entran en la bolsa del conductor: a menos de esto por vía de donde está...
+RADIO_BOLSA_M = 12000
+# ...y como máximo estas, contando la propia (cada una suma una consulta por clase de vehículo)
+MAX_ZONAS_BOLSA = 4
+
+_CLASE_POR_TIPO = {tipo: clase for clase, (tipo, _, _) in enumerate(CAPACIDAD_VEHICULO)}
+
+
+def clase_de_carga(peso, volumen):
+    """Misma regla que la columna generada Pedidos.clase_carga, para pedidos aún sin guardar."""
+    for clase, (_, peso_maximo, volumen_maximo) in enumerate(CAPACIDAD_VEHICULO):
+        if peso <= peso_maximo and volumen <= volumen_maximo:
+            return clase
+    return CLASE_SIN_VEHICULO
+
+
+def clases_compatibles(tipo_vehiculo):
+    """Clases de carga que lleva el vehículo; ninguna si el conductor no ha registrado su vehículo."""
+    clase = _CLASE_POR_TIPO.get(tipo_vehiculo)
+    return [] if clase is None else list(range(clase + 1))
+
+
+def tipos_compatibles(tipo_vehiculo):
+    """Tipos de vehículo cuyas cargas consolidadas lleva el del conductor: el mismo y los más pequeños."""
+    return [CAPACIDAD_VEHICULO[clase][0] for clase in clases_compatibles(tipo_vehiculo)]
+
+
+def zonas_cercanas(zona):
+    """La localidad dada y sus vecinas más cercanas por vía dentro de RADIO_BOLSA_M."""
+    if zona is None:
+        return None
+    otras = sorted(
+        (motor_distancias.metros_entre_zonas(zona, otra), otra) for otra in range(motor_distancias.n) if otra != zona
+    )
+    return [zona] + [otra for metros, otra in otras if metros <= RADIO_BOLSA_M][:MAX_ZONAS_BOLSA - 1]
+
+
+def cubetas_conductor(conductor):
+    """
+    Zonas, clases y tipos de carga consolidada de la bolsa del conductor:
+    {'zonas': [...] o None, 'clases': [...], 'tipos': [...]}.
+    Sin posición GPS reciente 'zonas' es None y se muestran pendientes de toda la ciudad.
+    """
+    return {
+        'zonas': zonas_cercanas(zona_actual_conductor(conductor)),
+        'clases': clases_compatibles(conductor.tipo_vehiculo),
+        'tipos': tipos_compatibles(conductor.tipo_vehiculo),
+    }
+
+
+def _consultas_cubetas(cubetas):
+    # Los pedidos de una carga aprobada se reclaman juntos: solo los ven los vehículos que la llevan entera
+    pendientes = Pedidos.objects.filter(
+        Q(carga=None) | Q(carga__estado='PROPUESTA') | Q(carga__tipo_vehiculo__in=cubetas['tipos']),
+        estado='PENDIENTE',
+    )
+    if cubetas['zonas'] is None:
+        return [pendientes.filter(clase_carga=clase) for clase in cubetas['clases']]
+    # Los pedidos con dirección sin localidad reconocida se ofrecen a todos
+    return [
+        pendientes.filter(zona_origen=zona, clase_carga=clase)
+        for zona in cubetas['zonas'] + [None] for clase in cubetas['clases']
+    ]
+
+
+def paginar_bolsa(cubetas, request, page_size=None):
+    """
+    Pendientes que el conductor puede llevar y tiene cerca, del más reciente al más antiguo,
+    paginados por cursor (fecha_creacion, id) como paginar_por_cursor.
+
+    Cada cubeta (zona, clase) es un rango del índice pedido_bolsa_zona_idx del que se leen a lo
+    sumo size + 1 claves; se mezclan ya ordenadas y solo se cargan los pedidos de la página.
+    El costo depende del tamaño de página y del número de cubetas, no del tamaño de la bolsa.
+    """
+    size = _parse_page_size(request.GET.get("size"), default=page_size or PAGE_SIZE_DEFAULT)
+    after = decode_cursor(request.GET.get("after"))
+    before = decode_cursor(request.GET.get("before"))
+    consultas = _consultas_cubetas(cubetas)
+
+    if before and not after:
+        fecha, pk = before
+        claves = heapq.merge(*(
+            list(consulta.filter(Q(fecha_creacion__gt=fecha) | Q(fecha_creacion=fecha, id__gt=pk))
+                 .order_by('fecha_creacion', 'id').values_list('fecha_creacion', 'id')[:size + 1])
+            for consulta in consultas
+        ))
+        claves = list(islice(claves, size + 1))
+        has_prev, has_next = len(claves) > size, True
+        claves = claves[:size][::-1]
+    else:
+        if after:
+            fecha, pk = after
+            consultas = [consulta.filter(Q(fecha_creacion__lt=fecha) | Q(fecha_creacion=fecha, id__lt=pk))
+                         for consulta in consultas]
+        claves = heapq.merge(*(
+            list(consulta.order_by('-fecha_creacion', '-id').values_list('fecha_creacion', 'id')[:size + 1])
+            for consulta in consultas
+        ), reverse=True)
+        claves = list(islice(claves, size + 1))
+        has_next, has_prev = len(claves) > size, after is not None
+        claves = claves[:size]
+
+    pedidos = Pedidos.objects.in_bulk([pk for _, pk in claves])
+    items = [pedidos[pk] for _, pk in claves if pk in pedidos]
+    next_cursor = encode_cursor(*claves[-1]) if claves and has_next else None
+    prev_cursor = encode_cursor(*claves[0]) if claves and has_prev else None
+    return KeysetPage(items, request, size, next_cursor=next_cursor, prev_cursor=prev_cursor)
@@ -0,0 +1,192 @@
+# BACKEND/busqueda.py
+
+import base64
+import binascii
+import re
+
+from django.db.models import Case, F, IntegerField, Max, Q, Sum, Value, When
+
+from FRONTEND.models import Pedidos, TerminoPedido
+from BACKEND.distancias import normalizar_texto
+from BACKEND.pagination import PAGE_SIZE_DEFAULT, KeysetPage, _parse_page_size
+
+# Campos indexados y su peso en el puntaje
+PESOS_CAMPOS = (('origen', 2), ('destino', 2), ('observaciones', 1))
+LONGITUD_MAXIMA_TERMINO = 40
+# Palabras de más en la consulta se ignoran (cada una agrega una condición a la consulta)
+MAX_TERMINOS_CONSULTA = 8
+
+PALABRAS_VACIAS = frozenset(
+    'a al con de del el en la las lo los para por que se su un una y o'.split()
+)
+
+# BOCG-00042, bocg 42, BOCG42
+_CODIGO_PEDIDO = re.compile(r'\bBOCG[\s-]*0*(\d{1,9})\b', re.IGNORECASE)
+_PALABRA = re.compile(r'[a-z0-9]+')
+
+
+def tokenizar(texto):
+    """Palabras normalizadas (minúsculas, sin tildes) de un texto, sin palabras vacías."""
+    palabras = _PALABRA.findall(normalizar_texto(texto or '').lower())
+    return [
+        p[:LONGITUD_MAXIMA_TERMINO] for p in palabras
+        if p not in PALABRAS_VACIAS and (len(p) > 1 or p.isdigit())
+    ]
+
+
+def terminos_pedido(origen, destino, observaciones):
+    """{término: peso} de un pedido; una palabra repetida en varios campos suma sus pesos."""
+    valores = {'origen': origen, 'destino': destino, 'observaciones': observaciones}
+    terminos = {}
+    for campo, peso in PESOS_CAMPOS:
+        for termino in set(tokenizar(valores[campo])):
+            terminos[termino] = terminos.get(termino, 0) + peso
+    return terminos
+
+
+# ============================================================
+# 1. MANTENIMIENTO DEL ÍNDICE
+# ============================================================
+
+def texto_indexado(pedido):
+    """Lo que se indexó del pedido; None si algún campo se cargó diferido."""
+    valores = tuple(pedido.__dict__.get(campo) for campo, _ in PESOS_CAMPOS)
+    return None if None in valores else valores
+
+
+def indexar_pedidos(pedidos):
+    """Reemplaza los términos de los pedidos dados (ya guardados) en dos sentencias."""
+    pedidos = [p for p in pedidos if p.pk is not None]
+    if not pedidos:
+        return
+    TerminoPedido.objects.filter(pedido_id__in=[p.pk for p in pedidos]).delete()
+    TerminoPedido.objects.bulk_create([
+        TerminoPedido(termino=termino, pedido_id=pedido.pk, peso=peso)
+        for pedido in pedidos
+        for termino, peso in terminos_pedido(pedido.origen, pedido.destino, pedido.observaciones).items()
+    ], batch_size=1000)
+
+
+def reconstruir_indice(tamano_lote=1000):
+    """Indexa de nuevo todos los pedidos, por rangos de id. Devuelve cuántos pedidos procesó."""
+    total, ultimo_id = 0, 0
+    campos = ['id'] + [campo for campo, _ in PESOS_CAMPOS]
+    while True:
+        lote = list(Pedidos.objects.filter(id__gt=ultimo_id).order_by('id').only(*campos)[:tamano_lote])
+        if not lote:
+            return total
+        indexar_pedidos(lote)
+        total += len(lote)
+        ultimo_id = lote[-1].pk
+
+
+# ============================================================
+# 2. CONSULTA: CÓDIGO BOCG O PALABRAS, CON PUNTAJE
+# ============================================================
+
+def interpretar_consulta(texto):
+    """Separa la consulta en códigos de pedido (ids) y palabras."""
+    ids = [int(numero) for numero in _CODIGO_PEDIDO.findall(texto or '')]
+    palabras = list(dict.fromkeys(tokenizar(_CODIGO_PEDIDO.sub(' ', texto or ''))))[:MAX_TERMINOS_CONSULTA]
+    return ids, palabras
+
+
+def _condicion_prefijo(palabra):
+    """
+    termino empieza por 'palabra', como rango [palabra, siguiente) para que use el índice en
+    cualquier motor (LIKE 'x%' no lo usa en sqlite). Los términos solo tienen [0-9a-z], que se
+    ordenan igual en binario y en las intercalaciones de MySQL.
+    """
+    alfabeto = '0123456789abcdefghijklmnopqrstuvwxyz'
+    base = palabra.rstrip('z')
+    if not base:
+        return Q(termino__gte=palabra)
+    siguiente = base[:-1] + alfabeto[alfabeto.index(base[-1]) + 1]
+    return Q(termino__gte=palabra, termino__lt=siguiente)
+
+
+def _codificar(puntaje, pk):
+    return base64.urlsafe_b64encode(f"{puntaje}|{pk}".encode()).decode().rstrip("=")
+
+
+def _decodificar(token):
+    if not token:
+        return None
+    try:
+        puntaje, pk = base64.urlsafe_b64decode((token + "=" * (-len(token) % 4)).encode()).decode().split("|", 1)
+        return int(puntaje), int(pk)
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        return None
+
+
+def _coincidencias(palabras, pedidos):
+    """
+    (pedido_id, puntaje) de los pedidos que contienen todas las palabras (cada una como
+    prefijo de algún término). El puntaje suma los pesos y duplica las coincidencias exactas.
+    Una sola consulta agrupada sobre el índice (termino, pedido).
+    """
+    condiciones = [_condicion_prefijo(palabra) for palabra in palabras]
+    cualquiera = Q()
+    for condicion in condiciones:
+        cualquiera |= condicion
+
+    terminos = TerminoPedido.objects.filter(cualquiera)
+    if pedidos.query.has_filters():
+        # Solo lo que el usuario puede ver (minorista, conductor); el admin busca en todo
+        terminos = terminos.filter(pedido__in=pedidos.values('pk'))
+
+    return terminos.order_by().values('pedido_id').annotate(
+        palabras_encontradas=sum(
+            (Max(Case(When(condicion, then=Value(1)), default=Value(0), output_field=IntegerField()))
+             for condicion in condiciones),
+            Value(0),
+        ),
+        puntaje=Sum(Case(
+            When(termino__in=palabras, then=F('peso') * 2),
+            default=F('peso'),
+            output_field=IntegerField(),
+        )),
+    ).filter(palabras_encontradas=len(palabras))
+
+
+def buscar_pedidos(texto, pedidos, request, page_size=None):
+    """
+    Busca en 'pedidos' (queryset con los filtros de visibilidad y los select_related del listado)
+    por código BOCG o por palabras de origen, destino y observaciones.
+    Devuelve una KeysetPage ordenada por relevancia, paginada por cursor (puntaje, id) como los listados.
+    """
+    size = _parse_page_size(request.GET.get("size"), default=page_size or PAGE_SIZE_DEFAULT)
+    ids, palabras = interpretar_consulta(texto)
+
+    if ids:
+        # Un código identifica el pedido: no hace falta puntaje ni más páginas
+        encontrados = pedidos.in_bulk(ids[:size])
+        return KeysetPage([encontrados[pk] for pk in ids[:size] if pk in encontrados], request, size)
+    if not palabras:
+        return KeysetPage([], request, size)
+
+    resultados = _coincidencias(palabras, pedidos)
+    after = _decodificar(request.GET.get("after"))
+    before = _decodificar(request.GET.get("before"))
+
+    if before and not after:
+        puntaje, pk = before
+        filas = list(
+            resultados.filter(Q(puntaje__gt=puntaje) | Q(puntaje=puntaje, pedido_id__gt=pk))
+            .order_by('puntaje', 'pedido_id').values_list('pedido_id', 'puntaje')[:size + 1]
+        )
+        has_prev, has_next = len(filas) > size, True
+        filas = filas[:size][::-1]
+    else:
+        if after:
+            puntaje, pk = after
+            resultados = resultados.filter(Q(puntaje__lt=puntaje) | Q(puntaje=puntaje, pedido_id__lt=pk))
+        filas = list(resultados.order_by('-puntaje', '-pedido_id').values_list('pedido_id', 'puntaje')[:size + 1])
+        has_next, has_prev = len(filas) > size, after is not None
+        filas = filas[:size]
+
+    encontrados = pedidos.in_bulk([pk for pk, _ in filas])
+    items = [encontrados[pk] for pk, _ in filas if pk in encontrados]
+    next_cursor = _codificar(filas[-1][1], filas[-1][0]) if filas and has_next else None
+    prev_cursor = _codificar(filas[0][1], filas[0][0]) if filas and has_prev else None
+    return KeysetPage(items, request, size, next_cursor=next_cursor, prev_cursor=prev_cursor)
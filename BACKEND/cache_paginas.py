@@ -0,0 +1,85 @@
+# BACKEND/cache_paginas.py
+
+import re
+import uuid
+from functools import wraps
+
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.utils.functional import lazy
+
+# ============================================================
+# CACHÉ DE PÁGINAS ANÓNIMAS Y FRAGMENTOS DE LA INTERFAZ
+# ============================================================
+#
+# Las páginas públicas se guardan completas para los visitantes sin sesión; los encabezados,
+# menús y pies de página se guardan como fragmentos ({% cache %}) por rol y sección activa.
+# Todas las claves llevan una "generación" (token aleatorio): invalidar_cache_paginas() la
+# cambia y así descarta de una vez todo lo guardado (se llama tras migrate y con el comando
+# invalidar_cache_paginas después de cada despliegue).
+
+_CLAVE_GENERACION = 'paginas:generacion'
+# El token CSRF es de cada visitante: en la copia guardada se reemplaza por esta marca
+_MARCA_CSRF = '__csrf_por_peticion__'
+_INPUT_CSRF = re.compile(r'(name="csrfmiddlewaretoken" value=")[^"]*(")')
+
+
+def segundos_cache():
+    """Vigencia de páginas y fragmentos (settings.CACHE_PAGINAS_SEGUNDOS); 0 desactiva la caché."""
+    return getattr(settings, 'CACHE_PAGINAS_SEGUNDOS', 600)
+
+
+def generacion_paginas():
+    generacion = cache.get(_CLAVE_GENERACION)
+    if generacion is None:
+        generacion = uuid.uuid4().hex
+        if not cache.add(_CLAVE_GENERACION, generacion, None):
+            generacion = cache.get(_CLAVE_GENERACION)
+    return generacion
+
+
+def invalidar_cache_paginas(**kwargs):
+    """Descarta todas las páginas y fragmentos guardados. Sirve también como receptor de señales."""
+    cache.set(_CLAVE_GENERACION, uuid.uuid4().hex, None)
+
+
+def pagina_anonima(vista):
+    """
+    Guarda la respuesta de la vista para los visitantes sin sesión (GET sin parámetros y sin
+    mensajes pendientes) y la sirve sin volver a ejecutar la vista ni renderizar la plantilla.
+    Solo se guardan respuestas 200; los formularios reciben el token CSRF del visitante.
+    """
+    @wraps(vista)
+    def envoltura(request, *args, **kwargs):
+        segundos = segundos_cache()
+        if (not segundos or request.method not in ('GET', 'HEAD') or request.GET
+                or request.user.is_authenticated or len(messages.get_messages(request))):
+            return vista(request, *args, **kwargs)
+
+        clave = f'paginas:{generacion_paginas()}:{request.path}'
+        guardada = cache.get(clave)
+        if guardada is None:
+            response = vista(request, *args, **kwargs)
+            if response.status_code != 200 or response.streaming:
+                return response
+            contenido = _INPUT_CSRF.sub(rf'\g<1>{_MARCA_CSRF}\g<2>', response.content.decode(response.charset))
+            cache.set(clave, (contenido, response['Content-Type']), segundos)
+            return response
+
+        contenido, tipo = guardada
+        if _MARCA_CSRF in contenido:
+            contenido = contenido.replace(_MARCA_CSRF, get_token(request))
+        return HttpResponse(contenido, content_type=tipo)
+
+    return envoltura
+
+
+def fragmentos(request):
+    """
+    Procesador de contexto para {% cache cache_fragmentos.segundos nombre cache_fragmentos.version ... %}.
+    La versión se lee de la caché solo si la página tiene algún fragmento.
+    """
+    return {'cache_fragmentos': {'segundos': segundos_cache(), 'version': lazy(generacion_paginas, str)()}}
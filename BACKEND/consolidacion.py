@@ -0,0 +1,258 @@
+# BACKEND/consolidacion.py
+
+from decimal import Decimal
+
+from django.db import transaction
+
+from FRONTEND.models import CAPACIDAD_VEHICULO, DIMENSIONES_VEHICULO, CargaConsolidada, Pedidos
+
+# Holgura para comparar medidas en float (las medidas vienen con 2 decimales)
+EPS = 1e-6
+# Viajes con menos pedidos no son consolidación: cada pedido sigue en la bolsa por su cuenta
+MIN_PEDIDOS_CARGA = 2
+# Viajes en los que se busca hueco para cada pedido; al abrir uno más se cierra el más antiguo
+# (el más lleno). Acota el primer ajuste a O(pedidos × este valor) en orígenes con miles de pedidos.
+MAX_VIAJES_ABIERTOS = 100
+
+# (tipo, kg, largo, ancho, alto) del más pequeño al más grande
+VEHICULOS = tuple(
+    (tipo, float(peso), *(float(medida) for medida in DIMENSIONES_VEHICULO[tipo]))
+    for tipo, peso, _ in CAPACIDAD_VEHICULO
+)
+
+
+# ============================================================
+# 1. EMPAQUE HEURÍSTICO (peso + 3D) DE UN VIAJE
+# ============================================================
+# Las unidades de un pedido se apilan en columnas sin girarlas de pie (el alto sigue siendo el
+# alto) y cada columna ocupa en el piso un rectángulo largo × ancho, que sí puede girarse 90°.
+# Las columnas se acomodan en filas a lo ancho del vehículo, una detrás de otra a lo largo
+# (empaque por estantes): una fila tiene el fondo de su primera columna y recibe columnas de
+# igual o menor fondo mientras quede ancho. No se apilan pedidos distintos unos sobre otros.
+
+class _Viaje:
+    __slots__ = ('tipo', 'peso_max', 'largo', 'ancho', 'alto', 'pedidos', 'peso', 'volumen', 'filas', 'largo_usado',
+                 'hueco')
+
+    def __init__(self, vehiculo):
+        self.tipo, self.peso_max, self.largo, self.ancho, self.alto = vehiculo
+        self.pedidos = []
+        self.peso = 0.0
+        self.volumen = 0.0
+        self.filas = []  # [fondo, ancho ocupado]
+        self.largo_usado = 0.0
+        self.hueco = 0.0  # mayor cuadrado libre en una fila: min(fondo, ancho libre)
+
+    def agregar(self, pedido):
+        """Acomoda el pedido completo o no toca el viaje. Devuelve True si cupo."""
+        if self.peso + pedido['peso'] > self.peso_max + EPS or self.volumen + pedido['volumen'] > self._capacidad():
+            return False
+        if not self._tiene_piso(min(pedido['largo'], pedido['ancho'])):
+            return False
+        acomodo = self._acomodar(pedido)
+        if acomodo is None:
+            return False
+        self.filas, self.largo_usado = acomodo
+        # Sin filas si el pedido no trae unidades
+        self.hueco = max((min(fila[0], self.ancho - fila[1]) for fila in self.filas), default=0.0)
+        self.pedidos.append(pedido)
+        self.peso += pedido['peso']
+        self.volumen += pedido['volumen']
+        return True
+
+    def _capacidad(self):
+        return self.largo * self.ancho * self.alto + EPS
+
+    def _tiene_piso(self, lado):
+        # Descarte rápido: no cabe ni una columna con ese lado en una fila ni en una fila nueva
+        return self.hueco + EPS >= lado or self.largo_usado + lado <= self.largo + EPS
+
+    def cerrado(self, minimos):
+        """Ya no le cabe ningún pedido con el menor peso, volumen y lado de los que faltan."""
+        peso, volumen, lado = minimos
+        return (self.peso + peso > self.peso_max + EPS or self.volumen + volumen > self._capacidad()
+                or not self._tiene_piso(lado))
+
+    def _acomodar(self, pedido):
+        por_columna = int((self.alto + EPS) // pedido['alto'])
+        if por_columna == 0:
+            return None
+        pendientes = -(-pedido['unidades'] // por_columna)
+        lado_mayor, lado_menor = max(pedido['largo'], pedido['ancho']), min(pedido['largo'], pedido['ancho'])
+        # (ancho que ocupa en la fila, fondo): primero el giro que gasta menos fondo
+        giros = ((lado_mayor, lado_menor), (lado_menor, lado_mayor))
+        filas = [fila[:] for fila in self.filas]
+        largo_usado = self.largo_usado
+
+        for fila in filas:
+            for ancho, fondo in giros:
+                caben = int((self.ancho - fila[1] + EPS) // ancho) if fondo <= fila[0] + EPS else 0
+                if caben:
+                    puestas = min(caben, pendientes)
+                    fila[1] += puestas * ancho
+                    pendientes -= puestas
+                    break
+            if not pendientes:
+                return filas, largo_usado
+
+        while pendientes:
+            for ancho, fondo in giros:
+                if ancho <= self.ancho + EPS and largo_usado + fondo <= self.largo + EPS:
+                    puestas = min(int((self.ancho + EPS) // ancho), pendientes)
+                    filas.append([fondo, puestas * ancho])
+                    largo_usado += fondo
+                    pendientes -= puestas
+                    break
+            else:
+                return None
+        return filas, largo_usado
+
+
+def _cabe_en(vehiculo, pedidos):
+    viaje = _Viaje(vehiculo)
+    return viaje if all(viaje.agregar(pedido) for pedido in pedidos) else None
+
+
+def consolidar(pedidos):
+    """
+    Reparte los pedidos (dicts con id, peso, volumen, unidades, largo, ancho, alto en kg y m)
+    en viajes. Primer ajuste decreciente por volumen con el vehículo más grande; después cada
+    viaje baja al vehículo más pequeño en que caben sus pedidos.
+    Devuelve (viajes, sin_vehiculo): viajes = [{'tipo_vehiculo', 'pedidos', 'peso', 'volumen', 'ocupacion'}]
+    con 'pedidos' la lista de ids y 'ocupacion' el % del espacio de carga; sin_vehiculo = ids que no caben en ninguno.
+    """
+    if not pedidos:
+        return [], []
+    mayor = VEHICULOS[-1]
+    # Los viajes a los que ya no les cabe ni el pedido más pequeño salen de la búsqueda
+    minimos = (
+        min(p['peso'] for p in pedidos),
+        min(p['volumen'] for p in pedidos),
+        min(min(p['largo'], p['ancho']) for p in pedidos),
+    )
+    abiertos, llenos, sin_vehiculo = [], [], []
+    for pedido in sorted(pedidos, key=lambda p: (-p['volumen'], -p['peso'], p['id'])):
+        destino = next((viaje for viaje in abiertos if viaje.agregar(pedido)), None)
+        if destino is None:
+            destino = _Viaje(mayor)
+            if not destino.agregar(pedido):
+                sin_vehiculo.append(pedido['id'])
+                continue
+            abiertos.append(destino)
+            if len(abiertos) > MAX_VIAJES_ABIERTOS:
+                llenos.append(abiertos.pop(0))
+        if destino.cerrado(minimos):
+            abiertos.remove(destino)
+            llenos.append(destino)
+
+    viajes = []
+    for viaje in sorted(llenos + abiertos, key=lambda v: v.pedidos[0]['id']):
+        for vehiculo in VEHICULOS[:-1]:
+            menor = _cabe_en(vehiculo, viaje.pedidos)
+            if menor is not None:
+                viaje = menor
+                break
+        viajes.append({
+            'tipo_vehiculo': viaje.tipo,
+            'pedidos': [pedido['id'] for pedido in viaje.pedidos],
+            'peso': viaje.peso,
+            'volumen': viaje.volumen,
+            'ocupacion': 100 * viaje.volumen / (viaje.largo * viaje.ancho * viaje.alto),
+        })
+    return viajes, sin_vehiculo
+
+
+# ============================================================
+# 2. PROPUESTAS DEL DÍA Y APROBACIÓN DEL ADMIN
+# ============================================================
+
+def _clave_origen(origen):
+    # El origen es la dirección del mayorista copiada al crear el pedido
+    return ' '.join((origen or '').lower().split())
+
+
+def pedidos_consolidables(fecha):
+    """Pendientes del día sin carga, como dicts para consolidar(), agrupados por origen."""
+    grupos = {}
+    filas = Pedidos.objects.filter(estado='PENDIENTE', fecha_recoleccion=fecha, carga__isnull=True).order_by('id').values(
+        'id', 'origen', 'peso_total', 'unidades', 'largo', 'ancho', 'alto',
+    )
+    for fila in filas:
+        largo, ancho, alto = float(fila['largo']), float(fila['ancho']), float(fila['alto'])
+        # Sin medidas o sin unidades no hay nada que acomodar
+        if min(largo, ancho, alto) <= 0 or fila['unidades'] <= 0:
+            continue
+        grupo = grupos.setdefault(_clave_origen(fila['origen']), {'origen': fila['origen'], 'pedidos': []})
+        grupo['pedidos'].append({
+            'id': fila['id'],
+            'peso': float(fila['peso_total']),
+            # El volumen sale de las dimensiones: el campo 'volumen' del pedido puede venir del peso
+            'volumen': fila['unidades'] * largo * ancho * alto,
+            'unidades': fila['unidades'],
+            'largo': largo,
+            'ancho': ancho,
+            'alto': alto,
+        })
+    return list(grupos.values())
+
+
+def proponer_cargas(fecha):
+    """
+    Recalcula las cargas PROPUESTAS del día: descarta las anteriores sin aprobar y consolida los
+    pendientes por origen. Las cargas APROBADAS y sus pedidos no se tocan.
+    Devuelve {'cargas', 'pedidos', 'sin_vehiculo', 'viajes_ahorrados'}.
+    """
+    resumen = {'cargas': 0, 'pedidos': 0, 'sin_vehiculo': 0, 'viajes_ahorrados': 0}
+    with transaction.atomic():
+        # Sus pedidos quedan sin carga (on_delete=SET_NULL)
+        CargaConsolidada.objects.filter(fecha_recoleccion=fecha, estado='PROPUESTA').delete()
+
+        for grupo in pedidos_consolidables(fecha):
+            viajes, sin_vehiculo = consolidar(grupo['pedidos'])
+            resumen['sin_vehiculo'] += len(sin_vehiculo)
+            for viaje in viajes:
+                if len(viaje['pedidos']) < MIN_PEDIDOS_CARGA:
+                    continue
+                carga = CargaConsolidada.objects.create(
+                    fecha_recoleccion=fecha,
+                    origen=grupo['origen'],
+                    tipo_vehiculo=viaje['tipo_vehiculo'],
+                    peso_total=Decimal(viaje['peso']).quantize(Decimal('0.01')),
+                    volumen=Decimal(viaje['volumen']).quantize(Decimal('0.01')),
+                    ocupacion=Decimal(viaje['ocupacion']).quantize(Decimal('0.01')),
+                )
+                Pedidos.objects.filter(pk__in=viaje['pedidos']).update(carga=carga)
+                resumen['cargas'] += 1
+                resumen['pedidos'] += len(viaje['pedidos'])
+                resumen['viajes_ahorrados'] += len(viaje['pedidos']) - 1
+    return resumen
+
+
+def aprobar_carga(carga):
+    """
+    Pasa la carga de PROPUESTA a APROBADA si todos sus pedidos siguen PENDIENTES.
+    Devuelve False si ya no es propuesta o algún pedido cambió desde que se propuso.
+    """
+    with transaction.atomic():
+        # Primero la carga y después sus pedidos, en el mismo orden que proponer_cargas y descartar_carga
+        aprobada = CargaConsolidada.objects.filter(pk=carga.pk, estado='PROPUESTA').update(estado='APROBADA')
+        if aprobada:
+            # Bloqueados hasta el commit: un conductor no puede reclamar uno entre la revisión y la aprobación
+            estados = Pedidos.objects.select_for_update().filter(carga=carga).values_list('estado', flat=True)
+            if any(estado != 'PENDIENTE' for estado in estados):
+                transaction.set_rollback(True)
+                return False
+    if aprobada:
+        carga.estado = 'APROBADA'
+    return bool(aprobada)
+
+
+def descartar_carga(carga):
+    """Descarta una carga propuesta y devuelve sus pedidos a la consolidación del día."""
+    with transaction.atomic():
+        descartada = CargaConsolidada.objects.filter(pk=carga.pk, estado='PROPUESTA').update(estado='DESCARTADA')
+        if descartada:
+            Pedidos.objects.filter(carga=carga).update(carga=None)
+    if descartada:
+        carga.estado = 'DESCARTADA'
+    return bool(descartada)
@@ -0,0 +1,88 @@
+# BACKEND/correos.py
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import connection, transaction
+from django.utils import timezone
+
+from FRONTEND.models import EmailOutbox
+
+# Reintentos con espera exponencial: 1, 2, 4, 8... minutos (máximo 1 hora)
+MAX_INTENTOS = 6
+ESPERA_BASE_SEGUNDOS = 60
+ESPERA_MAXIMA_SEGUNDOS = 3600
+
+
+def encolar_correo(asunto, cuerpo, destinatario):
+    """
+    Guarda el correo en la bandeja de salida. Llamarlo dentro de la transacción del
+    cambio de estado: si la transacción se revierte, el correo tampoco se envía.
+    """
+    return EmailOutbox.objects.create(destinatario=destinatario, asunto=asunto, cuerpo=cuerpo)
+
+
+def calcular_espera(intentos):
+    return timedelta(seconds=min(ESPERA_BASE_SEGUNDOS * 2 ** (intentos - 1), ESPERA_MAXIMA_SEGUNDOS))
+
+
+def _lote_pendiente(tamano):
+    pendientes = EmailOutbox.objects.filter(estado='PENDIENTE', proximo_intento__lte=timezone.now()).order_by('id')
+    if connection.features.has_select_for_update_skip_locked:
+        # Varios workers pueden drenar la cola en paralelo sin tomar los mismos correos
+        pendientes = pendientes.select_for_update(skip_locked=True)
+    return list(pendientes[:tamano])
+
+
+def enviar_lote(tamano=100):
+    """
+    Envía hasta 'tamano' correos pendientes reutilizando una sola conexión del EMAIL_BACKEND.
+    Devuelve (enviados, fallidos).
+    """
+    enviados = fallidos = 0
+    with transaction.atomic():
+        lote = _lote_pendiente(tamano)
+        if not lote:
+            return 0, 0
+
+        conexion = get_connection(fail_silently=False)
+        try:
+            conexion.open()
+            error_conexion = None
+        except Exception as e:
+            # Servidor SMTP caído: todo el lote se reprograma sin intentar mensaje por mensaje
+            error_conexion = e
+
+        try:
+            for correo in lote:
+                correo.intentos += 1
+                try:
+                    if error_conexion:
+                        raise error_conexion
+                    EmailMessage(
+                        subject=correo.asunto,
+                        body=correo.cuerpo,
+                        from_email=settings.DEFAULT_FROM_EMAIL,
+                        to=[correo.destinatario],
+                        connection=conexion,
+                    ).send()
+                except Exception as e:
+                    correo.ultimo_error = str(e)[:1000]
+                    if correo.intentos >= MAX_INTENTOS:
+                        correo.estado = 'FALLIDO'
+                    else:
+                        correo.proximo_intento = timezone.now() + calcular_espera(correo.intentos)
+                    fallidos += 1
+                else:
+                    correo.estado = 'ENVIADO'
+                    correo.fecha_envio = timezone.now()
+                    correo.ultimo_error = ''
+                    enviados += 1
+        finally:
+            conexion.close()
+
+        EmailOutbox.objects.bulk_update(
+            lote, ['estado', 'intentos', 'proximo_intento', 'ultimo_error', 'fecha_envio']
+        )
+    return enviados, fallidos
@@ -0,0 +1,300 @@
+# BACKEND/cotizacion.py
+
+import math
+from decimal import Decimal
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - sin NumPy el lote cotiza fila por fila
+    np = None
+
+from BACKEND.distancias import factor_distancia as factor_de_ruta
+
+
+# ============================================================
+# CONSTANTES DE CÁLCULO (Deben coincidir con las del JS)
+# ============================================================
+
+BASE_RATE_COP = Decimal(15000)
+WEIGHT_COST_PER_KG_COP = Decimal(1200)
+VOLUME_COST_PER_M3_COP = Decimal(80000)
+MIN_VALOR_DECLARADO = Decimal(100000)
+
+# CORRECCIÓN: Factores de riesgo de mercancía completos y normalizados
+RISK_FACTOR_MAP = {
+    'PERECEDEROS': Decimal('1.10'),
+    'REFRIGERADOS': Decimal('1.15'),
+    'CONTROLADOS': Decimal('1.25'),
+    'PELIGROSOS': Decimal('1.30'),
+    'FRAGIL': Decimal('1.10'),
+    'VOLUMINOSO': Decimal('1.05'),
+    'PESADO': Decimal('1.05'),
+    'SECAS': Decimal('1.0'),
+    'BEBIDAS': Decimal('1.05'),
+    'EMPAQUETADOS': Decimal('1.0'),
+    'ALIMENTOS_PROCESADOS': Decimal('1.05'),
+    'ELECTRONICOS': Decimal('1.10'),
+    'REPUESTOS': Decimal('1.05'),
+    'MUEBLES': Decimal('1.05'),
+    'DECORACION': Decimal('1.05'),
+    'TEXTIL': Decimal('1.0'),
+    'ROPA': Decimal('1.0'),
+    'PRENDAS': Decimal('1.0'),
+    'FARMACEUTICOS': Decimal('1.15'),
+    'HERRAMIENTAS': Decimal('1.05'),
+    'MATERIALES': Decimal('1.05'),
+    'VIDRIO': Decimal('1.10'),
+    'PLASTICOS': Decimal('1.0'),
+    'ENVASES': Decimal('1.0'),
+    'BATERIAS': Decimal('1.20'),
+    'CONGELADOS': Decimal('1.15'),
+    'GRANEL': Decimal('1.05'),
+    'PAPEL': Decimal('1.0'),
+    'CARTON': Decimal('1.0'),
+    'QUIMICOS': Decimal('1.25'),
+    'LIQUIDOS': Decimal('1.10'),
+    'DEPORTIVO': Decimal('1.05'),
+}
+
+
+class EnvioInvalido(ValueError):
+    """Un dato del envío no es un número finito o el precio se sale de rango. 'indice' es su posición en el lote."""
+
+    def __init__(self, mensaje, indice=None):
+        super().__init__(mensaje)
+        self.indice = indice
+
+
+def _safe_decimal_conversion(value, default_val=Decimal(0)):
+    """Convierte un valor a Decimal de forma segura, usando un valor por defecto en caso de error o None/vacio."""
+    try:
+        if value is None or str(value).strip() == '':
+            return default_val
+        return Decimal(value)
+    except Exception:
+        return default_val
+
+
+def _decimal_finito(data, campo, default_val):
+    """Como _safe_decimal_conversion, pero NaN, Infinity o un valor que float no representa son un error."""
+    valor = _safe_decimal_conversion(data.get(campo), default_val=default_val)
+    if not (valor.is_finite() and math.isfinite(valor)):
+        raise EnvioInvalido(f"'{campo}' debe ser un número finito.")
+    return valor
+
+
+# ============================================================
+# 1. COTIZACIÓN DE UN ENVÍO (referencia exacta en Decimal)
+# ============================================================
+
+def calcular_precio_envio(data, factor_distancia=None):
+    """
+    Calcula el precio del envío en el servidor de forma segura y devuelve el precio y el volumen calculado.
+    Si no se indica 'factor_distancia' se obtiene de la distancia por vía entre 'origen' y 'destino'.
+    """
+
+    # 1. Extracción de datos y conversión segura a Decimal
+    peso = _decimal_finito(data, 'peso_total', Decimal(0))
+    unidades = _decimal_finito(data, 'unidades', Decimal(1))
+
+    # Usar un mínimo de 0.01 metros (1cm) para evitar volumen cero
+    largo = _decimal_finito(data, 'largo', Decimal('0.01'))
+    alto = _decimal_finito(data, 'alto', Decimal('0.01'))
+    ancho = _decimal_finito(data, 'ancho', Decimal('0.01'))
+
+    # Aseguramos que el tipo de mercancía siempre sea uppercase para el lookup
+    tipo_mercancia = data.get('tipo_mercancia', 'SECAS').upper()
+
+    # Factor de Distancia según la red vial local (repetible: misma ruta, mismo precio)
+    if factor_distancia is None:
+        factor_distancia = factor_de_ruta(data.get('origen'), data.get('destino'))
+    distance_factor = Decimal(factor_distancia).quantize(Decimal('0.01'))
+
+    # 2. Cálculos de Costo
+    try:
+        # Calcular volumen total (Largo * Alto * Ancho * Unidades)
+        volumen_total = (largo * alto * ancho * unidades).quantize(Decimal('0.01'))
+
+        total_cost = BASE_RATE_COP
+
+        # Costo por peso (por kg)
+        total_cost += peso * WEIGHT_COST_PER_KG_COP
+
+        # Costo por volumen (por m³)
+        total_cost += volumen_total * VOLUME_COST_PER_M3_COP
+
+        # Factor de riesgo
+        risk_factor = RISK_FACTOR_MAP.get(tipo_mercancia, Decimal('1.0'))
+        total_cost *= risk_factor
+
+        # Factor de distancia (simulación)
+        total_cost *= distance_factor
+
+        # 3. Redondeo al 500 más cercano (COP)
+        rounded_price = Decimal(math.ceil(float(total_cost) / 500) * 500).quantize(Decimal('0'))
+    except ArithmeticError:
+        # Cada dato es finito, pero el volumen o el precio no caben en Decimal o en float
+        raise EnvioInvalido("Las medidas o el peso dan un precio fuera de rango.")
+
+    if rounded_price < BASE_RATE_COP:
+        rounded_price = BASE_RATE_COP
+
+    # Devolvemos el precio y el volumen calculado
+    return rounded_price, volumen_total
+
+
+# ============================================================
+# 2. COTIZACIÓN POR LOTES (vectorizada con NumPy)
+# ============================================================
+#
+# El lote calcula en float64 con enteros escalados (volumen en centésimas de m³,
+# factores en centésimas) y solo difiere del cálculo en Decimal cuando un valor cae
+# justo en un borde de redondeo. Esas filas (y las que traen datos que float no
+# interpreta igual que Decimal) se recalculan con calcular_precio_envio, así que
+# el resultado coincide exactamente con la función escalar.
+
+# Margen relativo para considerar que un valor está "en el borde" del redondeo.
+# El error de float64 en estas operaciones es del orden de 1e-15.
+TOLERANCIA_BORDE = 1e-9
+# Por encima de esto float64 ya no representa los enteros con exactitud
+MAGNITUD_MAXIMA = 1e12
+
+_RIESGO_CENTESIMAS = {tipo: int(factor * 100) for tipo, factor in RISK_FACTOR_MAP.items()}
+_CAMPOS_LOTE = (
+    ('peso_total', 0.0),
+    ('unidades', 1.0),
+    ('largo', 0.01),
+    ('alto', 0.01),
+    ('ancho', 0.01),
+)
+
+
+def _a_float(valor, defecto):
+    """Versión float de _safe_decimal_conversion. Devuelve None si el valor necesita la ruta en Decimal."""
+    if valor is None:
+        return defecto
+    tipo = type(valor)
+    if tipo is str and valor.strip() == '':
+        return defecto
+    if tipo is float or tipo is int or tipo is Decimal or tipo is str:
+        try:
+            numero = float(valor)
+        except (ValueError, OverflowError):
+            return None
+        # NaN, Infinity y lo que float no representa van a la ruta en Decimal, que los rechaza
+        return numero if math.isfinite(numero) else None
+    return None
+
+
+_TIPOS_NUMERICOS = {float, int, str, Decimal}
+
+
+def _columna(especificaciones, campo, defecto, irregular):
+    """
+    Extrae un campo de todos los envíos como arreglo float64. Camino rápido: una sola
+    conversión de la columna completa; si hay vacíos o tipos raros se va valor por valor
+    y marca en 'irregular' las filas que deben cotizarse en Decimal.
+    """
+    valores = [data.get(campo, defecto) for data in especificaciones]
+    if set(map(type, valores)) <= _TIPOS_NUMERICOS:
+        try:
+            columna = np.array(list(map(float, valores)), dtype=np.float64)
+        except (ValueError, OverflowError):
+            pass
+        else:
+            irregular |= ~np.isfinite(columna)
+            return columna
+    columna = np.empty(len(valores), dtype=np.float64)
+    for i, valor in enumerate(valores):
+        valor = _a_float(valor, defecto)
+        if valor is None:
+            irregular[i] = True
+            valor = 0.0
+        columna[i] = valor
+    return columna
+
+
+def _en_borde(x, escala):
+    """True donde x está a menos de TOLERANCIA_BORDE (relativa a 'escala') de un punto de corte."""
+    return np.abs(x) <= TOLERANCIA_BORDE * np.maximum(escala, 1.0)
+
+
+def _factores_distancia(especificaciones, factores_distancia):
+    if factores_distancia is None:
+        return [factor_de_ruta(data.get('origen'), data.get('destino')) for data in especificaciones]
+    factores = list(factores_distancia)
+    if len(factores) != len(especificaciones):
+        raise ValueError("Se esperaba un factor de distancia por envío.")
+    return factores
+
+
+def cotizar_lote(especificaciones, factores_distancia=None):
+    """
+    Cotiza una lista de envíos (dicts con los mismos campos que calcular_precio_envio).
+    Devuelve (precios, volumenes): listas de enteros con el precio en COP y el volumen
+    en centésimas de m³, fila por fila idénticos a calcular_precio_envio.
+    Lanza EnvioInvalido con el 'indice' del primer envío que calcular_precio_envio rechaza.
+    """
+    especificaciones = list(especificaciones)
+    factores = _factores_distancia(especificaciones, factores_distancia)
+    if np is None:
+        return _cotizar_fila_por_fila(especificaciones, factores, range(len(especificaciones)))
+
+    n = len(especificaciones)
+    irregular = np.zeros(n, dtype=bool)
+    columnas = [_columna(especificaciones, campo, defecto, irregular) for campo, defecto in _CAMPOS_LOTE]
+    riesgo = np.array(
+        [_RIESGO_CENTESIMAS.get(data.get('tipo_mercancia', 'SECAS').upper(), 100) for data in especificaciones],
+        dtype=np.float64,
+    )
+
+    with np.errstate(all='ignore'):
+        peso, unidades, largo, alto, ancho = columnas
+
+        # Factor de distancia en centésimas (quantize a 0.01)
+        distancia = np.asarray(factores, dtype=np.float64) * 100
+        en_borde = _en_borde(distancia - np.floor(distancia) - 0.5, np.abs(distancia))
+        distancia = np.rint(distancia)
+
+        # Volumen en centésimas de m³ (quantize a 0.01, mitad al par)
+        volumen = largo * alto * ancho * unidades * 100
+        en_borde |= _en_borde(volumen - np.floor(volumen) - 0.5, np.abs(volumen))
+        volumen = np.rint(volumen)
+
+        # Costo / 500 con los factores en centésimas: base * riesgo/100 * distancia/100 / 500
+        base = float(BASE_RATE_COP) + peso * float(WEIGHT_COST_PER_KG_COP) + volumen * float(VOLUME_COST_PER_M3_COP / 100)
+        escala = float(BASE_RATE_COP) + np.abs(peso) * float(WEIGHT_COST_PER_KG_COP) + np.abs(volumen) * float(VOLUME_COST_PER_M3_COP / 100)
+        divisor = 100 * 100 * 500
+        bloques = base * riesgo * distancia / divisor
+        en_borde |= _en_borde(bloques - np.rint(bloques), escala * riesgo * np.abs(distancia) / divisor)
+
+        fuera_de_rango = ~(np.isfinite(bloques) & np.isfinite(volumen))
+        fuera_de_rango |= (np.abs(bloques) > MAGNITUD_MAXIMA) | (np.abs(volumen) > MAGNITUD_MAXIMA)
+        revisar = irregular | en_borde | fuera_de_rango
+
+        bloques[fuera_de_rango] = 0
+        volumen[fuera_de_rango] = 0
+        precios = np.maximum(np.ceil(bloques) * 500, float(BASE_RATE_COP)).astype(np.int64).tolist()
+        volumenes = volumen.astype(np.int64).tolist()
+
+    # Filas dudosas: se recalculan con la referencia en Decimal
+    pendientes = np.flatnonzero(revisar).tolist()
+    if pendientes:
+        precios_exactos, volumenes_exactos = _cotizar_fila_por_fila(especificaciones, factores, pendientes)
+        for i, precio, volumen_exacto in zip(pendientes, precios_exactos, volumenes_exactos):
+            precios[i] = precio
+            volumenes[i] = volumen_exacto
+    return precios, volumenes
+
+
+def _cotizar_fila_por_fila(especificaciones, factores, indices):
+    precios, volumenes = [], []
+    for i in indices:
+        try:
+            precio, volumen = calcular_precio_envio(especificaciones[i], factores[i])
+        except EnvioInvalido as e:
+            e.indice = i
+            raise
+        precios.append(int(precio))
+        volumenes.append(int(volumen.scaleb(2)))
+    return precios, volumenes
@@ -0,0 +1,211 @@
+# BACKEND/distancias.py
+
+from array import array
+import hashlib
+import heapq
+import json
+import math
+import mmap
+import os
+import re
+import struct
+import tempfile
+import threading
+import unicodedata
+from decimal import Decimal
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+
+# Red vial de Bogotá por localidades, versionada con el repositorio
+RUTA_RED_VIAL = Path(__file__).resolve().parent / 'datos' / 'red_vial_bogota.json'
+
+# Formato del archivo de caché: cabecera + matriz n×n de distancias en metros (uint32 nativo)
+_MAGIA = b'BGCD'
+_VERSION = 1
+_CABECERA = struct.Struct('<4sHH32s')  # magia, versión, n, sha256 de la red
+
+# El factor de distancia conserva el rango que simulaba el JS (1.0 a 1.5):
+# 1.0 para recorridos cortos y 1.5 desde DISTANCIA_FACTOR_MAXIMO_KM en adelante.
+FACTOR_MINIMO = Decimal('1.0')
+FACTOR_MAXIMO = Decimal('1.5')
+DISTANCIA_FACTOR_MAXIMO_KM = Decimal(40)
+# Si no se reconoce la localidad de origen o destino se cobra el punto medio
+FACTOR_SIN_RUTA = Decimal('1.25')
+
+
+def normalizar_texto(texto):
+    """Mayúsculas y sin tildes, para comparar direcciones con los nombres de las localidades."""
+    texto = unicodedata.normalize('NFKD', texto)
+    return ''.join(c for c in texto if not unicodedata.combining(c)).upper()
+
+
+def _matriz_mas_corta(n, tramos):
+    """Dijkstra desde cada zona sobre la red no dirigida. Devuelve la matriz n×n en metros."""
+    vecinos = [[] for _ in range(n)]
+    for a, b, metros in tramos:
+        vecinos[a].append((b, metros))
+        vecinos[b].append((a, metros))
+
+    infinito = 2 ** 32 - 1
+    matriz = []
+    for origen in range(n):
+        distancias = [infinito] * n
+        distancias[origen] = 0
+        cola = [(0, origen)]
+        while cola:
+            d, zona = heapq.heappop(cola)
+            if d > distancias[zona]:
+                continue
+            for vecino, metros in vecinos[zona]:
+                if d + metros < distancias[vecino]:
+                    distancias[vecino] = d + metros
+                    heapq.heappush(cola, (d + metros, vecino))
+        matriz.extend(distancias)
+    return matriz
+
+
+class MotorDistancias:
+    """
+    Distancias por vía entre zonas (localidades) de Bogotá, sin llamadas de red.
+
+    La red vial (JSON) se reduce una sola vez a una matriz zona-a-zona que se guarda
+    en un archivo binario y se lee con mmap: todos los procesos del servidor comparten
+    las mismas páginas en memoria. El nombre del archivo incluye el hash de la red,
+    así que al cambiar la red la caché se reconstruye sola.
+    """
+
+    def __init__(self, ruta_red=RUTA_RED_VIAL, ruta_cache=None):
+        self.ruta_red = Path(ruta_red)
+        self.ruta_cache = ruta_cache
+        self._lock = threading.Lock()
+        self._cargado = False
+
+    # --- Carga ---
+
+    def _cargar(self):
+        with self._lock:
+            if self._cargado:
+                return
+            contenido = self.ruta_red.read_bytes()
+            red = json.loads(contenido)
+            huella = hashlib.sha256(contenido).digest()
+
+            localidades = red['localidades']
+            self.n = len(localidades)
+            self.nombres = [loc['nombre'] for loc in localidades]
+            indice_por_id = {loc['id']: i for i, loc in enumerate(localidades)}
+            # Recorrido típico dentro de la misma localidad
+            self.radios_m = [int(loc['radio_km'] * 1000) for loc in localidades]
+            self.centroides = [(loc['lat'], loc['lon']) for loc in localidades]
+
+            # Alias más largos primero: 'CIUDAD BOLIVAR' antes que cualquier alias corto
+            alias = sorted(
+                ((normalizar_texto(a), i) for i, loc in enumerate(localidades) for a in [loc['nombre']] + loc.get('alias', [])),
+                key=lambda par: -len(par[0]),
+            )
+            self._zona_por_alias = dict(alias)
+            self._patron = re.compile(r'\b(' + '|'.join(re.escape(a) for a, _ in alias) + r')\b')
+
+            ruta = Path(self.ruta_cache or getattr(settings, 'DISTANCIAS_CACHE', None) or
+                        Path(tempfile.gettempdir()) / f'bogocargo_distancias_{huella.hex()[:16]}.bin')
+            if not self._cache_valida(ruta, huella):
+                tramos = [(indice_por_id[a], indice_por_id[b], int(km * 1000)) for a, b, km in red['tramos']]
+                self._escribir_cache(ruta, huella, _matriz_mas_corta(self.n, tramos))
+
+            with open(ruta, 'rb') as archivo:
+                self._mmap = mmap.mmap(archivo.fileno(), 0, access=mmap.ACCESS_READ)
+            self._vista = memoryview(self._mmap)
+            self._matriz = self._vista[_CABECERA.size:].cast('I')
+            self.ruta_cache_usada = ruta
+            self._cargado = True
+
+    def _cache_valida(self, ruta, huella):
+        try:
+            with open(ruta, 'rb') as archivo:
+                magia, version, n, huella_cache = _CABECERA.unpack(archivo.read(_CABECERA.size))
+            return (magia, version, n, huella_cache) == (_MAGIA, _VERSION, self.n, huella) and \
+                os.path.getsize(ruta) == _CABECERA.size + 4 * self.n * self.n
+        except (OSError, struct.error):
+            return False
+
+    def _escribir_cache(self, ruta, huella, matriz):
+        # Escritura atómica: otro proceso nunca ve un archivo a medio escribir
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+        fd, temporal = tempfile.mkstemp(dir=ruta.parent, prefix=ruta.name, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as archivo:
+            archivo.write(_CABECERA.pack(_MAGIA, _VERSION, self.n, huella))
+            array('I', matriz).tofile(archivo)
+        os.replace(temporal, ruta)
+
+    def reconstruir(self):
+        """Fuerza el recálculo de la matriz (p. ej. tras editar la red vial)."""
+        self._cargar()
+        with self._lock:
+            self._matriz.release()
+            self._vista.release()
+            self._mmap.close()
+            os.remove(self.ruta_cache_usada)
+            self._cargado = False
+        self._zona_de_texto.cache_clear()
+        self._cargar()
+
+    # --- Consultas ---
+
+    def zona(self, direccion):
+        """Índice de la localidad mencionada en la dirección, o None si no se reconoce."""
+        if not self._cargado:
+            self._cargar()
+        if not isinstance(direccion, str):
+            return None
+        return self._zona_de_texto(direccion)
+
+    def zona_de_coordenadas(self, lat, lon):
+        """Localidad con el centroide más cercano a un punto GPS (para partir de la posición del conductor)."""
+        if not self._cargado:
+            self._cargar()
+        # A la latitud de Bogotá basta una proyección plana: un grado de longitud mide cos(lat) grados de latitud
+        escala = math.cos(math.radians(lat))
+        return min(range(self.n), key=lambda i: (self.centroides[i][0] - lat) ** 2 +
+                   ((self.centroides[i][1] - lon) * escala) ** 2)
+
+    @lru_cache(maxsize=4096)
+    def _zona_de_texto(self, direccion):
+        # Se toma la última localidad mencionada: "Avenida Suba # 95-10, Localidad de Engativá" es Engativá
+        coincidencias = self._patron.findall(normalizar_texto(direccion))
+        return self._zona_por_alias[coincidencias[-1]] if coincidencias else None
+
+    def metros_entre_zonas(self, zona_origen, zona_destino):
+        if not self._cargado:
+            self._cargar()
+        if zona_origen == zona_destino:
+            return self.radios_m[zona_origen]
+        return self._matriz[zona_origen * self.n + zona_destino]
+
+    def distancia_km(self, origen, destino):
+        """Distancia por vía entre dos direcciones en km, o None si alguna localidad no se reconoce."""
+        zona_origen, zona_destino = self.zona(origen), self.zona(destino)
+        if zona_origen is None or zona_destino is None:
+            return None
+        return Decimal(self.metros_entre_zonas(zona_origen, zona_destino)) / 1000
+
+    def factor_distancia(self, origen, destino):
+        """Factor de distancia para la tarifa (1.00 a 1.50), repetible para la misma ruta."""
+        km = self.distancia_km(origen, destino)
+        if km is None:
+            return FACTOR_SIN_RUTA
+        proporcion = min(km / DISTANCIA_FACTOR_MAXIMO_KM, 1)
+        return (FACTOR_MINIMO + (FACTOR_MAXIMO - FACTOR_MINIMO) * proporcion).quantize(Decimal('0.01'))
+
+
+# Instancia única por proceso (la matriz se carga en la primera consulta)
+motor_distancias = MotorDistancias()
+
+
+def distancia_km(origen, destino):
+    return motor_distancias.distancia_km(origen, destino)
+
+
+def factor_distancia(origen, destino):
+    return motor_distancias.factor_distancia(origen, destino)
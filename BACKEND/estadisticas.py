@@ -0,0 +1,74 @@
+# BACKEND/estadisticas.py
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+
+from FRONTEND.models import ContadorEstadistica, Empresas, Pedidos, Usuarios
+
+# Entidad contada -> (modelo, campo por el que se desglosa el conteo)
+ENTIDADES_CONTADAS = {
+    'PEDIDOS': (Pedidos, 'estado'),
+    'USUARIOS': (Usuarios, 'tipo'),
+    'EMPRESAS': (Empresas, 'tipo'),
+}
+
+ENTIDAD_POR_MODELO = {modelo: (entidad, campo) for entidad, (modelo, campo) in ENTIDADES_CONTADAS.items()}
+
+
+def _incrementar(entidad, clave, delta):
+    """Suma 'delta' al contador con un UPDATE atómico (F()); crea la fila si aún no existe."""
+    actualizadas = ContadorEstadistica.objects.filter(entidad=entidad, clave=clave).update(total=F('total') + delta)
+    if actualizadas:
+        return
+    try:
+        with transaction.atomic():
+            ContadorEstadistica.objects.create(entidad=entidad, clave=clave, total=delta)
+    except IntegrityError:
+        # Otra petición creó la fila entre el UPDATE y el INSERT
+        ContadorEstadistica.objects.filter(entidad=entidad, clave=clave).update(total=F('total') + delta)
+
+
+def registrar_alta(entidad, clave, cantidad=1):
+    _incrementar(entidad, '', cantidad)
+    if clave:
+        _incrementar(entidad, clave, cantidad)
+
+
+def registrar_baja(entidad, clave):
+    _incrementar(entidad, '', -1)
+    if clave:
+        _incrementar(entidad, clave, -1)
+
+
+def registrar_cambio(entidad, clave_anterior, clave_nueva):
+    if clave_anterior == clave_nueva:
+        return
+    if clave_anterior:
+        _incrementar(entidad, clave_anterior, -1)
+    if clave_nueva:
+        _incrementar(entidad, clave_nueva, 1)
+
+
+def leer_contadores():
+    """Devuelve todos los contadores en una sola consulta: {(entidad, clave): total}."""
+    return {
+        (entidad, clave): total
+        for entidad, clave, total in ContadorEstadistica.objects.values_list('entidad', 'clave', 'total')
+    }
+
+
+def reconstruir_contadores():
+    """Recalcula todos los contadores desde cero con un GROUP BY por entidad."""
+    filas = []
+    for entidad, (modelo, campo) in ENTIDADES_CONTADAS.items():
+        total = 0
+        for fila in modelo.objects.order_by().values(campo).annotate(n=Count('id')):
+            if fila[campo]:
+                filas.append(ContadorEstadistica(entidad=entidad, clave=fila[campo], total=fila['n']))
+            total += fila['n']
+        filas.append(ContadorEstadistica(entidad=entidad, clave='', total=total))
+
+    with transaction.atomic():
+        ContadorEstadistica.objects.all().delete()
+        ContadorEstadistica.objects.bulk_create(filas)
+    return filas
@@ -0,0 +1,215 @@
+# BACKEND/eventos.py
+
+import asyncio
+import json
+import time
+from collections import deque
+
+from asgiref.sync import sync_to_async
+from django.db.models import Q
+
+from FRONTEND.models import EventoBolsa
+from BACKEND.bolsa import clase_de_carga
+
+# Cada cuánto el difusor revisa la tabla de eventos (segundos)
+INTERVALO_SONDEO = 1.0
+# Máximo de eventos que se reenvían a un conductor que se reconecta con Last-Event-ID
+MAX_EVENTOS_REPETICION = 500
+# Eventos en cola por conexión antes de considerar al cliente demasiado lento
+MAX_COLA_POR_CLIENTE = 1000
+# Segundos que se sigue buscando un id que falta por debajo del último difundido (transacción
+# aún abierta); pasado este tiempo se da por perdido (rollback, evento purgado)
+ESPERA_HUECOS = 300
+# Huecos que se siguen a la vez, e ids hacia atrás en los que se buscan al arrancar el difusor
+MAX_HUECOS = 100
+VENTANA_HUECOS_INICIAL = 1000
+
+
+def _datos_evento(tipo, pedido):
+    if tipo != 'CREADO':
+        return {}
+    return {
+        'origen': pedido.origen,
+        'destino': pedido.destino,
+        'peso_total': str(pedido.peso_total),
+        'tipo_mercancia': pedido.tipo_mercancia,
+        'fecha_recoleccion': str(pedido.fecha_recoleccion),
+        # Para que cada tablero muestre solo los pedidos de su bolsa (zonas y clases del conductor)
+        'zona_origen': pedido.zona_origen,
+        'clase_carga': clase_de_carga(pedido.peso_total, pedido.volumen),
+    }
+
+
+def publicar_evento_bolsa(tipo, pedido):
+    """Registra un cambio de la bolsa de pendientes. Se ejecuta dentro de la transacción del cambio."""
+    return EventoBolsa.objects.create(tipo=tipo, pedido_id=pedido.pk, datos=_datos_evento(tipo, pedido))
+
+
+def publicar_eventos_bolsa(tipo, pedidos):
+    """Versión por lotes para las altas masivas (bulk_create no dispara las señales)."""
+    return EventoBolsa.objects.bulk_create(
+        [EventoBolsa(tipo=tipo, pedido_id=pedido.pk, datos=_datos_evento(tipo, pedido)) for pedido in pedidos]
+    )
+
+
+def formatear_sse(evento, con_id=True):
+    """
+    Serializa un EventoBolsa en el formato text/event-stream. Sin 'id' el navegador no cambia su
+    Last-Event-ID: así se envían los eventos que llegan tarde, con id menor al último ya enviado.
+    """
+    # 'evento_id' también en los datos: el tablero descarta los que ya procesó (repeticiones al reconectar)
+    payload = json.dumps({'evento_id': evento.id, 'pedido_id': evento.pedido_id, **evento.datos})
+    linea_id = f"id: {evento.id}\n" if con_id else ""
+    return f"{linea_id}event: {evento.tipo.lower()}\ndata: {payload}\n\n"
+
+
+def _eventos_desde(ultimo_id, limite, huecos=(), ids=()):
+    """Eventos posteriores a 'ultimo_id', más los que caigan en 'huecos' [(desde, hasta, _)] o en 'ids'."""
+    condicion = Q(id__gt=ultimo_id)
+    for desde, hasta, _ in huecos:
+        condicion |= Q(id__range=(desde, hasta))
+    if ids:
+        condicion |= Q(id__in=ids)
+    return list(EventoBolsa.objects.filter(condicion).order_by('id')[:limite])
+
+
+def ultimo_evento_id():
+    return EventoBolsa.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+
+def _huecos_recientes(ultimo_id, ahora):
+    # Ids sin evento entre los últimos VENTANA_HUECOS_INICIAL: pueden ser de transacciones aún abiertas
+    ids = list(EventoBolsa.objects.filter(id__gt=ultimo_id - VENTANA_HUECOS_INICIAL, id__lte=ultimo_id)
+               .order_by('id').values_list('id', flat=True))
+    huecos, anterior = [], (ids[0] - 1 if ids else ultimo_id)
+    for id_ in ids:
+        if id_ > anterior + 1:
+            huecos.append((anterior + 1, id_ - 1, ahora))
+        anterior = id_
+    return huecos[-MAX_HUECOS:]
+
+
+class _Suscripcion:
+    def __init__(self):
+        self.cola = asyncio.Queue(maxsize=MAX_COLA_POR_CLIENTE)
+        self.expulsada = False
+
+
+class DifusorBolsa:
+    """
+    Difusor en proceso: una sola tarea por proceso consulta la tabla EventoBolsa
+    y reparte los eventos nuevos a todas las conexiones SSE abiertas, de modo que
+    el costo en base de datos no crece con el número de conductores conectados.
+
+    El id de un evento se asigna al insertarlo, no al confirmar la transacción: una
+    transacción larga (una importación masiva) puede confirmar ids más bajos que otros ya
+    difundidos. Por eso los ids que faltan por debajo del último visto se guardan como
+    huecos (rangos) y se vuelven a consultar durante ESPERA_HUECOS; los eventos que
+    aparecen en ellos se difunden como tardíos.
+    """
+
+    def __init__(self, intervalo=INTERVALO_SONDEO):
+        self.intervalo = intervalo
+        self._suscripciones = set()
+        self._tarea = None
+        self._ultimo_id = None
+        self._huecos = []  # [(desde, hasta, detectado)]
+        self._tardios = deque()  # (id, difundido): para repetirlos a quien se reconecte
+
+    async def suscribir(self):
+        suscripcion = _Suscripcion()
+        self._suscripciones.add(suscripcion)
+        if self._tarea is None or self._tarea.done():
+            self._tarea = asyncio.get_running_loop().create_task(self._bucle())
+        return suscripcion
+
+    def desuscribir(self, suscripcion):
+        self._suscripciones.discard(suscripcion)
+
+    def registrar(self, eventos, ahora):
+        """
+        Avanza el cursor con los eventos leídos y actualiza los huecos.
+        Devuelve [(evento, tardio)] sin los que ya se habían difundido.
+        """
+        nuevos = []
+        for evento in eventos:
+            if evento.id > self._ultimo_id:
+                if evento.id > self._ultimo_id + 1:
+                    self._huecos.append((self._ultimo_id + 1, evento.id - 1, ahora))
+                self._ultimo_id = evento.id
+                nuevos.append((evento, False))
+                continue
+            indice = next((i for i, (desde, hasta, _) in enumerate(self._huecos) if desde <= evento.id <= hasta), None)
+            if indice is None:
+                continue
+            desde, hasta, detectado = self._huecos.pop(indice)
+            self._huecos[indice:indice] = [
+                (a, b, detectado) for a, b in ((desde, evento.id - 1), (evento.id + 1, hasta)) if a <= b
+            ]
+            self._tardios.append((evento.id, ahora))
+            nuevos.append((evento, True))
+
+        limite = ahora - ESPERA_HUECOS
+        self._huecos = [hueco for hueco in self._huecos if hueco[2] >= limite][-MAX_HUECOS:]
+        while self._tardios and self._tardios[0][1] < limite:
+            self._tardios.popleft()
+        return nuevos
+
+    def tardios_hasta(self, ultimo_id):
+        """Ids difundidos como tardíos con id menor o igual a 'ultimo_id' (no los cubre Last-Event-ID)."""
+        return [id_ for id_, _ in self._tardios if id_ <= ultimo_id]
+
+    async def _bucle(self):
+        if self._ultimo_id is None:
+            self._ultimo_id = await sync_to_async(ultimo_evento_id)()
+            self._huecos = await sync_to_async(_huecos_recientes)(self._ultimo_id, time.monotonic())
+        while self._suscripciones:
+            eventos = await sync_to_async(_eventos_desde)(self._ultimo_id, MAX_EVENTOS_REPETICION, self._huecos)
+            for evento, tardio in self.registrar(eventos, time.monotonic()):
+                for suscripcion in list(self._suscripciones):
+                    try:
+                        suscripcion.cola.put_nowait((evento, tardio))
+                    except asyncio.QueueFull:
+                        # Cliente lento: se corta su stream y el navegador se reconecta con Last-Event-ID
+                        suscripcion.expulsada = True
+                        self._suscripciones.discard(suscripcion)
+            await asyncio.sleep(self.intervalo)
+        # Sin suscriptores: el próximo suscriptor retoma desde el último evento actual
+        self._ultimo_id = None
+        self._huecos = []
+        self._tardios.clear()
+
+
+difusor_bolsa = DifusorBolsa()
+
+
+async def stream_bolsa(ultimo_id=None, latido=15.0):
+    """
+    Generador asíncrono de eventos SSE para un conductor.
+    Si el navegador envía Last-Event-ID, primero se reenvían los eventos perdidos: los
+    posteriores a ese id y los tardíos de id menor difundidos mientras estaba desconectado.
+    """
+    suscripcion = await difusor_bolsa.suscribir()
+    repetidos = set()
+    try:
+        yield "retry: 3000\n\n"
+        if ultimo_id is not None:
+            tardios = difusor_bolsa.tardios_hasta(ultimo_id)
+            for evento in await sync_to_async(_eventos_desde)(ultimo_id, MAX_EVENTOS_REPETICION, ids=tardios):
+                repetidos.add(evento.id)
+                tardio = evento.id <= ultimo_id
+                if not tardio:
+                    ultimo_id = evento.id
+                yield formatear_sse(evento, con_id=not tardio)
+        while not (suscripcion.expulsada and suscripcion.cola.empty()):
+            try:
+                evento, tardio = await asyncio.wait_for(suscripcion.cola.get(), timeout=latido)
+            except asyncio.TimeoutError:
+                # Comentario SSE para mantener viva la conexión a través de proxies
+                yield ": ping\n\n"
+                continue
+            if evento.id in repetidos or (not tardio and ultimo_id is not None and evento.id <= ultimo_id):
+                continue
+            yield formatear_sse(evento, con_id=not tardio)
+    finally:
+        difusor_bolsa.desuscribir(suscripcion)
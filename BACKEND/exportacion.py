@@ -0,0 +1,139 @@
+# BACKEND/exportacion.py
+
+import csv
+from datetime import date, datetime, time, timedelta
+
+from django.utils import timezone
+
+from FRONTEND.models import ESTADOS_PEDIDO, Pedidos, Usuarios, normalizar_email
+
+# Filas leídas de la base de datos por consulta
+TAMANO_BLOQUE = 2000
+
+# (encabezado, campo): una sola proyección con los JOIN a usuarios y a la factura
+COLUMNAS_EXPORTACION = (
+    ('pedido', 'id'),
+    ('fecha_creacion', 'fecha_creacion'),
+    ('estado', 'estado'),
+    ('minorista', 'minorista__nombre'),
+    ('minorista_email', 'minorista__email'),
+    ('conductor', 'conductor__nombre'),
+    ('origen', 'origen'),
+    ('destino', 'destino'),
+    ('tipo_mercancia', 'tipo_mercancia'),
+    ('peso_total', 'peso_total'),
+    ('volumen', 'volumen'),
+    ('unidades', 'unidades'),
+    ('valor_declarado', 'valor_declarado'),
+    ('precio_estimado', 'precio_estimado'),
+    ('fecha_recoleccion', 'fecha_recoleccion'),
+    ('hora_recoleccion', 'hora_recoleccion'),
+    ('factura_referencia', 'factura__referencia'),
+    ('factura_estado', 'factura__estado'),
+    ('factura_monto', 'factura__monto_total'),
+    ('factura_emision', 'factura__fecha_emision'),
+    ('factura_vencimiento', 'factura__fecha_vencimiento'),
+    ('factura_pago', 'factura__fecha_pago'),
+)
+
+# Una celda que empieza así se ejecuta como fórmula al abrir el CSV en Excel
+_INICIO_FORMULA = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _inicio_del_dia(dia):
+    return timezone.make_aware(datetime.combine(dia, time.min))
+
+
+def filtrar_pedidos_exportacion(parametros):
+    """
+    Queryset de pedidos según los filtros GET: 'desde' y 'hasta' (fecha de creación, AAAA-MM-DD,
+    ambos inclusive), 'estado' y 'minorista' (id o email). Lanza ValueError si un filtro no es válido.
+    """
+    pedidos = Pedidos.objects.all()
+
+    desde, hasta = parametros.get('desde'), parametros.get('hasta')
+    if desde:
+        pedidos = pedidos.filter(fecha_creacion__gte=_inicio_del_dia(date.fromisoformat(desde)))
+    if hasta:
+        # Rango semiabierto sobre la columna (sin __date) para que use el índice de fecha_creacion
+        pedidos = pedidos.filter(fecha_creacion__lt=_inicio_del_dia(date.fromisoformat(hasta) + timedelta(days=1)))
+
+    estado = parametros.get('estado')
+    if estado:
+        if estado not in dict(ESTADOS_PEDIDO):
+            raise ValueError(f"Estado desconocido: {estado}.")
+        pedidos = pedidos.filter(estado=estado)
+
+    minorista = parametros.get('minorista')
+    if minorista:
+        if minorista.isdigit():
+            pedidos = pedidos.filter(minorista_id=int(minorista))
+        else:
+            minorista_id = Usuarios.objects.filter(email_normalizado=normalizar_email(minorista)) \
+                .values_list('id', flat=True).first()
+            pedidos = pedidos.filter(minorista_id=minorista_id) if minorista_id else pedidos.none()
+    return pedidos
+
+
+def _recorrer_por_bloques(pedidos, campos, tamano_bloque):
+    """
+    Recorre el queryset por rangos de id. iterator(chunk_size=...) no basta en MySQL:
+    el driver descarga el resultado completo a memoria antes de entregar la primera fila.
+    """
+    ultimo_id = 0
+    while True:
+        bloque = list(pedidos.filter(id__gt=ultimo_id).order_by('id').values_list(*campos)[:tamano_bloque])
+        if not bloque:
+            return
+        yield bloque
+        ultimo_id = bloque[-1][0]
+
+
+class _Eco:
+    """Archivo de solo escritura que devuelve lo escrito: csv.writer sin búfer intermedio."""
+
+    def write(self, valor):
+        return valor
+
+
+def _texto_seguro(valor):
+    # csv.writer ya escribe None como celda vacía
+    if valor and valor.startswith(_INICIO_FORMULA):
+        return "'" + valor
+    return valor
+
+
+def _fecha_local(valor):
+    return timezone.localtime(valor).strftime('%Y-%m-%d %H:%M:%S')
+
+
+# Conversión solo en las columnas que la necesitan: el resto se escribe tal cual
+_CONVERSIONES = {
+    'fecha_creacion': _fecha_local,
+    'minorista__nombre': _texto_seguro,
+    'minorista__email': _texto_seguro,
+    'conductor__nombre': _texto_seguro,
+    'origen': _texto_seguro,
+    'destino': _texto_seguro,
+    'factura__referencia': _texto_seguro,
+}
+
+
+def filas_csv(pedidos, tamano_bloque=TAMANO_BLOQUE):
+    """
+    Genera el CSV de los pedidos con su factura, un bloque de texto por consulta.
+    La memoria no depende del número de pedidos: solo se retiene un bloque a la vez.
+    """
+    escritor = csv.writer(_Eco())
+    yield '\ufeff' + escritor.writerow([encabezado for encabezado, _ in COLUMNAS_EXPORTACION])
+    campos = [campo for _, campo in COLUMNAS_EXPORTACION]
+    conversiones = [(i, _CONVERSIONES[campo]) for i, campo in enumerate(campos) if campo in _CONVERSIONES]
+    for bloque in _recorrer_por_bloques(pedidos, campos, tamano_bloque):
+        lineas = []
+        for fila in bloque:
+            fila = list(fila)
+            for i, convertir in conversiones:
+                if fila[i] is not None:
+                    fila[i] = convertir(fila[i])
+            lineas.append(escritor.writerow(fila))
+        yield ''.join(lineas)
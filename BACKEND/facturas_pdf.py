@@ -0,0 +1,236 @@
+# BACKEND/facturas_pdf.py
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+
+from FRONTEND.models import Factura
+
+try:
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+except ImportError:  # pragma: no cover - sin reportlab no hay descarga en PDF
+    canvas = None
+
+# Subir este número cuando cambie el diseño del PDF: invalida todos los archivos generados
+VERSION_DISENO = 1
+
+# Facturas que procesa cada tarea del pool en el pre-render
+TAMANO_TAREA = 200
+
+# Segundos que se conserva una versión reemplazada: da tiempo a terminar las descargas que ya la abrieron
+EDAD_PODA_VERSIONES = 3600
+
+
+class PdfNoDisponible(Exception):
+    """reportlab no está instalado en este servidor."""
+
+
+def _directorio_pdfs():
+    return Path(getattr(settings, 'FACTURAS_PDF_DIR', None) or Path(settings.BASE_DIR) / 'media' / 'facturas')
+
+
+def _moneda(valor):
+    return f"${valor:,.0f}".replace(',', '.')
+
+
+def datos_factura(factura):
+    """Todo lo que se imprime en el PDF, como texto. Requiere la factura con orden y minorista cargados."""
+    pedido = factura.orden
+    minorista = pedido.minorista
+    return {
+        'factura': factura.referencia or f"FAC-{factura.pk:06d}",
+        'comprobante': f"BOCG-{pedido.pk:05d}",
+        'estado': factura.get_estado_display(),
+        'fecha_emision': str(factura.fecha_emision),
+        'fecha_vencimiento': str(factura.fecha_vencimiento),
+        'fecha_pago': str(factura.fecha_pago or ''),
+        'cliente': f"{minorista.nombre} {minorista.apellido or ''}".strip(),
+        'email': minorista.email,
+        'origen': pedido.origen,
+        'destino': pedido.destino,
+        'recoleccion': f"{pedido.fecha_recoleccion} {pedido.hora_recoleccion or ''}".strip(),
+        'mercancia': pedido.get_tipo_mercancia_display(),
+        'peso': f"{pedido.peso_total} kg",
+        'unidades': str(pedido.unidades),
+        'volumen': f"{pedido.volumen} m³",
+        'valor_declarado': _moneda(pedido.valor_declarado),
+        'monto_total': _moneda(factura.monto_total),
+    }
+
+
+def version_pdf(datos):
+    """
+    Huella del contenido impreso: cambia en cuanto se guarda cualquier dato que aparece
+    en la factura (también del pedido o del cliente) y no cambia con guardados que no lo tocan.
+    """
+    contenido = json.dumps([VERSION_DISENO, datos], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(contenido.encode('utf-8')).hexdigest()[:20]
+
+
+def ruta_pdf(factura_id, version):
+    return _directorio_pdfs() / str(factura_id) / f"{version}.pdf"
+
+
+def renderizar_pdf(datos):
+    """Dibuja la factura en una página carta y devuelve los bytes del PDF."""
+    if canvas is None:
+        raise PdfNoDisponible("Instale reportlab para generar facturas en PDF.")
+
+    buffer = BytesIO()
+    # invariant=1: sin fecha de creación ni id aleatorio, el mismo contenido produce el mismo archivo
+    pdf = canvas.Canvas(buffer, pagesize=letter, invariant=1)
+    pdf.setTitle(f"Factura {datos['factura']}")
+    ancho, alto = letter
+    y = alto - 60
+
+    pdf.setFont('Helvetica-Bold', 20)
+    pdf.drawString(50, y, "BOGOCARGO")
+    pdf.setFont('Helvetica', 10)
+    pdf.drawRightString(ancho - 50, y, f"Factura {datos['factura']}")
+    pdf.drawRightString(ancho - 50, y - 14, f"Comprobante {datos['comprobante']}")
+    y -= 50
+
+    secciones = (
+        ("Factura", (
+            ("Estado", datos['estado']),
+            ("Fecha de emisión", datos['fecha_emision']),
+            ("Fecha de vencimiento", datos['fecha_vencimiento']),
+            ("Fecha de pago", datos['fecha_pago'] or "—"),
+        )),
+        ("Cliente", (
+            ("Nombre", datos['cliente']),
+            ("Email", datos['email']),
+        )),
+        ("Envío", (
+            ("Origen", datos['origen']),
+            ("Destino", datos['destino']),
+            ("Recolección", datos['recoleccion']),
+            ("Mercancía", datos['mercancia']),
+            ("Peso total", datos['peso']),
+            ("Unidades", datos['unidades']),
+            ("Volumen", datos['volumen']),
+            ("Valor declarado", datos['valor_declarado']),
+        )),
+    )
+    for titulo, filas in secciones:
+        pdf.setFont('Helvetica-Bold', 12)
+        pdf.drawString(50, y, titulo)
+        pdf.line(50, y - 4, ancho - 50, y - 4)
+        y -= 22
+        for etiqueta, valor in filas:
+            pdf.setFont('Helvetica', 10)
+            pdf.drawString(60, y, etiqueta)
+            pdf.drawString(200, y, valor[:80])
+            y -= 16
+        y -= 14
+
+    pdf.setFont('Helvetica-Bold', 14)
+    pdf.drawString(50, y, "TOTAL A PAGAR")
+    pdf.drawRightString(ancho - 50, y, datos['monto_total'])
+    pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+
+def _escribir_atomico(ruta, contenido):
+    # Dos procesos que generan la misma versión escriben el mismo archivo: gana cualquiera, sin archivos a medias
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    fd, temporal = tempfile.mkstemp(dir=ruta.parent, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as archivo:
+        archivo.write(contenido)
+    os.replace(temporal, ruta)
+
+
+def podar_versiones(factura_id, vigente, edad_minima=EDAD_PODA_VERSIONES, ahora=None):
+    """
+    Borra las versiones de la factura distintas de 'vigente' escritas hace más de 'edad_minima'
+    segundos. No se llama al servir una descarga: otra petición podría estar abriendo ese archivo.
+    Devuelve cuántas borró.
+    """
+    limite = (time.time() if ahora is None else ahora) - edad_minima
+    borradas = 0
+    for anterior in (_directorio_pdfs() / str(factura_id)).glob('*.pdf'):
+        if anterior.stem == vigente:
+            continue
+        try:
+            if anterior.stat().st_mtime <= limite:
+                anterior.unlink()
+                borradas += 1
+        except FileNotFoundError:  # Otro proceso la podó primero
+            pass
+    return borradas
+
+
+def obtener_pdf_factura(factura):
+    """
+    Ruta del PDF vigente de la factura, generándolo solo si esta versión aún no existe.
+    Devuelve (ruta, version).
+    """
+    datos = datos_factura(factura)
+    version = version_pdf(datos)
+    ruta = ruta_pdf(factura.pk, version)
+    if not ruta.exists():
+        _escribir_atomico(ruta, renderizar_pdf(datos))
+    return ruta, version
+
+
+# ============================================================
+# PRE-RENDER DE UN PERIODO DE FACTURACIÓN
+# ============================================================
+
+def _facturas_con_datos():
+    return Factura.objects.select_related('orden__minorista')
+
+
+def _renderizar_bloque(ids):
+    """
+    Tarea del pool: genera los PDF que falten de un bloque de facturas y poda sus versiones
+    reemplazadas. Devuelve cuántos generó.
+    """
+    generados = 0
+    for factura in _facturas_con_datos().filter(pk__in=ids):
+        datos = datos_factura(factura)
+        version = version_pdf(datos)
+        ruta = ruta_pdf(factura.pk, version)
+        if not ruta.exists():
+            _escribir_atomico(ruta, renderizar_pdf(datos))
+            generados += 1
+        podar_versiones(factura.pk, version)
+    return generados
+
+
+def _iniciar_proceso():
+    # Con 'spawn' o 'forkserver' el proceso hijo arranca sin Django configurado
+    import django
+    django.setup()
+
+
+def prerenderizar_periodo(desde, hasta, procesos=None, tamano_tarea=TAMANO_TAREA):
+    """
+    Genera los PDF de las facturas emitidas entre 'desde' y 'hasta' (inclusive) repartiendo
+    bloques de facturas entre varios procesos (el render es CPU puro). Devuelve (facturas, generados).
+    """
+    if canvas is None:
+        raise PdfNoDisponible("Instale reportlab para generar facturas en PDF.")
+
+    ids = list(
+        Factura.objects.filter(fecha_emision__range=(desde, hasta)).order_by('pk').values_list('pk', flat=True)
+    )
+    bloques = [ids[i:i + tamano_tarea] for i in range(0, len(ids), tamano_tarea)]
+    procesos = procesos or os.cpu_count() or 1
+    if procesos <= 1 or len(bloques) <= 1:
+        return len(ids), sum(_renderizar_bloque(bloque) for bloque in bloques)
+
+    # Los hijos no deben heredar la conexión abierta del padre: cada uno abre la suya
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=min(procesos, len(bloques)), initializer=_iniciar_proceso) as pool:
+        return len(ids), sum(pool.map(_renderizar_bloque, bloques))
@@ -0,0 +1,247 @@
+# BACKEND/importacion.py
+
+import csv
+import io
+import unicodedata
+import uuid
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+
+from FRONTEND.forms import CrearPedidoMinoristaForm
+from FRONTEND.models import Empresas, Factura, Pedidos
+from BACKEND.busqueda import indexar_pedidos
+from BACKEND.cotizacion import cotizar_lote
+from BACKEND.distancias import motor_distancias
+from BACKEND.estadisticas import registrar_alta
+from BACKEND.eventos import publicar_eventos_bolsa
+
+try:
+    from openpyxl import load_workbook
+except ImportError:  # pragma: no cover - sin openpyxl solo se aceptan CSV
+    load_workbook = None
+
+# Pedidos insertados por transacción
+TAMANO_LOTE = 1000
+# Días de plazo de la factura (igual que crear_pedido)
+DIAS_VENCIMIENTO_FACTURA = 15
+
+COLUMNAS_OBLIGATORIAS = ('mayorista', 'destino', 'tipo_mercancia', 'fecha_recoleccion', 'hora_recoleccion',
+                         'valor_declarado', 'peso_total', 'unidades', 'largo', 'alto', 'ancho')
+COLUMNAS_OPCIONALES = ('observaciones', 'referencia')
+
+
+class ArchivoInvalido(Exception):
+    """El archivo no se puede leer o le faltan columnas: no se importa ninguna fila."""
+
+
+# ============================================================
+# 1. LECTURA EN STREAMING (CSV / XLSX)
+# ============================================================
+
+def _normalizar_columna(nombre):
+    texto = unicodedata.normalize('NFKD', str(nombre or '')).encode('ascii', 'ignore').decode()
+    return texto.strip().lower().replace(' ', '_')
+
+
+def _celda_a_texto(valor):
+    """Las celdas de Excel llegan tipadas; el formulario espera texto como en un POST."""
+    if valor is None:
+        return ''
+    if isinstance(valor, datetime):
+        return valor.strftime('%Y-%m-%d') if valor.time() == time(0) else valor.strftime('%Y-%m-%d %H:%M')
+    if isinstance(valor, date):
+        return valor.isoformat()
+    if isinstance(valor, time):
+        return valor.strftime('%H:%M')
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    return str(valor).strip()
+
+
+def _filas_csv(archivo):
+    texto = io.TextIOWrapper(archivo, encoding='utf-8-sig', newline='')
+    primera = texto.readline()
+    # Excel en español exporta con ';'
+    delimitador = ';' if primera.count(';') > primera.count(',') else ','
+    yield next(csv.reader([primera], delimiter=delimitador), [])
+    yield from csv.reader(texto, delimiter=delimitador)
+
+
+def _filas_xlsx(archivo):
+    if load_workbook is None:
+        raise ArchivoInvalido("Para importar archivos .xlsx instale openpyxl, o exporte la hoja como CSV.")
+    libro = load_workbook(archivo, read_only=True, data_only=True)
+    try:
+        for fila in libro.active.iter_rows(values_only=True):
+            yield [_celda_a_texto(valor) for valor in fila]
+    finally:
+        libro.close()
+
+
+def leer_filas(archivo, nombre):
+    """
+    Recorre el archivo fila por fila sin cargarlo completo en memoria.
+    Genera (número de fila en la hoja, {columna: texto}).
+    """
+    extension = nombre.rsplit('.', 1)[-1].lower()
+    if extension == 'csv':
+        filas = _filas_csv(archivo)
+    elif extension == 'xlsx':
+        filas = _filas_xlsx(archivo)
+    else:
+        raise ArchivoInvalido("Formato no soportado: use .csv o .xlsx.")
+
+    try:
+        encabezado = [_normalizar_columna(c) for c in next(filas)]
+    except (StopIteration, UnicodeDecodeError):
+        raise ArchivoInvalido("El archivo está vacío o no es texto UTF-8.")
+    faltantes = [c for c in COLUMNAS_OBLIGATORIAS if c not in encabezado]
+    if faltantes:
+        raise ArchivoInvalido(f"Faltan columnas: {', '.join(faltantes)}.")
+
+    for numero, fila in enumerate(filas, start=2):
+        if not any(str(valor).strip() for valor in fila):
+            continue
+        yield numero, {columna: (fila[i].strip() if i < len(fila) else '') for i, columna in enumerate(encabezado)}
+
+
+# ============================================================
+# 2. VALIDACIÓN (reglas de CrearPedidoMinoristaForm)
+# ============================================================
+
+class ValidadorPedidos:
+    """
+    Valida filas con un CrearPedidoMinoristaForm nuevo por fila. Los mayoristas se resuelven
+    una sola vez (por id o NIT) a su dirección de origen, y con ellos las opciones del formulario.
+    """
+
+    def __init__(self):
+        self.origenes = {}
+        for empresa in Empresas.objects.filter(tipo='MAYORISTA').only('pk', 'nit', 'direccion', 'ciudad'):
+            datos = (str(empresa.pk), f"{empresa.direccion}, {empresa.ciudad}")
+            self.origenes[str(empresa.pk)] = datos
+            self.origenes[empresa.nit] = datos
+        self.opciones = [('', '---')] + [(pk, pk) for pk in sorted({pk for pk, _ in self.origenes.values()})]
+
+    def validar(self, fila):
+        """Devuelve (pedido sin guardar, None) o (None, {campo: [errores]})."""
+        mayorista_id, origen = self.origenes.get(fila.get('mayorista', ''), ('', ''))
+        datos = dict(fila, mayorista_origen_id=mayorista_id, origen=origen)
+        if not mayorista_id:
+            return None, {'mayorista': ["Mayorista no encontrado (use su id o NIT)."]}
+
+        form = CrearPedidoMinoristaForm(datos, mayorista_choices=self.opciones)
+        if not form.is_valid():
+            return None, {campo: list(errores) for campo, errores in form.errors.items()}
+
+        pedido = form.instance
+        pedido.fecha_recoleccion = form.cleaned_data['fecha_recoleccion']
+        pedido.hora_recoleccion = form.cleaned_data['hora_recoleccion']
+        pedido.empresa_mayorista = mayorista_id
+        return pedido, None
+
+
+# ============================================================
+# 3. INSERCIÓN POR LOTES
+# ============================================================
+
+def _guardar_lote(pedidos, minorista):
+    """
+    Inserta un lote de pedidos con sus facturas en una transacción. Como bulk_create no
+    dispara señales, aquí se actualizan a mano el índice de búsqueda, los contadores y la bolsa en vivo.
+    """
+    especificaciones = [
+        {
+            'peso_total': p.peso_total, 'unidades': p.unidades, 'largo': p.largo, 'alto': p.alto,
+            'ancho': p.ancho, 'tipo_mercancia': p.tipo_mercancia, 'origen': p.origen, 'destino': p.destino,
+        }
+        for p in pedidos
+    ]
+    precios, volumenes = cotizar_lote(especificaciones)
+    for pedido, precio, volumen in zip(pedidos, precios, volumenes):
+        pedido.minorista = minorista
+        pedido.estado = 'PENDIENTE'
+        pedido.precio_estimado = Decimal(precio)
+        pedido.volumen = Decimal(volumen).scaleb(-2)
+        # bulk_create no pasa por Pedidos.save()
+        pedido.zona_origen = motor_distancias.zona(pedido.origen)
+
+    hoy = date.today()
+    with transaction.atomic():
+        Pedidos.objects.bulk_create(pedidos)
+        if pedidos[0].pk is None:
+            # MySQL no devuelve los ids de un INSERT múltiple: se recuperan por la referencia única
+            ids = dict(
+                Pedidos.objects.filter(referencia_importacion__in=[p.referencia_importacion for p in pedidos])
+                .values_list('referencia_importacion', 'id')
+            )
+            for pedido in pedidos:
+                pedido.pk = ids[pedido.referencia_importacion]
+
+        Factura.objects.bulk_create([
+            Factura(
+                orden=pedido,
+                monto_total=pedido.precio_estimado,
+                fecha_emision=hoy,
+                fecha_vencimiento=hoy + timedelta(days=DIAS_VENCIMIENTO_FACTURA),
+                estado='PENDIENTE_PAGO',
+            )
+            for pedido in pedidos
+        ])
+        indexar_pedidos(pedidos)
+        registrar_alta('PEDIDOS', 'PENDIENTE', cantidad=len(pedidos))
+        publicar_eventos_bolsa('CREADO', pedidos)
+
+
+def importar_pedidos(archivo, nombre, minorista, tamano_lote=TAMANO_LOTE):
+    """
+    Importa los pedidos de una hoja (CSV o XLSX) para 'minorista'.
+    Las filas válidas se insertan por lotes; las inválidas no detienen la importación.
+    Devuelve {'creados': n, 'errores': [{'fila': n, 'errores': {campo: [mensajes]}}, ...]}.
+    Con la columna 'referencia', reimportar el mismo archivo no duplica pedidos.
+    """
+    validador = ValidadorPedidos()
+    lote_id = uuid.uuid4().hex[:12]
+    creados, errores = 0, []
+    lote, referencias_lote = [], set()
+
+    def vaciar():
+        nonlocal creados, lote, referencias_lote
+        if not lote:
+            return
+        existentes = set(
+            Pedidos.objects.filter(referencia_importacion__in=referencias_lote)
+            .values_list('referencia_importacion', flat=True)
+        )
+        nuevos = []
+        for numero, pedido in lote:
+            if pedido.referencia_importacion in existentes:
+                errores.append({'fila': numero, 'errores': {'referencia': ["Ya fue importada."]}})
+            else:
+                nuevos.append(pedido)
+        if nuevos:
+            _guardar_lote(nuevos, minorista)
+            creados += len(nuevos)
+        lote, referencias_lote = [], set()
+
+    for numero, fila in leer_filas(archivo, nombre):
+        pedido, errores_fila = validador.validar(fila)
+        if errores_fila:
+            errores.append({'fila': numero, 'errores': errores_fila})
+            continue
+
+        referencia = fila.get('referencia')
+        pedido.referencia_importacion = f"{minorista.pk}:{referencia or f'{lote_id}-{numero}'}"[:120]
+        if pedido.referencia_importacion in referencias_lote:
+            errores.append({'fila': numero, 'errores': {'referencia': ["Referencia repetida en el archivo."]}})
+            continue
+        referencias_lote.add(pedido.referencia_importacion)
+        lote.append((numero, pedido))
+        if len(lote) >= tamano_lote:
+            vaciar()
+    vaciar()
+
+    errores.sort(key=lambda error: error['fila'])
+    return {'creados': creados, 'errores': errores}
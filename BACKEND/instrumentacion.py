@@ -0,0 +1,280 @@
+# BACKEND/instrumentacion.py
+
+import logging
+import random
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# Sentencias más lentas que se guardan por petición y por vista en los agregados
+MAX_SENTENCIAS_LENTAS = 5
+# Largo máximo del SQL guardado (las consultas con IN de miles de ids son enormes)
+MAX_LARGO_SQL = 500
+# Minutos que se conservan en la caché y máximo que se puede pedir al endpoint
+VENTANA_MAX_MINUTOS = 60
+# Límites superiores (ms) de las cubetas del histograma de tiempos; la última cubeta no tiene límite
+LIMITES_HISTOGRAMA_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+_medicion_actual = ContextVar('medicion_peticion', default=None)
+
+
+def tasa_muestreo():
+    """Fracción de peticiones medidas (settings.INSTRUMENTACION_MUESTREO); 0 desactiva la medición."""
+    return getattr(settings, 'INSTRUMENTACION_MUESTREO', 0.1)
+
+
+def umbrales():
+    """(ms, consultas) a partir de los cuales una petición medida se registra en el log."""
+    return (getattr(settings, 'INSTRUMENTACION_UMBRAL_MS', 1000),
+            getattr(settings, 'INSTRUMENTACION_UMBRAL_CONSULTAS', 100))
+
+
+# ============================================================
+# 1. MEDICIÓN DE UNA PETICIÓN (tiempo total y SQL)
+# ============================================================
+
+class _Medicion:
+    __slots__ = ('inicio', 'consultas', 'sql', 'lentas')
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.consultas = 0
+        self.sql = 0.0
+        self.lentas = []  # [(segundos, sql)] de a lo sumo MAX_SENTENCIAS_LENTAS
+
+    def registrar_sql(self, sql, segundos):
+        self.consultas += 1
+        self.sql += segundos
+        if len(self.lentas) < MAX_SENTENCIAS_LENTAS:
+            self.lentas.append((segundos, sql))
+        else:
+            menor = min(range(MAX_SENTENCIAS_LENTAS), key=lambda i: self.lentas[i][0])
+            if segundos > self.lentas[menor][0]:
+                self.lentas[menor] = (segundos, sql)
+
+
+def _medir_sql(execute, sql, params, many, context):
+    # Fuera de una petición medida solo cuesta leer la variable de contexto
+    medicion = _medicion_actual.get()
+    if medicion is None:
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        medicion.registrar_sql(sql, time.perf_counter() - inicio)
+
+
+def instalar_medicion_sql(connection=None, **kwargs):
+    """
+    Agrega la medición de SQL a la conexión (o a las del hilo actual). Receptor de connection_created:
+    así la reciben también las conexiones de los hilos que sirven vistas síncronas bajo ASGI.
+    """
+    for conexion in [connection] if connection is not None else connections.all():
+        if _medir_sql not in conexion.execute_wrappers:
+            conexion.execute_wrappers.append(_medir_sql)
+
+
+# ============================================================
+# 2. AGREGADOS POR MINUTO Y POR VISTA
+# ============================================================
+# Cada proceso acumula el minuto en curso en memoria. Al cambiar de minuto lo publica en la caché
+# compartida con una clave propia (cache.add + incr: ningún worker pisa a otro), así el endpoint
+# suma lo de todos los workers. El minuto en curso de los demás procesos aparece cuando lo cierran.
+
+def _vacio():
+    return {
+        'peticiones': 0, 'tiempo_ms': 0.0, 'tiempo_max_ms': 0.0, 'consultas': 0, 'consultas_max': 0,
+        'sql_ms': 0.0, 'sobre_umbral': 0, 'histograma': [0] * (len(LIMITES_HISTOGRAMA_MS) + 1), 'sentencias': [],
+    }
+
+
+def _sumar(destino, origen):
+    for campo in ('peticiones', 'tiempo_ms', 'consultas', 'sql_ms', 'sobre_umbral'):
+        destino[campo] += origen[campo]
+    destino['tiempo_max_ms'] = max(destino['tiempo_max_ms'], origen['tiempo_max_ms'])
+    destino['consultas_max'] = max(destino['consultas_max'], origen['consultas_max'])
+    destino['histograma'] = [a + b for a, b in zip(destino['histograma'], origen['histograma'])]
+    destino['sentencias'] = sorted(destino['sentencias'] + origen['sentencias'], reverse=True)[:MAX_SENTENCIAS_LENTAS]
+
+
+def _percentil_histograma(fila, p):
+    # Límite superior de la cubeta donde cae el percentil (la última cubeta usa el máximo observado)
+    objetivo = p / 100 * fila['peticiones']
+    acumulado = 0
+    for limite, cantidad in zip(LIMITES_HISTOGRAMA_MS, fila['histograma']):
+        acumulado += cantidad
+        if acumulado >= objetivo:
+            return round(min(limite, fila['tiempo_max_ms']), 1)
+    return round(fila['tiempo_max_ms'], 1)
+
+
+class AgregadosPeticiones:
+    """Agregados por vista de las peticiones medidas, en cubetas de un minuto (seguro entre hilos)."""
+
+    def __init__(self, prefijo='instrumentacion'):
+        self.prefijo = prefijo
+        self._minuto = None
+        self._vistas = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, vista, segundos, medicion, sobre_umbral, ahora=None):
+        minuto = int((time.time() if ahora is None else ahora) // 60)
+        ms = segundos * 1000
+        cubeta = next((i for i, limite in enumerate(LIMITES_HISTOGRAMA_MS) if ms <= limite), len(LIMITES_HISTOGRAMA_MS))
+        sentencias = [[round(s * 1000, 2), sql[:MAX_LARGO_SQL]] for s, sql in medicion.lentas]
+
+        with self._lock:
+            cerrado = None
+            if minuto != self._minuto:
+                cerrado = (self._minuto, self._vistas) if self._vistas else None
+                self._minuto, self._vistas = minuto, {}
+            fila = self._vistas.setdefault(vista, _vacio())
+            fila['peticiones'] += 1
+            fila['tiempo_ms'] += ms
+            fila['tiempo_max_ms'] = max(fila['tiempo_max_ms'], ms)
+            fila['consultas'] += medicion.consultas
+            fila['consultas_max'] = max(fila['consultas_max'], medicion.consultas)
+            fila['sql_ms'] += medicion.sql * 1000
+            fila['sobre_umbral'] += sobre_umbral
+            fila['histograma'][cubeta] += 1
+            if sentencias:
+                fila['sentencias'] = sorted(fila['sentencias'] + sentencias, reverse=True)[:MAX_SENTENCIAS_LENTAS]
+        if cerrado:
+            self._publicar(*cerrado)
+
+    def _publicar(self, minuto, vistas):
+        contador = f'{self.prefijo}:{minuto}:n'
+        vigencia = (VENTANA_MAX_MINUTOS + 2) * 60
+        cache.add(contador, 0, vigencia)
+        try:
+            numero = cache.incr(contador)
+        except ValueError:  # La clave expiró entre add e incr
+            return
+        cache.set(f'{self.prefijo}:{minuto}:{numero}', vistas, vigencia)
+
+    def resumen(self, minutos, ahora=None):
+        """
+        Agregados de los últimos 'minutos' de todos los procesos, por vista y de la más costosa
+        (tiempo total) a la menos: peticiones medidas, p50/p95 aproximados por histograma, promedios
+        y máximos de tiempo y consultas, tiempo en SQL y sus sentencias más lentas.
+        """
+        minuto_actual = int((time.time() if ahora is None else ahora) // 60)
+        ventana = range(minuto_actual - minutos + 1, minuto_actual + 1)
+        contadores = cache.get_many([f'{self.prefijo}:{m}:n' for m in ventana])
+        publicados = cache.get_many([
+            f'{self.prefijo}:{clave.split(":")[-2]}:{n}' for clave, total in contadores.items() for n in range(1, total + 1)
+        ])
+
+        totales = {}
+        with self._lock:
+            locales = [self._vistas] if self._minuto in ventana else []
+            for vistas in list(publicados.values()) + locales:
+                for vista, fila in vistas.items():
+                    _sumar(totales.setdefault(vista, _vacio()), fila)
+
+        filas = []
+        for vista, fila in sorted(totales.items(), key=lambda item: -item[1]['tiempo_ms']):
+            n = fila['peticiones']
+            filas.append({
+                'vista': vista,
+                'peticiones': n,
+                'p50_ms': _percentil_histograma(fila, 50),
+                'p95_ms': _percentil_histograma(fila, 95),
+                'promedio_ms': round(fila['tiempo_ms'] / n, 1),
+                'max_ms': round(fila['tiempo_max_ms'], 1),
+                'tiempo_total_ms': round(fila['tiempo_ms'], 1),
+                'consultas_promedio': round(fila['consultas'] / n, 1),
+                'consultas_max': fila['consultas_max'],
+                'sql_promedio_ms': round(fila['sql_ms'] / n, 1),
+                'sobre_umbral': fila['sobre_umbral'],
+                'sentencias_lentas': [{'ms': ms, 'sql': sql} for ms, sql in fila['sentencias']],
+            })
+        return filas
+
+    def limpiar_local(self):
+        with self._lock:
+            self._minuto, self._vistas = None, {}
+
+
+# Instancia única por proceso
+agregados_peticiones = AgregadosPeticiones()
+
+
+# ============================================================
+# 3. MIDDLEWARE
+# ============================================================
+
+class InstrumentacionMiddleware:
+    """
+    Mide una muestra de las peticiones (INSTRUMENTACION_MUESTREO): vista, tiempo total, número de
+    consultas SQL, tiempo en SQL y las sentencias más lentas. Registra en el log las que pasan los
+    umbrales y acumula los agregados que sirve /api/instrumentacion/.
+    Va primero en MIDDLEWARE para que el tiempo incluya la sesión y la autenticación.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.es_async = iscoroutinefunction(get_response)
+        if self.es_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.es_async:
+            return self.__acall__(request)
+        if not self._muestrear():
+            return self.get_response(request)
+        medicion, token = self._iniciar()
+        try:
+            response = self.get_response(request)
+        finally:
+            _medicion_actual.reset(token)
+        self._terminar(request, response, medicion)
+        return response
+
+    async def __acall__(self, request):
+        if not self._muestrear():
+            return await self.get_response(request)
+        medicion, token = self._iniciar()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _medicion_actual.reset(token)
+        self._terminar(request, response, medicion)
+        return response
+
+    @staticmethod
+    def _muestrear():
+        tasa = tasa_muestreo()
+        return tasa >= 1 or (tasa > 0 and random.random() < tasa)
+
+    @staticmethod
+    def _iniciar():
+        instalar_medicion_sql()
+        medicion = _Medicion()
+        return medicion, _medicion_actual.set(medicion)
+
+    @staticmethod
+    def _terminar(request, response, medicion):
+        segundos = time.perf_counter() - medicion.inicio
+        resolver_match = getattr(request, 'resolver_match', None)
+        vista = f"{request.method} {resolver_match.view_name if resolver_match else 'sin_vista'}"
+        umbral_ms, umbral_consultas = umbrales()
+        sobre_umbral = segundos * 1000 >= umbral_ms or medicion.consultas >= umbral_consultas
+        if sobre_umbral:
+            lentas = sorted(medicion.lentas, reverse=True)[:3]
+            logger.warning(
+                "%s %s -> %s: %.0f ms, %d consultas SQL (%.0f ms). Más lentas: %s",
+                vista, request.path, response.status_code, segundos * 1000, medicion.consultas, medicion.sql * 1000,
+                " | ".join(f"{s * 1000:.1f} ms {sql[:200]}" for s, sql in lentas) or "-",
+            )
+        agregados_peticiones.registrar(vista, segundos, medicion, sobre_umbral)
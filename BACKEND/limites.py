@@ -0,0 +1,129 @@
+# BACKEND/limites.py
+
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+from FRONTEND.models import normalizar_email
+
+# Cubetas de fichas: (capacidad, segundos para recuperar una ficha)
+# Por email: 5 intentos seguidos y luego 1 por minuto. Por IP: 20 seguidos y luego 1 cada 6 s.
+LIMITE_LOGIN_EMAIL = (5, 60.0)
+LIMITE_LOGIN_IP = (20, 6.0)
+
+# Máximo de claves que recuerda cada proceso
+MAX_CLAVES_LOCALES = 10000
+
+
+class AlmacenCubetas:
+    """
+    Estado de las cubetas en dos niveles:
+    - En el proceso (LRU acotado): los intentos de una clave ya bloqueada se rechazan
+      sin tocar la caché compartida.
+    - En la caché de Django: todos los workers comparten el mismo límite.
+
+    Cada cubeta se guarda como un solo número, el "tiempo teórico de llegada" (GCRA),
+    que equivale a una cubeta de fichas con recarga continua. Se toma el mayor de los
+    dos niveles, así el límite se mantiene aunque la caché compartida pierda la clave.
+    La lectura y escritura en la caché no es atómica: bajo concurrencia pueden colarse
+    unos pocos intentos de más (tantos como workers atiendan la misma clave a la vez).
+    """
+
+    def __init__(self, prefijo='limite'):
+        self.prefijo = prefijo
+        self._locales = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _clave(self, nombre):
+        return f'{self.prefijo}:{nombre}'
+
+    def _leer_local(self, clave):
+        with self._lock:
+            tat = self._locales.get(clave)
+            if tat is not None:
+                self._locales.move_to_end(clave)
+            return tat
+
+    def _escribir_local(self, clave, tat):
+        with self._lock:
+            self._locales[clave] = tat
+            self._locales.move_to_end(clave)
+            while len(self._locales) > MAX_CLAVES_LOCALES:
+                self._locales.popitem(last=False)
+
+    def consumir(self, cubetas, ahora=None):
+        """
+        Intenta tomar una ficha de cada cubeta [(nombre, capacidad, segundos_por_ficha), ...].
+        Todo o nada: si alguna está vacía no se consume ninguna.
+        Devuelve 0 si se permite el intento o los segundos que faltan para el siguiente.
+        """
+        ahora = time.time() if ahora is None else ahora
+        claves = [self._clave(nombre) for nombre, _, _ in cubetas]
+
+        # 1. Rechazo local: no hace falta ir a la caché compartida
+        espera = 0.0
+        for clave, (_, capacidad, intervalo) in zip(claves, cubetas):
+            tat = self._leer_local(clave)
+            if tat is not None:
+                espera = max(espera, tat - intervalo * (capacidad - 1) - ahora)
+        if espera > 0:
+            return espera
+
+        # 2. Estado compartido entre workers (una sola ida a la caché)
+        compartidos = cache.get_many(claves)
+        nuevos = {}
+        for clave, (_, capacidad, intervalo) in zip(claves, cubetas):
+            tat = max(compartidos.get(clave, ahora), self._leer_local(clave) or ahora, ahora)
+            tolerancia = intervalo * (capacidad - 1)
+            if tat - ahora > tolerancia:
+                self._escribir_local(clave, tat)
+                espera = max(espera, tat - tolerancia - ahora)
+            nuevos[clave] = tat + intervalo
+        if espera > 0:
+            return espera
+
+        for clave, tat in nuevos.items():
+            self._escribir_local(clave, tat)
+            cache.set(clave, tat, math.ceil(tat - ahora) + 1)
+        return 0
+
+    def reiniciar(self, nombre):
+        clave = self._clave(nombre)
+        with self._lock:
+            self._locales.pop(clave, None)
+        cache.delete(clave)
+
+    def limpiar_local(self):
+        with self._lock:
+            self._locales.clear()
+
+
+# Instancia única por proceso
+cubetas_login = AlmacenCubetas('limite:login')
+
+
+def _cubetas_login(email, ip):
+    return [
+        (f'email:{normalizar_email(email) or ""}', *LIMITE_LOGIN_EMAIL),
+        (f'ip:{ip}', *LIMITE_LOGIN_IP),
+    ]
+
+
+def limitar_intento_login(request, email):
+    """
+    Consume una ficha del email y otra de la IP antes de verificar la contraseña.
+    Devuelve 0 si el intento puede seguir, o los segundos de espera si está bloqueado.
+    """
+    if not getattr(settings, 'LIMITAR_INTENTOS_LOGIN', True):
+        return 0
+    # REMOTE_ADDR y no X-Forwarded-For: esa cabecera la controla el cliente
+    return cubetas_login.consumir(_cubetas_login(email, request.META.get('REMOTE_ADDR', '')))
+
+
+def login_exitoso(email):
+    """El dueño de la cuenta entró: se devuelve su cubeta de email (la de la IP se mantiene)."""
+    cubetas_login.reiniciar(f'email:{normalizar_email(email) or ""}')
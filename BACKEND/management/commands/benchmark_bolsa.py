@@ -0,0 +1,109 @@
+import random
+import statistics
+import time
+from datetime import date
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory
+from django.utils import timezone
+
+from BACKEND.bolsa import cubetas_conductor, paginar_bolsa
+from BACKEND.distancias import motor_distancias
+from FRONTEND.models import Envios, Pedidos, Usuarios
+
+# (tipo de vehículo, latitud, longitud) de los conductores medidos
+CONDUCTORES = (
+    ('MOTO', 4.65, -74.06),
+    ('CAMIONETA', 4.74, -74.08),
+    ('CAMION_GRANDE', 4.62, -74.19),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Llena la bolsa de pendientes hasta --tamanos pedidos y mide la consulta de la bolsa del conductor "
+        "(cubetas por zona y clase de vehículo) frente a la bolsa global que cargaba el dashboard. "
+        "Los datos de prueba se crean en una transacción que se revierte."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tamanos', default='1000,10000,100000', help="Tamaños de la bolsa a medir, separados por coma.")
+        parser.add_argument('--repeticiones', type=int, default=20, help="Se reporta la mediana de N consultas.")
+        parser.add_argument('--semilla', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['semilla'])
+        tamanos = sorted(int(t) for t in options['tamanos'].split(','))
+        motor_distancias.zona('')  # Carga la matriz antes de medir
+        localidades = motor_distancias.nombres
+
+        with transaction.atomic():
+            minorista = Usuarios.objects.create_user('minorista@benchmark.bogocargo.co', 'x', nombre='M', tipo='MINORISTA')
+            conductores = [self._conductor(i, tipo, lat, lon, minorista) for i, (tipo, lat, lon) in enumerate(CONDUCTORES)]
+            factory = RequestFactory()
+
+            creados = Pedidos.objects.filter(estado='PENDIENTE').count()
+            self.stdout.write(f"{'Bolsa':>8} | " + " | ".join(f"{c.tipo_vehiculo:>14}" for c in conductores) + " | bolsa global")
+            for tamano in tamanos:
+                while creados < tamano:
+                    lote = min(5000, tamano - creados)
+                    self._sembrar(lote, minorista, localidades, rng)
+                    creados += lote
+
+                tiempos = []
+                for conductor in conductores:
+                    cubetas = cubetas_conductor(conductor)
+                    primera = paginar_bolsa(cubetas, factory.get('/'))
+                    profunda = factory.get('/' + primera.next_url) if primera.has_next else factory.get('/')
+                    tiempos.append(self._mediana(
+                        lambda: (list(paginar_bolsa(cubetas, factory.get('/'))), list(paginar_bolsa(cubetas, profunda))),
+                        options['repeticiones'],
+                    ) / 2)
+                # Lo que hacía el dashboard: toda la bolsa, a cualquier conductor
+                global_ = self._mediana(
+                    lambda: list(Pedidos.objects.filter(estado='PENDIENTE').order_by('-fecha_creacion')), 3,
+                )
+                self.stdout.write(f"{creados:>8} | " + " | ".join(f"{t * 1000:>11.2f} ms" for t in tiempos) +
+                                  f" | {global_ * 1000:.0f} ms")
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS(
+            "La bolsa por cubetas lee a lo sumo (tamaño de página + 1) claves por cubeta: su tiempo no depende del total."
+        ))
+
+    @staticmethod
+    def _conductor(i, tipo, lat, lon, minorista):
+        conductor = Usuarios.objects.create_user(f'conductor{i}@benchmark.bogocargo.co', 'x', nombre=f'C{i}',
+                                                 tipo='CONDUCTOR', tipo_vehiculo=tipo)
+        pedido = Pedidos.objects.create(minorista=minorista, conductor=conductor, estado='EN_RUTA', tipo_mercancia='SECAS',
+                                        peso_total=1, volumen=1, origen='Origen', destino='Destino',
+                                        fecha_recoleccion=date.today())
+        Envios.objects.create(pedido=pedido, conductor=conductor, estado='EN_RUTA',
+                              ultima_ubicacion=f'{lat},{lon}', ultima_fecha_rastreo=timezone.now())
+        return conductor
+
+    @staticmethod
+    def _sembrar(cantidad, minorista, localidades, rng):
+        pedidos = []
+        for _ in range(cantidad):
+            # Mayoría de paquetes pequeños, cola de cargas pesadas
+            peso = Decimal(round(rng.lognormvariate(3, 1.6), 2)).quantize(Decimal('0.01'))
+            volumen = (peso / 250).quantize(Decimal('0.01'))
+            origen = f"Calle {rng.randint(1, 200)}, {rng.choice(localidades)}"
+            pedidos.append(Pedidos(
+                minorista=minorista, tipo_mercancia='SECAS', peso_total=min(peso, Decimal('99999')),
+                volumen=min(volumen, Decimal('9999')), origen=origen, destino='Destino',
+                fecha_recoleccion=date.today(), zona_origen=motor_distancias.zona(origen),
+            ))
+        Pedidos.objects.bulk_create(pedidos, batch_size=1000)
+
+    @staticmethod
+    def _mediana(funcion, repeticiones):
+        tiempos = []
+        for _ in range(max(1, repeticiones)):
+            inicio = time.perf_counter()
+            funcion()
+            tiempos.append(time.perf_counter() - inicio)
+        return statistics.median(tiempos)
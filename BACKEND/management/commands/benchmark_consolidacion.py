@@ -0,0 +1,61 @@
+import random
+import time
+from collections import Counter
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from BACKEND.consolidacion import proponer_cargas
+from FRONTEND.models import CargaConsolidada, Pedidos, Usuarios
+
+
+class Command(BaseCommand):
+    help = (
+        "Crea --pedidos pendientes para un mismo día repartidos entre --mayoristas orígenes y mide "
+        "proponer_cargas (lectura, empaque y escritura de las cargas). "
+        "Los datos de prueba se crean en una transacción que se revierte."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pedidos', type=int, default=5000)
+        parser.add_argument('--mayoristas', type=int, default=20)
+        parser.add_argument('--semilla', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['semilla'])
+        # Un día sin otros pedidos, para medir solo los sembrados
+        fecha = date.today() + timedelta(days=3650)
+
+        with transaction.atomic():
+            minorista = Usuarios.objects.create_user('minorista@benchmark.bogocargo.co', 'x', nombre='M', tipo='MINORISTA')
+            Pedidos.objects.bulk_create(
+                [self._pedido(minorista, fecha, options['mayoristas'], rng) for _ in range(options['pedidos'])],
+                batch_size=1000,
+            )
+
+            inicio = time.perf_counter()
+            resumen = proponer_cargas(fecha)
+            segundos = time.perf_counter() - inicio
+            vehiculos = Counter(CargaConsolidada.objects.filter(fecha_recoleccion=fecha).values_list('tipo_vehiculo', flat=True))
+            transaction.set_rollback(True)
+
+        self.stdout.write(
+            f"{options['pedidos']} pedidos de {options['mayoristas']} orígenes en {segundos:.2f} s: "
+            f"{resumen['cargas']} cargas con {resumen['pedidos']} pedidos, {resumen['viajes_ahorrados']} viajes menos, "
+            f"{resumen['sin_vehiculo']} sin vehículo."
+        )
+        self.stdout.write("Vehículos: " + ", ".join(f"{tipo} {total}" for tipo, total in vehiculos.most_common()))
+
+    @staticmethod
+    def _pedido(minorista, fecha, mayoristas, rng):
+        # Mayoría de cajas pequeñas, algunas estibas
+        lado = rng.choice((0.2, 0.3, 0.4, 0.5, 0.6, 1.0, 1.2))
+        unidades = rng.choice((1, 1, 2, 4, 10, 30))
+        peso = Decimal(round(min(rng.lognormvariate(3, 1.3) * unidades, 9000), 2)).quantize(Decimal('0.01'))
+        return Pedidos(
+            minorista=minorista, tipo_mercancia='SECAS', peso_total=peso, volumen=Decimal('0.01'),
+            unidades=unidades, largo=lado, ancho=lado, alto=round(lado * rng.uniform(0.5, 1.2), 2),
+            origen=f"Bodega {rng.randrange(mayoristas)}, Bogotá", destino='Destino', fecha_recoleccion=fecha,
+        )
@@ -0,0 +1,64 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from BACKEND.cotizacion import RISK_FACTOR_MAP, calcular_precio_envio, cotizar_lote, np
+
+
+class Command(BaseCommand):
+    help = "Compara la cotización escalar (Decimal, un envío a la vez) contra el lote vectorizado y verifica que coincidan."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--envios', type=int, default=10000, help="Cantidad de envíos sintéticos.")
+        parser.add_argument('--repeticiones', type=int, default=3, help="Se reporta el mejor tiempo de N corridas.")
+        parser.add_argument('--semilla', type=int, default=42)
+
+    def handle(self, *args, **options):
+        if np is None:
+            raise CommandError("NumPy no está instalado: el lote usaría la misma ruta escalar.")
+
+        rng = random.Random(options['semilla'])
+        tipos = list(RISK_FACTOR_MAP)
+        envios = [
+            {
+                'peso_total': str(round(rng.uniform(0.5, 2000), 2)),
+                'unidades': str(rng.randint(1, 50)),
+                'largo': str(round(rng.uniform(0.1, 3), 2)),
+                'alto': str(round(rng.uniform(0.1, 3), 2)),
+                'ancho': str(round(rng.uniform(0.1, 3), 2)),
+                'tipo_mercancia': rng.choice(tipos),
+            }
+            for _ in range(options['envios'])
+        ]
+        factores = [1.0 + rng.random() * 0.5 for _ in envios]
+
+        def escalar():
+            return [calcular_precio_envio(e, f) for e, f in zip(envios, factores)]
+
+        def lote():
+            return cotizar_lote(envios, factores)
+
+        t_escalar, esperado = self._medir(escalar, options['repeticiones'])
+        t_lote, (precios, volumenes) = self._medir(lote, options['repeticiones'])
+
+        obtenido = [(p, v) for p, v in zip(precios, volumenes)]
+        esperado = [(int(p), int(v.scaleb(2))) for p, v in esperado]
+        if obtenido != esperado:
+            diferentes = sum(a != b for a, b in zip(obtenido, esperado))
+            raise CommandError(f"El lote difiere de la función escalar en {diferentes} envíos.")
+
+        n = len(envios)
+        self.stdout.write(f"Escalar: {t_escalar * 1000:.1f} ms ({n / t_escalar:,.0f} envíos/s)")
+        self.stdout.write(f"Lote:    {t_lote * 1000:.1f} ms ({n / t_lote:,.0f} envíos/s)")
+        self.stdout.write(self.style.SUCCESS(f"{n} cotizaciones idénticas; aceleración x{t_escalar / t_lote:.1f}"))
+
+    @staticmethod
+    def _medir(funcion, repeticiones):
+        mejor, resultado = None, None
+        for _ in range(max(1, repeticiones)):
+            inicio = time.perf_counter()
+            resultado = funcion()
+            duracion = time.perf_counter() - inicio
+            mejor = duracion if mejor is None else min(mejor, duracion)
+        return mejor, resultado
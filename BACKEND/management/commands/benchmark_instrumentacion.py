@@ -0,0 +1,73 @@
+import statistics
+import time
+from datetime import date
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from BACKEND.instrumentacion import agregados_peticiones
+from FRONTEND.models import Pedidos, Usuarios
+
+# (rol que visita, nombre de la URL)
+PAGINAS = (
+    ('MINORISTA', 'frontend:dashboard_minorista'),
+    ('MINORISTA', 'frontend:listar_pedidos'),
+    ('ADMIN', 'frontend:pedidos_crud_admin'),
+)
+MUESTREOS = (0, 0.1, 1.0)
+
+# Caché propia del benchmark: cache.clear() no debe vaciar la compartida (con REDIS_URL, la de producción)
+CACHE_BENCHMARK = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'benchmark-instrumentacion'}}
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide la mediana por petición de algunas vistas con la instrumentación apagada, con el muestreo "
+        "por defecto (0.1) y midiendo todas las peticiones. Los datos de prueba se crean en una "
+        "transacción que se revierte."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--peticiones', type=int, default=300, help="Peticiones por vista y muestreo.")
+        parser.add_argument('--pedidos', type=int, default=500, help="Pedidos del minorista de prueba.")
+
+    @override_settings(CACHES=CACHE_BENCHMARK)
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            clientes = {}
+            for rol in ('MINORISTA', 'ADMIN'):
+                usuario = Usuarios.objects.create_user(f'{rol.lower()}@benchmark.bogocargo.co', 'x', nombre=rol, tipo=rol)
+                clientes[rol] = Client()
+                clientes[rol].force_login(usuario)
+            minorista = Usuarios.objects.get(email='minorista@benchmark.bogocargo.co')
+            Pedidos.objects.bulk_create([
+                Pedidos(minorista=minorista, tipo_mercancia='SECAS', peso_total=5, volumen=1, origen='Origen',
+                        destino=f'Calle {i} # 10-20', fecha_recoleccion=date.today())
+                for i in range(options['pedidos'])
+            ], batch_size=1000)
+
+            self.stdout.write(f"{'Vista':<32} | " + " | ".join(f"{f'muestreo {m}':>13}" for m in MUESTREOS) + " | sobrecosto (1.0)")
+            for rol, nombre in PAGINAS:
+                tiempos = self._medianas(clientes[rol], reverse(nombre), options['peticiones'])
+                self.stdout.write(f"{nombre:<32} | " + " | ".join(f"{t * 1000:>10.2f} ms" for t in tiempos) +
+                                  f" | {(tiempos[-1] / tiempos[0] - 1) * 100:+.1f}%")
+            transaction.set_rollback(True)
+        cache.clear()
+        agregados_peticiones.limpiar_local()
+
+    @staticmethod
+    def _medianas(cliente, url, peticiones):
+        # Los muestreos se alternan petición a petición: el ruido de la máquina afecta a todos por igual
+        cliente.get(url)  # Calienta plantillas y caché
+        tiempos = {muestreo: [] for muestreo in MUESTREOS}
+        for _ in range(max(1, peticiones)):
+            for muestreo in MUESTREOS:
+                with override_settings(INSTRUMENTACION_MUESTREO=muestreo):
+                    inicio = time.perf_counter()
+                    respuesta = cliente.get(url)
+                    tiempos[muestreo].append(time.perf_counter() - inicio)
+        assert respuesta.status_code == 200, f"{url}: {respuesta.status_code}"
+        return [statistics.median(tiempos[muestreo]) for muestreo in MUESTREOS]
@@ -0,0 +1,67 @@
+import logging
+import time
+from collections import Counter
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from BACKEND.limites import cubetas_login
+from FRONTEND.models import Usuarios
+
+# Caché propia del benchmark: cache.clear() no debe vaciar la compartida (con REDIS_URL, la de producción)
+CACHE_BENCHMARK = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'benchmark-login'}}
+
+
+class Command(BaseCommand):
+    help = (
+        "Reproduce un ataque de relleno de credenciales contra login_view y mide el CPU del worker "
+        "sin y con el límite de intentos. Los usuarios de prueba se crean en una transacción que se revierte."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--intentos', type=int, default=60, help="Intentos fallidos del ataque.")
+        parser.add_argument('--cuentas', type=int, default=3, help="Cuentas reales atacadas.")
+        parser.add_argument('--ips', type=int, default=2, help="IPs de origen del ataque.")
+
+    @override_settings(CACHES=CACHE_BENCHMARK)
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            emails = [f'victima{i}@benchmark.bogocargo.co' for i in range(options['cuentas'])]
+            for email in emails:
+                Usuarios.objects.create_user(email, 'clave-real-123', nombre='Víctima', tipo='MINORISTA')
+
+            # Cada 429 se registra como advertencia en django.request: se silencia durante la medición
+            logging.getLogger('django.request').setLevel(logging.ERROR)
+            ataque = [
+                (emails[i % len(emails)], f'203.0.113.{i % options["ips"] + 1}')
+                for i in range(options['intentos'])
+            ]
+            with override_settings(LIMITAR_INTENTOS_LOGIN=False):
+                sin_limite = self._replay(ataque)
+            con_limite = self._replay(ataque)
+            transaction.set_rollback(True)
+
+        for titulo, (cpu, pared, estados) in (("Sin límite", sin_limite), ("Con límite", con_limite)):
+            self.stdout.write(
+                f"{titulo}: CPU {cpu:.2f} s, tiempo {pared:.2f} s, "
+                f"{cpu / len(ataque) * 1000:.1f} ms CPU/intento, respuestas {dict(estados)}"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"El límite ahorra {(1 - con_limite[0] / sin_limite[0]) * 100:.0f}% del CPU del worker durante el ataque."
+        ))
+
+    def _replay(self, ataque):
+        cubetas_login.limpiar_local()
+        cache.clear()
+        url = reverse('frontend:login')
+        clientes = {}
+        estados = Counter()
+        cpu, pared = time.process_time(), time.perf_counter()
+        for email, ip in ataque:
+            cliente = clientes.setdefault(ip, Client(REMOTE_ADDR=ip))
+            respuesta = cliente.post(url, {'email': email, 'password': 'adivinanza'})
+            estados[respuesta.status_code] += 1
+        return time.process_time() - cpu, time.perf_counter() - pared, estados
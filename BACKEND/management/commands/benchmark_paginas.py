@@ -0,0 +1,65 @@
+import statistics
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from FRONTEND.models import Usuarios
+
+# (rol que visita o None para anónimo, nombre de la URL)
+PAGINAS = (
+    (None, 'frontend:index'),
+    (None, 'frontend:servicios'),
+    (None, 'frontend:mi_cuenta'),
+    ('MINORISTA', 'frontend:dashboard_minorista'),
+    ('CONDUCTOR', 'frontend:dashboard_conductor'),
+    ('ADMIN', 'frontend:usuarios_list'),
+)
+
+# Caché propia del benchmark: cache.clear() no debe vaciar la compartida (con REDIS_URL, la de producción)
+CACHE_BENCHMARK = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'benchmark-paginas'}}
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide la mediana por petición de las páginas públicas y los dashboards sin y con la caché de "
+        "páginas y fragmentos. Los usuarios de prueba se crean en una transacción que se revierte."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--peticiones', type=int, default=200, help="Peticiones por página y modo.")
+
+    @override_settings(CACHES=CACHE_BENCHMARK)
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            clientes = {None: Client()}
+            for rol in ('MINORISTA', 'CONDUCTOR', 'ADMIN'):
+                usuario = Usuarios.objects.create_user(f'{rol.lower()}@benchmark.bogocargo.co', 'x', nombre=rol, tipo=rol)
+                clientes[rol] = Client()
+                clientes[rol].force_login(usuario)
+
+            self.stdout.write(f"{'Página':<42} | {'sin caché':>10} | {'con caché':>10}")
+            for rol, nombre in PAGINAS:
+                url = reverse(nombre)
+                with override_settings(CACHE_PAGINAS_SEGUNDOS=0):
+                    sin_cache = self._mediana(clientes[rol], url, options['peticiones'])
+                con_cache = self._mediana(clientes[rol], url, options['peticiones'])
+                self.stdout.write(f"{nombre + (f' ({rol.lower()})' if rol else ''):<42} | "
+                                  f"{sin_cache * 1000:>7.2f} ms | {con_cache * 1000:>7.2f} ms")
+            transaction.set_rollback(True)
+        cache.clear()
+
+    @staticmethod
+    def _mediana(cliente, url, peticiones):
+        cache.clear()
+        cliente.get(url)  # Calienta plantillas y caché
+        tiempos = []
+        for _ in range(max(1, peticiones)):
+            inicio = time.perf_counter()
+            respuesta = cliente.get(url)
+            tiempos.append(time.perf_counter() - inicio)
+        assert respuesta.status_code == 200, f"{url}: {respuesta.status_code}"
+        return statistics.median(tiempos)
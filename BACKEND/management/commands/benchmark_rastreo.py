@@ -0,0 +1,94 @@
+import json
+import random
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import Client
+from django.urls import reverse
+
+from BACKEND import rastreo
+from FRONTEND.models import Envios, Pedidos, RastreoEnvio, Usuarios
+
+
+class Command(BaseCommand):
+    help = (
+        "Simula una flota reportando ubicaciones por lotes contra el endpoint de rastreo y mide los puntos "
+        "por segundo sostenidos, frente a un save() por punto. Los datos de prueba se revierten al final."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--conductores', type=int, default=50, help="Conductores de la flota simulada.")
+        parser.add_argument('--peticiones', type=int, default=400, help="Peticiones totales al endpoint.")
+        parser.add_argument('--puntos', type=int, default=100, help="Puntos por petición (lote del celular).")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            clientes = self._flota(options['conductores'])
+            lotes = [
+                self._lote(*random.choice(clientes)[1:], options['puntos'])
+                for _ in range(options['peticiones'])
+            ]
+
+            original = rastreo.buffer_rastreo
+            # Sin temporizador: escribiría desde otro hilo, fuera de esta transacción
+            rastreo.buffer_rastreo = rastreo.BufferRastreo(vaciado_periodico=False)
+            try:
+                url = reverse('backend:rastreo_puntos')
+                cliente_por_envio = {envio: cliente for cliente, _, envio in clientes}
+                inicio = time.perf_counter()
+                for lote in lotes:
+                    respuesta = cliente_por_envio[lote[0]['envio']].post(url, json.dumps({'puntos': lote}),
+                                                                        content_type='application/json')
+                    assert respuesta.status_code == 202, respuesta.content
+                rastreo.buffer_rastreo.vaciar()
+                endpoint = time.perf_counter() - inicio
+            finally:
+                rastreo.buffer_rastreo = original
+            total = len(lotes) * options['puntos']
+            assert RastreoEnvio.objects.count() >= total
+
+            # Referencia: el mismo volumen de puntos, con un save() por punto (sin HTTP)
+            muestra = lotes[:max(1, len(lotes) // 10)]
+            inicio = time.perf_counter()
+            for lote in muestra:
+                conductor = Envios.objects.get(pk=lote[0]['envio']).conductor
+                for r in rastreo.construir_puntos(conductor, lote)[0]:
+                    with transaction.atomic():
+                        r.save()
+            por_punto = (time.perf_counter() - inicio) / (len(muestra) * options['puntos'])
+            transaction.set_rollback(True)
+
+        self.stdout.write(
+            f"Endpoint con búfer: {total} puntos en {endpoint:.2f} s = {total / endpoint:,.0f} puntos/s "
+            f"({len(lotes) / endpoint:,.0f} peticiones/s de {options['puntos']} puntos)"
+        )
+        self.stdout.write(f"save() por punto: {1 / por_punto:,.0f} puntos/s (solo escritura, sin HTTP)")
+        self.stdout.write(self.style.SUCCESS(
+            f"Con lotes se sostienen {total / endpoint * por_punto:.1f}x los puntos por segundo de un save() por punto."
+        ))
+
+    def _flota(self, n):
+        minorista = Usuarios.objects.create_user('minorista@benchmark.bogocargo.co', 'x', nombre='M', tipo='MINORISTA')
+        clientes = []
+        for i in range(n):
+            conductor = Usuarios.objects.create_user(f'conductor{i}@benchmark.bogocargo.co', 'x', nombre=f'C{i}',
+                                                     tipo='CONDUCTOR')
+            pedido = Pedidos.objects.create(minorista=minorista, conductor=conductor, estado='EN_RUTA', tipo_mercancia='SECAS',
+                                            peso_total=1, volumen=1, origen='Origen', destino='Destino',
+                                            fecha_recoleccion=date.today())
+            envio = Envios.objects.create(pedido=pedido, conductor=conductor, estado='EN_RUTA')
+            cliente = Client()
+            cliente.force_login(conductor)
+            clientes.append((cliente, envio.pk, envio.pk))
+        return clientes
+
+    @staticmethod
+    def _lote(envio, _, n):
+        lat, lon = 4.6 + random.random() * 0.2, -74.15 + random.random() * 0.1
+        ahora_ms = int(time.time() * 1000)
+        return [
+            {'envio': envio, 'lat': lat + i * 1e-5, 'lon': lon + i * 1e-5, 'fecha_hora': ahora_ms - (n - i) * 3000}
+            for i in range(n)
+        ]
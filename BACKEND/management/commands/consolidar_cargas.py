@@ -0,0 +1,26 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from BACKEND.consolidacion import proponer_cargas
+
+
+class Command(BaseCommand):
+    help = (
+        "Propone las cargas consolidadas de un día: agrupa los pedidos pendientes del mismo origen "
+        "en viajes y deja las propuestas para que el admin las apruebe."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fecha', help="Día de recolección (AAAA-MM-DD). Por defecto, mañana.")
+
+    def handle(self, *args, **options):
+        try:
+            fecha = date.fromisoformat(options['fecha']) if options['fecha'] else date.today() + timedelta(days=1)
+        except ValueError:
+            raise CommandError("--fecha debe tener el formato AAAA-MM-DD.")
+        resumen = proponer_cargas(fecha)
+        self.stdout.write(self.style.SUCCESS(
+            f"{fecha}: {resumen['cargas']} cargas propuestas con {resumen['pedidos']} pedidos "
+            f"({resumen['viajes_ahorrados']} viajes menos, {resumen['sin_vehiculo']} pedidos sin vehículo)."
+        ))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from BACKEND.distancias import motor_distancias
+
+
+class Command(BaseCommand):
+    help = "Recalcula la matriz de distancias entre localidades a partir de la red vial y la deja en la caché mapeada en memoria."
+
+    def handle(self, *args, **options):
+        motor_distancias.reconstruir()
+        n = motor_distancias.n
+        mas_lejana = max(
+            ((motor_distancias.metros_entre_zonas(i, j), i, j) for i in range(n) for j in range(n) if i != j),
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Matriz de {n}×{n} zonas en {motor_distancias.ruta_cache_usada}. "
+            f"Ruta más larga: {motor_distancias.nombres[mas_lejana[1]]} → {motor_distancias.nombres[mas_lejana[2]]} "
+            f"({mas_lejana[0] / 1000:.1f} km)."
+        ))
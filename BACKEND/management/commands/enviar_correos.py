@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from BACKEND.correos import enviar_lote
+
+
+class Command(BaseCommand):
+    help = "Despacha la bandeja de salida de correos (EmailOutbox) en lotes, con reintentos y espera exponencial."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=100, help="Correos enviados por conexión SMTP.")
+        parser.add_argument('--continuo', action='store_true', help="Seguir drenando la cola indefinidamente.")
+        parser.add_argument('--intervalo', type=float, default=5.0, help="Segundos de espera cuando la cola está vacía.")
+
+    def handle(self, *args, **options):
+        total_enviados = total_fallidos = 0
+        while True:
+            enviados, fallidos = enviar_lote(options['lote'])
+            total_enviados += enviados
+            total_fallidos += fallidos
+            if enviados or fallidos:
+                self.stdout.write(f"Lote: {enviados} enviados, {fallidos} fallidos.")
+                continue
+            if not options['continuo']:
+                break
+            time.sleep(options['intervalo'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Cola drenada: {total_enviados} enviados, {total_fallidos} con error (se reintentarán)."
+        ))
@@ -0,0 +1,44 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from BACKEND.importacion import TAMANO_LOTE, ArchivoInvalido, importar_pedidos
+from FRONTEND.models import Usuarios, normalizar_email
+
+
+class Command(BaseCommand):
+    help = "Importa pedidos de un minorista desde un archivo CSV o XLSX."
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help="Ruta del archivo .csv o .xlsx")
+        parser.add_argument('--minorista', required=True, help="Email del minorista dueño de los pedidos")
+        parser.add_argument('--lote', type=int, default=TAMANO_LOTE, help="Pedidos por transacción")
+        parser.add_argument('--reporte', help="Ruta donde guardar los errores por fila (JSON)")
+
+    def handle(self, *args, **options):
+        try:
+            minorista = Usuarios.objects.get(email_normalizado=normalizar_email(options['minorista']), tipo='MINORISTA')
+        except Usuarios.DoesNotExist:
+            raise CommandError(f"No existe un minorista con email {options['minorista']}.")
+
+        inicio = time.perf_counter()
+        try:
+            with open(options['archivo'], 'rb') as archivo:
+                resultado = importar_pedidos(archivo, options['archivo'], minorista, tamano_lote=options['lote'])
+        except (OSError, ArchivoInvalido) as e:
+            raise CommandError(str(e))
+        duracion = time.perf_counter() - inicio
+
+        errores = resultado['errores']
+        for error in errores[:20]:
+            self.stdout.write(f"  Fila {error['fila']}: {error['errores']}")
+        if len(errores) > 20:
+            self.stdout.write(f"  ... y {len(errores) - 20} filas más con errores")
+        if options['reporte']:
+            with open(options['reporte'], 'w', encoding='utf-8') as salida:
+                json.dump(errores, salida, ensure_ascii=False, indent=2)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado['creados']} pedidos creados, {len(errores)} filas con errores ({duracion:.1f} s)."
+        ))
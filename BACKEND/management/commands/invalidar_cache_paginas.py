@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from BACKEND.cache_paginas import invalidar_cache_paginas
+
+
+class Command(BaseCommand):
+    help = "Descarta las páginas públicas y fragmentos de la interfaz en caché (ejecutar tras cada despliegue)."
+
+    def handle(self, *args, **options):
+        invalidar_cache_paginas()
+        self.stdout.write(self.style.SUCCESS("Caché de páginas y fragmentos invalidada."))
@@ -0,0 +1,36 @@
+import calendar
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from BACKEND.facturas_pdf import TAMANO_TAREA, PdfNoDisponible, prerenderizar_periodo
+
+
+class Command(BaseCommand):
+    help = "Genera por adelantado, en paralelo, los PDF de las facturas de un periodo de facturación."
+
+    def add_arguments(self, parser):
+        parser.add_argument('periodo', help="Mes de emisión AAAA-MM, o rango AAAA-MM-DD:AAAA-MM-DD")
+        parser.add_argument('--procesos', type=int, default=None, help="Procesos del pool (por defecto, uno por CPU)")
+        parser.add_argument('--tarea', type=int, default=TAMANO_TAREA, help="Facturas por tarea")
+
+    def handle(self, *args, **options):
+        try:
+            if ':' in options['periodo']:
+                desde, hasta = (date.fromisoformat(p) for p in options['periodo'].split(':'))
+            else:
+                anio, mes = (int(p) for p in options['periodo'].split('-'))
+                desde, hasta = date(anio, mes, 1), date(anio, mes, calendar.monthrange(anio, mes)[1])
+        except ValueError:
+            raise CommandError("Periodo no válido: use AAAA-MM o AAAA-MM-DD:AAAA-MM-DD.")
+
+        inicio = time.perf_counter()
+        try:
+            facturas, generados = prerenderizar_periodo(desde, hasta, options['procesos'], options['tarea'])
+        except PdfNoDisponible as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(
+            f"{facturas} facturas entre {desde} y {hasta}: {generados} PDF generados, "
+            f"{facturas - generados} ya estaban al día ({time.perf_counter() - inicio:.1f} s)."
+        ))
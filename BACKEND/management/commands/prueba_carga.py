@@ -0,0 +1,79 @@
+import json
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from BACKEND.prueba_carga import comparar, ejecutar, limpiar_datos, preparar_datos
+
+
+class Command(BaseCommand):
+    help = (
+        "Prueba de carga contra un servidor en marcha (runserver, gunicorn...) que use esta misma base: "
+        "minoristas que crean pedidos, conductores que consultan la bolsa y aceptan solo los pedidos creados "
+        "en la prueba, y admins que recorren el listado de pedidos. Reporta p50/p95/p99 y peticiones por "
+        "segundo de cada endpoint y "
+        "guarda el resultado en JSON para compararlo con corridas anteriores (--comparar)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help="Dirección del servidor.")
+        parser.add_argument('--minoristas', type=int, default=5)
+        parser.add_argument('--conductores', type=int, default=10)
+        parser.add_argument('--admins', type=int, default=2)
+        parser.add_argument('--duracion', type=float, default=60, help="Segundos de medición.")
+        parser.add_argument('--pausa', type=float, default=1.0,
+                            help="Pausa media entre escenarios de cada usuario, en segundos (0 = sin pausa).")
+        parser.add_argument('--semilla', type=int, default=None)
+        parser.add_argument('--salida', default=str(Path(settings.BASE_DIR) / 'resultados_carga'),
+                            help="Carpeta donde se guarda el JSON de la corrida.")
+        parser.add_argument('--comparar', help="JSON de una corrida anterior para comparar p95 y rps.")
+        parser.add_argument('--limpiar', action='store_true',
+                            help="Al terminar, borra las cuentas de prueba y los pedidos que crearon.")
+
+    def handle(self, *args, **options):
+        anterior = None
+        if options['comparar']:
+            try:
+                anterior = json.loads(Path(options['comparar']).read_text(encoding='utf-8'))
+            except (OSError, ValueError) as e:
+                raise CommandError(f"No se pudo leer {options['comparar']}: {e}")
+
+        cuentas = preparar_datos(options['minoristas'], options['conductores'], options['admins'])
+        if not any(cuentas.values()):
+            raise CommandError("Indique al menos un usuario virtual.")
+        self.stdout.write(f"{sum(map(len, cuentas.values()))} usuarios virtuales contra {options['url']} "
+                          f"durante {options['duracion']:.0f} s...")
+        try:
+            resultado = ejecutar(options['url'], cuentas, options['duracion'], options['pausa'], options['semilla'])
+        finally:
+            if options['limpiar']:
+                self.stdout.write(f"{limpiar_datos()} pedidos de prueba borrados.")
+
+        for fallida in resultado['sesiones_fallidas']:
+            self.stdout.write(self.style.WARNING(f"{fallida['email']} no inició sesión: {fallida['motivo']}."))
+        self.stdout.write(f"{'Endpoint':<36} | {'peticiones':>10} | {'errores':>7} | {'rps':>7} | "
+                          f"{'p50':>9} | {'p95':>9} | {'p99':>9}")
+        for endpoint, fila in resultado['endpoints'].items():
+            self.stdout.write(f"{endpoint:<36} | {fila['peticiones']:>10} | {fila['errores']:>7} | {fila['rps']:>7.2f} | "
+                              + " | ".join(self._ms(fila[f'p{p}_ms']) for p in (50, 95, 99)))
+
+        salida = Path(options['salida'])
+        salida.mkdir(parents=True, exist_ok=True)
+        archivo = salida / f"carga_{time.strftime('%Y%m%d_%H%M%S')}.json"
+        archivo.write_text(json.dumps(resultado, indent=2, ensure_ascii=False), encoding='utf-8')
+        self.stdout.write(self.style.SUCCESS(f"Resultado guardado en {archivo}"))
+
+        if anterior:
+            self.stdout.write(f"\nFrente a {options['comparar']} ({anterior.get('fecha', '?')}):")
+            self.stdout.write(f"{'Endpoint':<36} | {'p95 antes':>9} | {'p95 ahora':>9} | {'cambio':>7} | "
+                              f"{'rps antes':>9} | {'rps ahora':>9}")
+            for endpoint, p95_antes, p95_ahora, cambio, rps_antes, rps_ahora in comparar(resultado, anterior):
+                cambio = f"{cambio:+.1f}%" if cambio is not None else '-'
+                self.stdout.write(f"{endpoint:<36} | {self._ms(p95_antes)} | {self._ms(p95_ahora)} | {cambio:>7} | "
+                                  f"{rps_antes or 0:>9.2f} | {rps_ahora or 0:>9.2f}")
+
+    @staticmethod
+    def _ms(valor):
+        return f"{valor:>6.1f} ms" if valor is not None else f"{'-':>9}"
@@ -0,0 +1,24 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from FRONTEND.models import EventoBolsa
+
+
+class Command(BaseCommand):
+    help = "Elimina los eventos antiguos de la bolsa de pedidos (el stream SSE solo necesita los recientes)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--horas', type=int, default=24, help="Conservar los eventos de las últimas N horas.")
+        parser.add_argument('--lote', type=int, default=5000, help="Filas eliminadas por sentencia.")
+
+    def handle(self, *args, **options):
+        limite = timezone.now() - timedelta(hours=options['horas'])
+        total = 0
+        while True:
+            ids = list(EventoBolsa.objects.filter(fecha__lt=limite).values_list('id', flat=True)[:options['lote']])
+            if not ids:
+                break
+            total += EventoBolsa.objects.filter(id__in=ids).delete()[0]
+        self.stdout.write(self.style.SUCCESS(f"{total} eventos eliminados."))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from BACKEND.estadisticas import reconstruir_contadores
+
+
+class Command(BaseCommand):
+    help = "Recalcula desde cero los contadores del dashboard admin (ContadorEstadistica)."
+
+    def handle(self, *args, **options):
+        filas = reconstruir_contadores()
+        for fila in filas:
+            self.stdout.write(f"  {fila}")
+        self.stdout.write(self.style.SUCCESS(f"{len(filas)} contadores reconstruidos."))
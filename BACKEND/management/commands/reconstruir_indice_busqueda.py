@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from BACKEND.busqueda import reconstruir_indice
+
+
+class Command(BaseCommand):
+    help = "Recalcula desde cero el índice de búsqueda de pedidos (TerminoPedido)."
+
+    def handle(self, *args, **options):
+        total = reconstruir_indice()
+        self.stdout.write(self.style.SUCCESS(f"{total} pedidos indexados."))
@@ -0,0 +1,35 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from FRONTEND.models import Factura
+
+
+class Command(BaseCommand):
+    help = "Marca como VENCIDA las facturas PENDIENTE_PAGO cuya fecha de vencimiento ya pasó."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=5000, help="Facturas actualizadas por sentencia.")
+        parser.add_argument('--fecha', help="Fecha de corte AAAA-MM-DD (por defecto, hoy). Vencen las anteriores a ella.")
+
+    def handle(self, *args, **options):
+        try:
+            hoy = date.fromisoformat(options['fecha']) if options['fecha'] else timezone.localdate()
+        except ValueError:
+            raise CommandError("Fecha no válida: use AAAA-MM-DD.")
+
+        # Rango sobre el índice (estado, fecha_vencimiento); order_by reemplaza el orden por defecto
+        # (-fecha_emision), que obligaría a leer y ordenar todas las facturas pendientes
+        vencidas = Factura.objects.filter(estado='PENDIENTE_PAGO', fecha_vencimiento__lt=hoy).order_by('fecha_vencimiento')
+        total = lotes = 0
+        while True:
+            ids = list(vencidas.values_list('id', flat=True)[:options['lote']])
+            if not ids:
+                break
+            # Cada UPDATE es su propia transacción corta. Se repite la condición de estado:
+            # una factura pagada entre el SELECT y el UPDATE no se marca como vencida.
+            total += Factura.objects.filter(id__in=ids, estado='PENDIENTE_PAGO').update(estado='VENCIDA')
+            lotes += 1
+
+        self.stdout.write(self.style.SUCCESS(f"{total} facturas vencidas al {hoy} en {lotes} lotes."))
@@ -0,0 +1,123 @@
+# BACKEND/pagination.py
+
+import base64
+import binascii
+from datetime import datetime
+
+from django.db.models import Q
+
+# Tamaños de página permitidos para los listados de pedidos
+PAGE_SIZE_DEFAULT = 25
+PAGE_SIZE_MAX = 100
+
+
+def encode_cursor(fecha_creacion, pk):
+    """Codifica la posición (fecha_creacion, id) de una fila en un token opaco para la URL."""
+    raw = f"{fecha_creacion.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """Decodifica un token de cursor. Devuelve (fecha_creacion, id) o None si es inválido."""
+    if not token:
+        return None
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        fecha_raw, pk_raw = base64.urlsafe_b64decode(padded.encode()).decode().split("|", 1)
+        return datetime.fromisoformat(fecha_raw), int(pk_raw)
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        return None
+
+
+def _parse_page_size(value, default=PAGE_SIZE_DEFAULT):
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(size, PAGE_SIZE_MAX))
+
+
+class KeysetPage:
+    """Una página de resultados con los tokens para navegar a la página anterior y siguiente."""
+
+    def __init__(self, items, request, page_size, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.page_size = page_size
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self._request = request
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __bool__(self):
+        return bool(self.items)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+    def _url_with(self, **params):
+        # Conserva los demás parámetros del GET (filtros, búsqueda) y reemplaza los del cursor
+        query = self._request.GET.copy()
+        for key in ("after", "before"):
+            query.pop(key, None)
+        query["size"] = self.page_size
+        for key, value in params.items():
+            query[key] = value
+        return f"?{query.urlencode()}"
+
+    @property
+    def next_url(self):
+        return self._url_with(after=self.next_cursor) if self.has_next else ""
+
+    @property
+    def prev_url(self):
+        return self._url_with(before=self.prev_cursor) if self.has_prev else ""
+
+
+def paginar_por_cursor(queryset, request, page_size=None):
+    """
+    Pagina un queryset de Pedidos por cursor sobre (fecha_creacion, id), del más reciente al más antiguo.
+
+    A diferencia de OFFSET, cada página se resuelve con un rango sobre el índice,
+    por lo que el costo no crece con la profundidad del historial.
+    Parámetros GET: 'after' (página siguiente), 'before' (página anterior) y 'size'.
+    """
+    size = _parse_page_size(request.GET.get("size"), default=page_size or PAGE_SIZE_DEFAULT)
+    after = decode_cursor(request.GET.get("after"))
+    before = decode_cursor(request.GET.get("before"))
+
+    if before and not after:
+        fecha, pk = before
+        rows = list(
+            queryset.filter(Q(fecha_creacion__gt=fecha) | Q(fecha_creacion=fecha, id__gt=pk))
+            .order_by("fecha_creacion", "id")[: size + 1]
+        )
+        has_more = len(rows) > size
+        rows = rows[:size][::-1]
+        has_prev, has_next = has_more, True
+    else:
+        if after:
+            fecha, pk = after
+            queryset = queryset.filter(Q(fecha_creacion__lt=fecha) | Q(fecha_creacion=fecha, id__lt=pk))
+        rows = list(queryset.order_by("-fecha_creacion", "-id")[: size + 1])
+        has_next = len(rows) > size
+        rows = rows[:size]
+        has_prev = after is not None
+
+    next_cursor = prev_cursor = None
+    if rows:
+        if has_next:
+            next_cursor = encode_cursor(rows[-1].fecha_creacion, rows[-1].pk)
+        if has_prev:
+            prev_cursor = encode_cursor(rows[0].fecha_creacion, rows[0].pk)
+
+    return KeysetPage(rows, request, size, next_cursor=next_cursor, prev_cursor=prev_cursor)
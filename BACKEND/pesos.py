@@ -0,0 +1,112 @@
+# BACKEND/pesos.py
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from decimal import Decimal
+
+from django.db.models import Case, DecimalField, Exists, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+
+from FRONTEND.models import DetallePedido, Pedidos, Productos
+
+# Pedidos tocados dentro de edicion_masiva_lineas() (None = mantenimiento incremental normal)
+_pedidos_en_lote = ContextVar('pedidos_en_lote', default=None)
+
+_PESO = DecimalField(max_digits=10, decimal_places=2)
+
+
+def recalcular_peso_total(pedido_ids):
+    """Recalcula desde cero peso_total = Σ(peso_kg × cantidad) de las líneas, en un solo UPDATE."""
+    suma = (
+        DetallePedido.objects.filter(pedido_id=OuterRef('pk'))
+        .order_by().values('pedido_id')
+        .annotate(total=Sum(F('producto__peso_kg') * F('cantidad'), output_field=_PESO))
+        .values('total')
+    )
+    Pedidos.objects.filter(pk__in=list(pedido_ids)).update(
+        peso_total=Coalesce(Subquery(suma, output_field=_PESO), Value(Decimal(0)), output_field=_PESO)
+    )
+
+
+def _ajustar_peso(pedido_id, delta, peso_si_unica, linea_id):
+    """
+    peso_total += delta con F(). Si el pedido no tiene otras líneas además de 'linea_id',
+    el peso queda en 'peso_si_unica': igual que la suma completa (el peso capturado a mano
+    se reemplaza con la primera línea y vuelve a 0 al borrar la última).
+    """
+    otras_lineas = DetallePedido.objects.filter(pedido_id=OuterRef('pk')).exclude(pk=linea_id)
+    Pedidos.objects.filter(pk=pedido_id).update(peso_total=Case(
+        When(Exists(otras_lineas), then=F('peso_total') + Value(delta, output_field=_PESO)),
+        default=Value(peso_si_unica, output_field=_PESO),
+        output_field=_PESO,
+    ))
+
+
+def _pesos_de_productos(linea, producto_ids):
+    pesos = {}
+    if DetallePedido.producto.is_cached(linea) and linea.producto_id in producto_ids:
+        pesos[linea.producto_id] = linea.producto.peso_kg
+    faltantes = set(producto_ids) - set(pesos)
+    if faltantes:
+        pesos.update(Productos.objects.filter(pk__in=faltantes).values_list('pk', 'peso_kg'))
+    return pesos
+
+
+def aplicar_cambio_linea(linea, anterior, creada=False, borrada=False):
+    """
+    Aplica al peso del pedido la diferencia entre el estado anterior de la línea
+    (pedido_id, producto_id, cantidad) y el actual (o su ausencia si se borró).
+    Sin estado anterior conocido (carga diferida) se recalcula el pedido completo.
+    """
+    actual = None if borrada else (linea.pedido_id, linea.producto_id, linea.cantidad)
+    afectados = {fila[0] for fila in (anterior, actual) if fila}
+
+    pedidos_en_lote = _pedidos_en_lote.get()
+    if pedidos_en_lote is not None:
+        pedidos_en_lote.update(afectados)
+        return
+
+    pesos = _pesos_de_productos(linea, {fila[1] for fila in (anterior, actual) if fila})
+    desconocido = anterior is None and not creada
+    if desconocido or any(fila and fila[1] not in pesos for fila in (anterior, actual)):
+        recalcular_peso_total(afectados)
+        return
+
+    aporte_anterior = pesos[anterior[1]] * anterior[2] if anterior else Decimal(0)
+    aporte_actual = pesos[actual[1]] * actual[2] if actual else Decimal(0)
+
+    if anterior and actual and anterior[0] == actual[0]:
+        if aporte_actual != aporte_anterior:
+            _ajustar_peso(actual[0], aporte_actual - aporte_anterior, aporte_actual, linea.pk)
+        return
+    if anterior:
+        _ajustar_peso(anterior[0], -aporte_anterior, Decimal(0), linea.pk)
+    if actual:
+        _ajustar_peso(actual[0], aporte_actual, aporte_actual, linea.pk)
+
+
+@contextmanager
+def edicion_masiva_lineas():
+    """
+    Suspende el mantenimiento incremental del peso mientras se editan muchas líneas
+    y recalcula una sola vez, al salir, los pedidos tocados. Las operaciones que no
+    disparan señales (bulk_create, update) se registran con pedidos.add(pedido_id):
+
+        with edicion_masiva_lineas() as pedidos:
+            DetallePedido.objects.bulk_create(lineas)
+            pedidos.add(pedido.pk)
+    """
+    pedidos = _pedidos_en_lote.get()
+    if pedidos is not None:
+        # Anidado: el bloque externo recalcula
+        yield pedidos
+        return
+
+    pedidos = set()
+    token = _pedidos_en_lote.set(pedidos)
+    try:
+        yield pedidos
+    finally:
+        _pedidos_en_lote.reset(token)
+    if pedidos:
+        recalcular_peso_total(pedidos)
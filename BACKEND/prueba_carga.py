@@ -0,0 +1,321 @@
+# BACKEND/prueba_carga.py
+
+import math
+import random
+import re
+import threading
+import time
+from datetime import date, timedelta
+
+import requests
+from django.conf import settings
+
+from FRONTEND.models import EmailOutbox, Empresas, Pedidos, Usuarios
+
+# Cuentas de prueba: se reconocen por el dominio y se borran con limpiar_datos()
+DOMINIO_PRUEBA = 'carga.bogocargo.test'
+CLAVE_PRUEBA = 'carga-clave-123'
+PREFIJO_NIT_PRUEBA = 'CARGA-'
+MAYORISTAS_PRUEBA = (
+    ('Calle 13 # 68-10 Fontibón', 'Bogotá'),
+    ('Autopista Norte # 170-20 Usaquén', 'Bogotá'),
+    ('Avenida Boyacá # 6-50 Kennedy', 'Bogotá'),
+)
+PERCENTILES = (50, 95, 99)
+# Tope de espera por el límite de intentos de login (429 + Retry-After) al iniciar las sesiones
+MAX_ESPERA_LOGIN = 120
+
+_OPCION_MAYORISTA = re.compile(r'<option value="(\d+)"')
+_PEDIDO_EN_BOLSA = re.compile(r'id="pedido-pendiente-(\d+)"')
+_PEDIDO_CREADO = re.compile(r'/pedido/(\d+)/$')
+_SIGUIENTE_PAGINA = re.compile(r'href="(\?[^"]*after=[^"]+)"')
+
+
+# ============================================================
+# 1. DATOS DE PRUEBA (en la misma base que usa el servidor)
+# ============================================================
+
+def _email(rol, i):
+    return f'{rol.lower()}{i}@{DOMINIO_PRUEBA}'
+
+
+def preparar_datos(minoristas, conductores, admins):
+    """Crea (si faltan) las cuentas de prueba y los mayoristas de origen. Devuelve {rol: [emails]}."""
+    for i, (direccion, ciudad) in enumerate(MAYORISTAS_PRUEBA):
+        Empresas.objects.get_or_create(nit=f'{PREFIJO_NIT_PRUEBA}{i}', defaults={
+            'nombre': f'Mayorista de Carga {i}', 'direccion': direccion, 'ciudad': ciudad, 'tipo': 'MAYORISTA',
+        })
+    cuentas = {}
+    for rol, cantidad in (('MINORISTA', minoristas), ('CONDUCTOR', conductores), ('ADMIN', admins)):
+        cuentas[rol] = []
+        for i in range(cantidad):
+            email = _email(rol, i)
+            if not Usuarios.objects.filter(email=email).exists():
+                extra = {}
+                if rol == 'CONDUCTOR':
+                    # Vehículo completo y el más grande: ve toda la bolsa y puede aceptar
+                    extra = dict(placas=f'CRG{i:03d}', marca_vehiculo='Carga', referencia_vehiculo='Prueba',
+                                 tipo_vehiculo='CAMION_GRANDE')
+                Usuarios.objects.create_user(email, CLAVE_PRUEBA, nombre=f'{rol.title()} {i}', tipo=rol, **extra)
+            cuentas[rol].append(email)
+    return cuentas
+
+
+def limpiar_datos():
+    """Borra las cuentas de prueba con sus pedidos, facturas y correos. Devuelve cuántos pedidos borró."""
+    _, borrados = Pedidos.objects.filter(minorista__email__endswith=f'@{DOMINIO_PRUEBA}').delete()
+    EmailOutbox.objects.filter(destinatario__endswith=f'@{DOMINIO_PRUEBA}').delete()
+    Usuarios.objects.filter(email__endswith=f'@{DOMINIO_PRUEBA}').delete()
+    Empresas.objects.filter(nit__startswith=PREFIJO_NIT_PRUEBA).delete()
+    return borrados.get(Pedidos._meta.label, 0)
+
+
+# ============================================================
+# 2. MEDICIONES POR ENDPOINT
+# ============================================================
+
+def percentil(ordenados, p):
+    """Percentil por rango más cercano de una lista ya ordenada."""
+    if not ordenados:
+        return None
+    return ordenados[max(0, math.ceil(p / 100 * len(ordenados)) - 1)]
+
+
+class Mediciones:
+    """Latencias y errores de todas las sesiones, por endpoint (seguro entre hilos)."""
+
+    def __init__(self):
+        self._datos = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, endpoint, segundos, ok):
+        with self._lock:
+            latencias, errores = self._datos.setdefault(endpoint, ([], [0]))
+            latencias.append(segundos)
+            if not ok:
+                errores[0] += 1
+
+    def reiniciar(self):
+        with self._lock:
+            self._datos.clear()
+
+    def resumen(self, duracion):
+        """{endpoint: {'peticiones', 'errores', 'rps', 'p50_ms', 'p95_ms', 'p99_ms'}} y la fila 'TOTAL'."""
+        with self._lock:
+            datos = {endpoint: (sorted(latencias), errores[0]) for endpoint, (latencias, errores) in self._datos.items()}
+        todas = sorted(latencia for latencias, _ in datos.values() for latencia in latencias)
+        datos['TOTAL'] = (todas, sum(errores for _, errores in datos.values()))
+
+        resumen = {}
+        for endpoint, (latencias, errores) in sorted(datos.items()):
+            fila = {'peticiones': len(latencias), 'errores': errores, 'rps': round(len(latencias) / duracion, 2)}
+            for p in PERCENTILES:
+                valor = percentil(latencias, p)
+                fila[f'p{p}_ms'] = None if valor is None else round(valor * 1000, 1)
+            resumen[endpoint] = fila
+        return resumen
+
+
+# ============================================================
+# 3. SESIONES Y ESCENARIOS POR ROL
+# ============================================================
+
+class Sesion:
+    """Un usuario virtual: cookies propias (sesión y CSRF) y cada petición medida sin seguir redirecciones."""
+
+    def __init__(self, url_base, mediciones, timeout=30):
+        self.url_base = url_base.rstrip('/')
+        self.mediciones = mediciones
+        self.timeout = timeout
+        self.http = requests.Session()
+
+    def pedir(self, endpoint, metodo, ruta, esperado=(200,), datos=None, params=None):
+        if datos is not None:
+            datos = dict(datos, csrfmiddlewaretoken=self.http.cookies.get('csrftoken', ''))
+        inicio = time.perf_counter()
+        try:
+            respuesta = self.http.request(
+                metodo, self.url_base + ruta, data=datos, params=params, allow_redirects=False,
+                timeout=self.timeout, headers={'Referer': self.url_base + ruta},
+            )
+        except requests.RequestException:
+            self.mediciones.registrar(endpoint, time.perf_counter() - inicio, False)
+            return None
+        self.mediciones.registrar(endpoint, time.perf_counter() - inicio, respuesta.status_code in esperado)
+        return respuesta
+
+    def iniciar(self, email):
+        """
+        Inicia sesión; ante el límite de intentos (429) espera lo que indique Retry-After.
+        Devuelve None si entró o el motivo por el que no pudo.
+        """
+        limite = time.monotonic() + MAX_ESPERA_LOGIN
+        while True:
+            pagina = self.pedir('mi_cuenta', 'GET', '/mi-cuenta/')
+            motivo = self._motivo_sin_sesion(pagina, settings.CSRF_COOKIE_NAME)
+            if motivo:
+                return motivo
+            respuesta = self.pedir('login', 'POST', '/login/', (302,), {'email': email, 'password': CLAVE_PRUEBA})
+            if respuesta is not None and respuesta.status_code == 429:
+                espera = float(respuesta.headers.get('Retry-After', 6))
+                if time.monotonic() + espera > limite:
+                    return "límite de intentos de login (429)"
+                time.sleep(espera)
+                continue
+            if respuesta is not None and respuesta.status_code == 403:
+                return "CSRF rechazado en el login"
+            if respuesta is not None and respuesta.status_code == 302 and '/mi-cuenta/' in respuesta.headers.get('Location', ''):
+                return "credenciales rechazadas (¿servidor con otra base?)"
+            return self._motivo_sin_sesion(respuesta, settings.SESSION_COOKIE_NAME, 302)
+
+    def _motivo_sin_sesion(self, respuesta, cookie, esperado=200):
+        if respuesta is None:
+            return "el servidor no respondió"
+        if respuesta.headers.get('Location', '').startswith('https://'):
+            return "el servidor redirige a https (SECURE_SSL_REDIRECT): use --url https://... o DEBUG=True en el servidor"
+        if respuesta.status_code != esperado:
+            return f"respuesta {respuesta.status_code} en {respuesta.request.path_url}"
+        guardada = next((c for c in self.http.cookies if c.name == cookie), None)
+        if guardada is None:
+            return f"el servidor no envió la cookie {cookie}"
+        if guardada.secure and self.url_base.startswith('http://'):
+            return f"la cookie {cookie} es solo para https (*_COOKIE_SECURE): use --url https://... o DEBUG=True en el servidor"
+        return None
+
+
+# Los escenarios reciben 'creados': ids de los pedidos que crearon los minoristas de prueba en esta
+# corrida (compartido entre hilos). Los conductores virtuales solo aceptan esos: la bolsa también
+# muestra los pedidos reales de la base, que limpiar_datos() no borra.
+
+def escenario_minorista(sesion, rng, creados):
+    """Abre el formulario, crea un pedido para mañana y revisa su historial."""
+    formulario = sesion.pedir('crear_pedido (form)', 'GET', '/pedidos/crear/')
+    mayoristas = _OPCION_MAYORISTA.findall(formulario.text) if formulario is not None else []
+    if mayoristas:
+        creado = sesion.pedir('crear_pedido', 'POST', '/pedidos/crear/', (302,), {
+            'mayorista_origen_id': rng.choice(mayoristas),
+            'fecha_recoleccion': (date.today() + timedelta(days=1)).isoformat(),
+            'hora_recoleccion': '10:00',
+            'origen': 'Bodega del mayorista',
+            'destino': rng.choice(('Calle 72 # 10-34 Chapinero', 'Carrera 15 # 93-60 Chapinero', 'Calle 145 # 19-20 Suba')),
+            'tipo_mercancia': 'SECAS',
+            'valor_declarado': rng.randint(50, 500) * 1000,
+            'peso_total': round(rng.uniform(1, 60), 2),
+            'volumen': round(rng.uniform(0.01, 0.5), 2),
+            'unidades': rng.randint(1, 5),
+            'largo': '0.40', 'alto': '0.30', 'ancho': '0.30',
+            'precio_estimado': 25000,
+            'observaciones': 'Prueba de carga',
+        })
+        # El formulario redirige al detalle del pedido creado
+        nuevo = _PEDIDO_CREADO.search(creado.headers.get('Location', '')) if creado is not None else None
+        if nuevo:
+            creados.add(nuevo.group(1))
+    sesion.pedir('listar_pedidos', 'GET', '/pedidos/listar/')
+
+
+def escenario_conductor(sesion, rng, creados):
+    """
+    Consulta su dashboard (bolsa y ruta); a veces acepta uno de los pedidos creados en la prueba
+    y lo lleva hasta entregado.
+    """
+    dashboard = sesion.pedir('dashboard_conductor', 'GET', '/dashboard/conductor/')
+    en_bolsa = _PEDIDO_EN_BOLSA.findall(dashboard.text) if dashboard is not None else []
+    pendientes = [pedido for pedido in en_bolsa if pedido in creados]
+    if not pendientes or rng.random() > 0.3:
+        return
+    pedido = rng.choice(pendientes)
+    # 302 también cuando otro conductor lo ganó (redirige al dashboard): es una respuesta correcta
+    aceptado = sesion.pedir('manejar_pedido_action (aceptar)', 'POST', f'/pedido/{pedido}/action/', (302,),
+                            {'action': 'aceptar'})
+    if aceptado is not None and f'/pedido/{pedido}/' in aceptado.headers.get('Location', ''):
+        for accion in ('en_ruta', 'finalizar'):
+            sesion.pedir(f'manejar_pedido_action ({accion})', 'POST', f'/pedido/{pedido}/action/', (302,),
+                         {'action': accion})
+
+
+def escenario_admin(sesion, rng, creados):
+    """Recorre el listado de pedidos (primera página y la siguiente) y busca por palabra."""
+    listado = sesion.pedir('pedidos_crud_admin', 'GET', '/gestion/pedidos/')
+    siguiente = _SIGUIENTE_PAGINA.search(listado.text) if listado is not None else None
+    if siguiente:
+        sesion.pedir('pedidos_crud_admin (página 2)', 'GET', '/gestion/pedidos/' + siguiente.group(1).replace('&amp;', '&'))
+    sesion.pedir('pedidos_crud_admin (búsqueda)', 'GET', '/gestion/pedidos/',
+                 params={'q': rng.choice(('chapinero', 'suba', 'prueba', 'calle'))})
+
+
+ESCENARIOS = {
+    'MINORISTA': escenario_minorista,
+    'CONDUCTOR': escenario_conductor,
+    'ADMIN': escenario_admin,
+}
+
+
+# ============================================================
+# 4. EJECUCIÓN Y COMPARACIÓN
+# ============================================================
+
+def ejecutar(url_base, cuentas, duracion, pausa=1.0, semilla=None):
+    """
+    Un hilo por cuenta ({rol: [emails]}): inicia sesión y repite el escenario de su rol con una pausa
+    aleatoria de hasta 2 × 'pausa' segundos (tiempo de lectura) durante 'duracion' segundos, contados
+    desde que todas las sesiones están iniciadas. Devuelve el resultado listo para guardar en JSON.
+    """
+    mediciones = Mediciones()
+    usuarios = [(rol, email) for rol, emails in cuentas.items() for email in emails]
+    listos = threading.Barrier(len(usuarios) + 1)
+    detener = threading.Event()
+    fallidos = []
+    creados = set()
+
+    def usuario_virtual(indice, rol, email):
+        rng = random.Random(None if semilla is None else semilla + indice)
+        sesion = Sesion(url_base, mediciones)
+        motivo = sesion.iniciar(email)
+        conectado = motivo is None
+        if not conectado:
+            fallidos.append({'email': email, 'motivo': motivo})
+        listos.wait()
+        while conectado and not detener.is_set():
+            ESCENARIOS[rol](sesion, rng, creados)
+            detener.wait(rng.uniform(0, 2 * pausa))
+
+    hilos = [threading.Thread(target=usuario_virtual, args=(i, rol, email), daemon=True)
+             for i, (rol, email) in enumerate(usuarios)]
+    for hilo in hilos:
+        hilo.start()
+    listos.wait()
+    # Lo medido durante el inicio de sesión queda fuera de la ventana
+    arranque = mediciones.resumen(1)
+    mediciones.reiniciar()
+    inicio = time.perf_counter()
+    detener.wait(duracion)
+    detener.set()
+    for hilo in hilos:
+        hilo.join()
+    transcurrido = time.perf_counter() - inicio
+
+    return {
+        'fecha': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'url': url_base,
+        'duracion_s': round(transcurrido, 1),
+        'pausa_s': pausa,
+        'usuarios': {rol: len(emails) for rol, emails in cuentas.items()},
+        'sesiones_fallidas': fallidos,
+        'login': arranque.get('login'),
+        'endpoints': mediciones.resumen(transcurrido),
+    }
+
+
+def comparar(actual, anterior):
+    """Filas (endpoint, p95 antes, p95 ahora, % cambio p95, rps antes, rps ahora) de los endpoints de ambas corridas."""
+    filas = []
+    for endpoint, fila in actual['endpoints'].items():
+        previa = anterior.get('endpoints', {}).get(endpoint)
+        if not previa:
+            continue
+        cambio = None
+        if previa.get('p95_ms') and fila.get('p95_ms') is not None:
+            cambio = round((fila['p95_ms'] - previa['p95_ms']) / previa['p95_ms'] * 100, 1)
+        filas.append((endpoint, previa.get('p95_ms'), fila.get('p95_ms'), cambio, previa.get('rps'), fila.get('rps')))
+    return filas
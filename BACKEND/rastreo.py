@@ -0,0 +1,283 @@
+# BACKEND/rastreo.py
+
+import atexit
+import logging
+import math
+import threading
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import DatabaseError, DataError, IntegrityError, connections, transaction
+from django.db.models import Case, CharField, DateTimeField, Q, Value, When
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from FRONTEND.models import Envios, RastreoEnvio
+
+logger = logging.getLogger(__name__)
+
+# Puntos por INSERT: el búfer se escribe al llegar a este tamaño...
+TAMANO_LOTE_RASTREO = 2000
+# ...o cuando su punto más antiguo lleva este tiempo esperando (segundos)
+MAX_ESPERA_RASTREO = 1.0
+# Puntos aceptados por petición
+MAX_PUNTOS_POR_PETICION = 1000
+# Tope del búfer mientras la base no acepta escrituras: pasado esto se descartan los más antiguos
+MAX_PENDIENTES_RASTREO = 10 * TAMANO_LOTE_RASTREO
+# Puntos con hora del dispositivo más adelantada que esto se rechazan (reloj del celular mal puesto)
+TOLERANCIA_FUTURO_SEGUNDOS = 300
+# Envíos por UPDATE al copiar la última posición, y por consulta de posiciones actuales
+MAX_ENVIOS_POR_CONSULTA = 500
+
+
+class PuntoInvalido(ValueError):
+    pass
+
+
+# ============================================================
+# 1. VALIDACIÓN DE PUNTOS
+# ============================================================
+
+def _coordenada(valor, limite, nombre):
+    try:
+        numero = float(valor)
+    except (TypeError, ValueError):
+        raise PuntoInvalido(f"'{nombre}' debe ser un número.")
+    if not math.isfinite(numero) or abs(numero) > limite:
+        raise PuntoInvalido(f"'{nombre}' fuera de rango.")
+    return numero
+
+
+def _fecha_punto(valor, ahora):
+    """Acepta ISO-8601 o milisegundos desde epoch (lo que envía el GPS del celular); sin valor, la hora del servidor."""
+    if valor in (None, ''):
+        return ahora
+    if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+        try:
+            fecha = datetime.fromtimestamp(valor / 1000, tz=dt_timezone.utc)
+        except (OverflowError, OSError, ValueError):
+            raise PuntoInvalido("'fecha_hora' no es válida.")
+    else:
+        fecha = parse_datetime(str(valor)) if isinstance(valor, str) else None
+        if fecha is None:
+            raise PuntoInvalido("'fecha_hora' no es válida.")
+        if timezone.is_naive(fecha):
+            fecha = timezone.make_aware(fecha)
+    if (fecha - ahora).total_seconds() > TOLERANCIA_FUTURO_SEGUNDOS:
+        raise PuntoInvalido("'fecha_hora' está en el futuro.")
+    return fecha
+
+
+def _es_id(valor):
+    # bool es subclase de int; listas y objetos no se pueden buscar en un set
+    return isinstance(valor, int) and not isinstance(valor, bool)
+
+
+def construir_puntos(conductor, puntos):
+    """
+    Convierte los puntos recibidos ({envio, lat, lon, estado?, fecha_hora?, observaciones?}) en
+    RastreoEnvio sin guardar. Solo se aceptan envíos del conductor, verificados con una consulta por lote.
+    Devuelve (rastreos, errores) con errores = [{'indice': i, 'error': mensaje}, ...].
+    """
+    ids = {p['envio'] for p in puntos if isinstance(p, dict) and _es_id(p.get('envio'))}
+    propios = set(Envios.objects.filter(pk__in=ids, conductor=conductor).values_list('pk', flat=True)) if ids else set()
+    ahora = timezone.now()
+
+    rastreos, errores = [], []
+    for indice, punto in enumerate(puntos):
+        try:
+            if not isinstance(punto, dict):
+                raise PuntoInvalido("Cada punto debe ser un objeto.")
+            if not _es_id(punto.get('envio')):
+                raise PuntoInvalido("'envio' debe ser el id numérico del envío.")
+            if punto['envio'] not in propios:
+                raise PuntoInvalido("Envío inexistente o asignado a otro conductor.")
+            lat = _coordenada(punto.get('lat'), 90, 'lat')
+            lon = _coordenada(punto.get('lon'), 180, 'lon')
+            rastreos.append(RastreoEnvio(
+                envio_id=punto['envio'],
+                ubicacion=f"{lat:.6f},{lon:.6f}",
+                fecha_hora=_fecha_punto(punto.get('fecha_hora'), ahora),
+                estado=str(punto.get('estado') or 'EN_RUTA')[:30],
+                observaciones=str(punto.get('observaciones') or ''),
+            ))
+        except PuntoInvalido as e:
+            errores.append({'indice': indice, 'error': str(e)})
+    return rastreos, errores
+
+
+# ============================================================
+# 2. ÚLTIMA POSICIÓN DE CADA ENVÍO (copia en Envios)
+# ============================================================
+
+def actualizar_ultima_posicion(rastreos):
+    """
+    Copia a cada envío su punto más reciente entre 'rastreos', salvo que ya tenga uno posterior
+    (los celulares reenvían lotes atrasados). Una sola UPDATE por cada MAX_ENVIOS_POR_CONSULTA envíos.
+    """
+    ultimos = {}
+    for rastreo in rastreos:
+        actual = ultimos.get(rastreo.envio_id)
+        if actual is None or rastreo.fecha_hora >= actual.fecha_hora:
+            ultimos[rastreo.envio_id] = rastreo
+
+    ultimos = list(ultimos.items())
+    for i in range(0, len(ultimos), MAX_ENVIOS_POR_CONSULTA):
+        bloque = ultimos[i:i + MAX_ENVIOS_POR_CONSULTA]
+        condicion = Q()
+        for envio_id, rastreo in bloque:
+            condicion |= Q(pk=envio_id) & (
+                Q(ultima_fecha_rastreo__isnull=True) | Q(ultima_fecha_rastreo__lte=rastreo.fecha_hora)
+            )
+
+        def por_envio(campo, tipo):
+            return Case(*(When(pk=envio_id, then=Value(getattr(rastreo, campo))) for envio_id, rastreo in bloque),
+                        output_field=tipo)
+
+        Envios.objects.filter(condicion).update(
+            ultima_ubicacion=por_envio('ubicacion', CharField()),
+            ultimo_estado_rastreo=por_envio('estado', CharField()),
+            ultima_fecha_rastreo=por_envio('fecha_hora', DateTimeField()),
+        )
+
+
+def coordenadas(ubicacion):
+    # Los puntos del endpoint se guardan como "lat,lon"; los registros antiguos pueden ser texto libre
+    try:
+        lat, lon = (float(parte) for parte in ubicacion.split(','))
+    except ValueError:
+        return None, None
+    return lat, lon
+
+
+def posiciones_actuales(envios):
+    """Última posición conocida de cada envío del queryset, en una sola consulta sobre Envios."""
+    posiciones = []
+    for fila in envios.order_by('pk').values(
+        'pk', 'pedido_id', 'estado', 'ultima_ubicacion', 'ultimo_estado_rastreo', 'ultima_fecha_rastreo',
+    )[:MAX_ENVIOS_POR_CONSULTA]:
+        lat, lon = coordenadas(fila['ultima_ubicacion'])
+        posiciones.append({
+            'envio': fila['pk'],
+            'pedido': fila['pedido_id'],
+            'estado_envio': fila['estado'],
+            'ubicacion': fila['ultima_ubicacion'] or None,
+            'lat': lat,
+            'lon': lon,
+            'estado': fila['ultimo_estado_rastreo'] or None,
+            'fecha_hora': fila['ultima_fecha_rastreo'],
+        })
+    return posiciones
+
+
+# ============================================================
+# 3. BÚFER EN PROCESO CON ESCRITURA POR LOTES
+# ============================================================
+
+class BufferRastreo:
+    """
+    Acumula puntos de rastreo y los escribe con bulk_create en lotes grandes: un INSERT
+    de miles de filas en lugar de un save() (y una transacción) por punto.
+
+    Se escribe al llegar a 'tamano_lote' puntos o, con tráfico bajo, un temporizador lo
+    hace 'max_espera' segundos después del primer punto en espera. Es memoria del proceso:
+    si el worker muere sin cerrar, se pierden a lo sumo los puntos de ese intervalo
+    (al terminar normalmente se escribe lo pendiente).
+
+    Si un punto viola una restricción (p. ej. su envío se borró mientras esperaba), el lote se
+    reparte en mitades hasta aislarlo y solo ese punto se descarta. Si falla la base, el lote
+    vuelve al búfer para el siguiente vaciado.
+    """
+
+    def __init__(self, tamano_lote=TAMANO_LOTE_RASTREO, max_espera=MAX_ESPERA_RASTREO, vaciado_periodico=True):
+        self.tamano_lote = tamano_lote
+        self.max_espera = max_espera
+        self.vaciado_periodico = vaciado_periodico
+        self._pendientes = []
+        self._lock = threading.Lock()
+        self._temporizador = None
+
+    def __len__(self):
+        return len(self._pendientes)
+
+    def agregar(self, rastreos):
+        with self._lock:
+            self._pendientes.extend(rastreos)
+            lleno = len(self._pendientes) >= self.tamano_lote
+            if not lleno:
+                self._programar()
+        if lleno:
+            # Lo escribe la petición que completó el lote: un fallo de la base no debe volverse su 500
+            try:
+                self.vaciar()
+            except DatabaseError:
+                logger.exception("No se pudieron guardar los puntos de rastreo; quedan en el búfer")
+
+    def _programar(self):
+        # Con el lock tomado
+        if self._pendientes and self._temporizador is None and self.vaciado_periodico:
+            self._temporizador = threading.Timer(self.max_espera, self._vaciar_por_tiempo)
+            self._temporizador.daemon = True
+            self._temporizador.start()
+
+    def vaciar(self):
+        """
+        Escribe todo lo pendiente. Devuelve cuántos puntos guardó. Si la base falla, el lote
+        vuelve al búfer y se relanza el error.
+        """
+        with self._lock:
+            lote, self._pendientes = self._pendientes, []
+            if self._temporizador is not None:
+                self._temporizador.cancel()
+                self._temporizador = None
+        if not lote:
+            return 0
+        try:
+            return self._escribir(lote)
+        except DatabaseError:
+            with self._lock:
+                self._pendientes[:0] = lote
+                sobrantes = len(self._pendientes) - MAX_PENDIENTES_RASTREO
+                if sobrantes > 0:
+                    del self._pendientes[:sobrantes]
+                    logger.error("Búfer de rastreo lleno: se descartan los %d puntos más antiguos", sobrantes)
+                self._programar()
+            raise
+
+    def _escribir(self, lote):
+        try:
+            with transaction.atomic():
+                RastreoEnvio.objects.bulk_create(lote, batch_size=self.tamano_lote)
+                actualizar_ultima_posicion(lote)
+            return len(lote)
+        except (IntegrityError, DataError) as e:
+            # Error de alguna fila, no de la base: se aísla partiendo el lote
+            if len(lote) == 1:
+                logger.warning("Punto de rastreo descartado (envío %s): %s", lote[0].envio_id, e)
+                return 0
+            mitad = len(lote) // 2
+            return self._escribir(lote[:mitad]) + self._escribir(lote[mitad:])
+
+    def _vaciar_por_tiempo(self):
+        with self._lock:
+            self._temporizador = None
+        try:
+            self.vaciar()
+        except Exception:
+            logger.exception("No se pudieron guardar los puntos de rastreo en espera")
+        finally:
+            # El hilo del temporizador abrió su propia conexión
+            connections.close_all()
+
+
+buffer_rastreo = BufferRastreo(
+    vaciado_periodico=getattr(settings, 'RASTREO_VACIADO_PERIODICO', True),
+)
+atexit.register(buffer_rastreo.vaciar)
+
+
+def registrar_puntos(conductor, puntos):
+    """Valida y encola los puntos del conductor. Devuelve (aceptados, errores)."""
+    rastreos, errores = construir_puntos(conductor, puntos)
+    buffer_rastreo.agregar(rastreos)
+    return len(rastreos), errores
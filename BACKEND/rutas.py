@@ -0,0 +1,234 @@
+# BACKEND/rutas.py
+
+import time
+from datetime import timedelta
+
+from django.utils import timezone
+
+from BACKEND.distancias import motor_distancias
+from BACKEND.rastreo import coordenadas
+from FRONTEND.models import Envios, Pedidos
+
+RECOGIDA, ENTREGA = 'RECOGIDA', 'ENTREGA'
+
+# Distancia asumida hacia o desde una dirección cuya localidad no se reconoce
+METROS_SIN_ZONA = 10000
+# Tope de la mejora local (se revisa entre pasadas); la construcción inicial ya es una ruta válida
+LIMITE_SEGUNDOS = 0.5
+# Una posición GPS más vieja que esto no sirve como punto de partida
+MAX_ANTIGUEDAD_POSICION = timedelta(hours=2)
+
+
+# ============================================================
+# 1. SECUENCIA DE PARADAS: VECINO MÁS CERCANO + 2-OPT + OR-OPT
+# ============================================================
+# Los nodos son índices de la matriz 'd' (metros, simétrica). El nodo 0 es el punto de partida
+# y no se mueve; internamente se agrega un nodo final virtual a distancia 0 de todos, así la ruta
+# es un camino abierto y todas las aristas existen. antes[i] es el nodo que debe visitarse antes
+# que i (la recogida de una entrega) o None.
+
+def _vecino_mas_cercano(d, antes, despues):
+    n = len(d) - 1  # sin el nodo final
+    visitado = [False] * n
+    visitado[0] = True
+    ruta = [0]
+    disponibles = {i for i in range(1, n) if antes[i] is None}
+    while disponibles:
+        fila = d[ruta[-1]]
+        # En empate gana el índice menor: los pedidos más antiguos primero
+        siguiente = min(disponibles, key=lambda i: (fila[i], i))
+        disponibles.remove(siguiente)
+        visitado[siguiente] = True
+        ruta.append(siguiente)
+        if despues[siguiente] is not None:
+            disponibles.add(despues[siguiente])
+    ruta.append(n)
+    return ruta
+
+
+def _posiciones(ruta):
+    pos = [0] * len(ruta)
+    for k, nodo in enumerate(ruta):
+        pos[nodo] = k
+    return pos
+
+
+def _dos_opt(ruta, d, antes, pos):
+    """Invierte tramos ruta[i..j] mientras acorte la ruta y no deje una entrega antes de su recogida."""
+    mejoro = False
+    ultimo = len(ruta) - 2
+    for i in range(1, ultimo):
+        a, b = ruta[i - 1], ruta[i]
+        for j in range(i + 1, ultimo + 1):
+            c, e = ruta[j], ruta[j + 1]
+            if d[a][c] + d[b][e] >= d[a][b] + d[c][e]:
+                continue
+            if any(antes[ruta[k]] is not None and i <= pos[antes[ruta[k]]] <= j for k in range(i, j + 1)):
+                continue
+            ruta[i:j + 1] = ruta[i:j + 1][::-1]
+            for k in range(i, j + 1):
+                pos[ruta[k]] = k
+            b = ruta[i]
+            mejoro = True
+    return mejoro
+
+
+def _or_opt(ruta, d, antes, despues):
+    """Mueve tramos de 1 a 3 paradas consecutivas al mejor hueco de la ruta que respete el orden recogida → entrega."""
+    mejoro = False
+    pos = _posiciones(ruta)
+    for largo in (1, 2, 3):
+        i = 1
+        while i + largo <= len(ruta) - 1:
+            primero, ultimo = ruta[i], ruta[i + largo - 1]
+            previo, siguiente = ruta[i - 1], ruta[i + largo]
+            ahorro = d[previo][primero] + d[ultimo][siguiente] - d[previo][siguiente]
+            tramo = ruta[i:i + largo]
+            mejor = None
+            # Hueco entre ruta[q] y ruta[q + 1]
+            for q in range(0, len(ruta) - 1):
+                if i - 1 <= q <= i + largo - 1:
+                    continue
+                x, y = ruta[q], ruta[q + 1]
+                costo = d[x][primero] + d[ultimo][y] - d[x][y]
+                if costo >= ahorro or (mejor is not None and costo >= mejor[0]):
+                    continue
+                if q > i:
+                    # Se adelanta sobre ruta[i+largo..q]: ninguna entrega del tramo puede quedar ahí
+                    if any(despues[s] is not None and i + largo <= pos[despues[s]] <= q for s in tramo):
+                        continue
+                elif any(antes[s] is not None and q < pos[antes[s]] < i for s in tramo):
+                    continue
+                mejor = (costo, q)
+
+            if mejor is None:
+                i += 1
+                continue
+            q = mejor[1]
+            del ruta[i:i + largo]
+            destino = q + 1 if q < i else q + 1 - largo
+            ruta[destino:destino] = tramo
+            pos = _posiciones(ruta)
+            mejoro = True
+    return mejoro, pos
+
+
+def costo_ruta(ruta, d):
+    return sum(d[a][b] for a, b in zip(ruta, ruta[1:]))
+
+
+def secuencia_optima(d, antes, limite_segundos=LIMITE_SEGUNDOS):
+    """
+    Orden de visita de los nodos 1..n-1 partiendo del nodo 0, con cada nodo después de antes[nodo].
+    Construye la ruta por vecino más cercano y la mejora con 2-opt y Or-opt hasta que ninguna
+    pasada encuentre mejora o se agote 'limite_segundos'. Devuelve la lista de nodos sin el 0.
+    """
+    n = len(d)
+    if n <= 1:
+        return []
+    # Nodo final virtual: el conductor termina donde termine la última parada
+    d = [list(fila) + [0] for fila in d] + [[0] * (n + 1)]
+    antes = list(antes) + [None]
+    despues = [None] * (n + 1)
+    for nodo, previo in enumerate(antes):
+        if previo is not None:
+            despues[previo] = nodo
+
+    ruta = _vecino_mas_cercano(d, antes, despues)
+    pos = _posiciones(ruta)
+    inicio = time.perf_counter()
+    while time.perf_counter() - inicio < limite_segundos:
+        mejoro = _dos_opt(ruta, d, antes, pos)
+        movio, pos = _or_opt(ruta, d, antes, despues)
+        if not (mejoro or movio):
+            break
+    return ruta[1:-1]
+
+
+# ============================================================
+# 2. RUTA DEL CONDUCTOR (pedidos ASIGNADO y EN_RUTA)
+# ============================================================
+
+def paradas_de_pedidos(pedidos):
+    """ASIGNADO: recoger en el origen y entregar en el destino. EN_RUTA: la carga va en el vehículo, solo entregar."""
+    paradas = []
+    for pedido in pedidos:
+        if pedido.estado == 'ASIGNADO':
+            paradas.append({'pedido': pedido, 'tipo': RECOGIDA, 'direccion': pedido.origen})
+        paradas.append({'pedido': pedido, 'tipo': ENTREGA, 'direccion': pedido.destino})
+    return paradas
+
+
+def matriz_paradas(direcciones, zona_inicio=None):
+    """
+    Metros entre el punto de partida (nodo 0) y las paradas, leídos de la matriz de localidades
+    precalculada (MotorDistancias, en caché y mmap). Sin punto de partida, el nodo 0 está
+    a 0 m de todas: la ruta empieza en la parada que más convenga.
+    """
+    zonas = [motor_distancias.zona(direccion) for direccion in direcciones]
+    entre_zonas = {}
+
+    def metros(za, zb):
+        if za is None or zb is None:
+            return METROS_SIN_ZONA
+        if (za, zb) not in entre_zonas:
+            entre_zonas[za, zb] = motor_distancias.metros_entre_zonas(za, zb)
+        return entre_zonas[za, zb]
+
+    n = len(direcciones) + 1
+    d = [[0] * n for _ in range(n)]
+    if zona_inicio is not None:
+        for j, zona in enumerate(zonas, start=1):
+            d[0][j] = d[j][0] = metros(zona_inicio, zona)
+    for i, (direccion_i, zona_i) in enumerate(zip(direcciones, zonas), start=1):
+        for j in range(i + 1, n):
+            # Dos paradas en la misma dirección no suman recorrido
+            m = 0 if direccion_i == direcciones[j - 1] else metros(zona_i, zonas[j - 1])
+            d[i][j] = d[j][i] = m
+    return d
+
+
+def zona_actual_conductor(conductor):
+    """Localidad de la última posición GPS reciente del conductor (copiada en Envios), o None."""
+    ubicacion = Envios.objects.filter(
+        conductor=conductor, ultima_fecha_rastreo__gte=timezone.now() - MAX_ANTIGUEDAD_POSICION,
+    ).order_by('-ultima_fecha_rastreo').values_list('ultima_ubicacion', flat=True).first()
+    lat, lon = coordenadas(ubicacion or '')
+    return None if lat is None else motor_distancias.zona_de_coordenadas(lat, lon)
+
+
+def planificar_ruta(conductor, limite_segundos=LIMITE_SEGUNDOS):
+    """
+    Orden sugerido de recogidas y entregas para los pedidos activos del conductor, desde su última
+    posición GPS si es reciente. Devuelve {'paradas': [{orden, pedido, tipo, direccion, metros}, ...],
+    'metros_total', 'metros_sin_optimizar'} donde 'metros' es el tramo desde la parada anterior y
+    'metros_sin_optimizar' el recorrido siguiendo el orden del dashboard (pedido por pedido, más recientes primero).
+    """
+    pedidos = list(
+        Pedidos.objects.filter(conductor=conductor, estado__in=['ASIGNADO', 'EN_RUTA']).order_by('fecha_creacion', 'id')
+    )
+    paradas = paradas_de_pedidos(pedidos)
+    d = matriz_paradas([parada['direccion'] for parada in paradas], zona_actual_conductor(conductor))
+
+    # Nodo i = paradas[i - 1]; la entrega de un pedido ASIGNADO va después de su recogida
+    antes, nodo_recogida = [None], {}
+    for nodo, parada in enumerate(paradas, start=1):
+        if parada['tipo'] == RECOGIDA:
+            nodo_recogida[parada['pedido'].pk] = nodo
+        antes.append(nodo_recogida.get(parada['pedido'].pk) if parada['tipo'] == ENTREGA else None)
+
+    secuencia = secuencia_optima(d, antes, limite_segundos)
+    resultado, previo = [], 0
+    for orden, nodo in enumerate(secuencia, start=1):
+        resultado.append(dict(paradas[nodo - 1], orden=orden, metros=d[previo][nodo]))
+        previo = nodo
+
+    por_pedido = {parada['pedido'].pk: [] for parada in reversed(paradas)}
+    for nodo, parada in enumerate(paradas, start=1):
+        por_pedido[parada['pedido'].pk].append(nodo)
+    sin_optimizar = [0] + [nodo for nodos in por_pedido.values() for nodo in nodos]
+    return {
+        'paradas': resultado,
+        'metros_total': costo_ruta([0] + secuencia, d),
+        'metros_sin_optimizar': costo_ruta(sin_optimizar, d),
+    }
@@ -1,21 +1,159 @@
-from django.db.models.signals import post_save, post_delete
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save, post_delete, post_init, post_migrate
 from django.dispatch import receiver
-from FRONTEND.models import DetallePedido, Pedidos
-
-def calcular_peso_total(instance):
-    pedido = instance.pedido
-    
-    total_peso = sum(
-        (detalle.producto.peso_kg * detalle.cantidad)
-        for detalle in DetallePedido.objects.filter(pedido=pedido).select_related('producto')
-    )
-    
-    Pedidos.objects.filter(pk=pedido.pk).update(peso_total=total_peso)
+from FRONTEND.models import DetallePedido, Pedidos, RastreoEnvio, Usuarios, Empresas
+from BACKEND.estadisticas import ENTIDAD_POR_MODELO, registrar_alta, registrar_baja, registrar_cambio
+from BACKEND.eventos import publicar_evento_bolsa
+from BACKEND.backends import invalidar_usuario_en_cache
+from BACKEND.pesos import aplicar_cambio_linea, recalcular_peso_total
+from BACKEND.busqueda import PESOS_CAMPOS, indexar_pedidos, texto_indexado
+from BACKEND.rastreo import actualizar_ultima_posicion
+from BACKEND.cache_paginas import invalidar_cache_paginas
+from BACKEND.instrumentacion import instalar_medicion_sql
+
+# ============================================================
+# PESO TOTAL DEL PEDIDO (suma de sus DetallePedido)
+# ============================================================
+
+def _foto_linea(instance):
+    # Sin los tres campos cargados (carga diferida) no se puede calcular la diferencia
+    valores = tuple(instance.__dict__.get(campo) for campo in ('pedido_id', 'producto_id', 'cantidad'))
+    return None if None in valores else valores
+
+@receiver(post_init, sender=DetallePedido)
+def recordar_linea_cargada(sender, instance, **kwargs):
+    instance._linea_cargada = _foto_linea(instance)
 
 @receiver(post_save, sender=DetallePedido)
-def update_peso_on_save(sender, instance, **kwargs):
-    calcular_peso_total(instance)
+def update_peso_on_save(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if update_fields is not None and not {'pedido', 'producto', 'cantidad'} & set(update_fields):
+        return
+    if raw:
+        recalcular_peso_total([instance.pedido_id])
+    else:
+        aplicar_cambio_linea(instance, None if created else instance._linea_cargada, creada=created)
+    instance._linea_cargada = _foto_linea(instance)
 
 @receiver(post_delete, sender=DetallePedido)
 def update_peso_on_delete(sender, instance, **kwargs):
-    calcular_peso_total(instance)
\ No newline at end of file
+    aplicar_cambio_linea(instance, instance._linea_cargada or _foto_linea(instance), borrada=True)
+
+# ============================================================
+# EVENTOS DE LA BOLSA DE PENDIENTES (stream SSE de conductores)
+# ============================================================
+
+def tipo_evento_bolsa(estado_anterior, estado_nuevo, creado=False):
+    """Traduce un cambio de estado del pedido al evento de la bolsa que corresponde (o None)."""
+    if estado_nuevo == "PENDIENTE" and (creado or estado_anterior != "PENDIENTE"):
+        return "CREADO"
+    if estado_anterior == "PENDIENTE" and estado_nuevo != "PENDIENTE":
+        return "CANCELADO" if estado_nuevo == "CANCELADO" else "TOMADO"
+    return None
+
+# Debe registrarse antes que actualizar_contador_on_save, que actualiza _clave_contada (estado leído de la BD)
+@receiver(post_save, sender=Pedidos)
+def publicar_cambio_bolsa_on_save(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and "estado" not in update_fields):
+        return
+    anterior = getattr(instance, '_clave_contada', None)
+    if not created and anterior is None:
+        return
+    tipo = tipo_evento_bolsa(anterior, instance.estado, creado=created)
+    if tipo:
+        publicar_evento_bolsa(tipo, instance)
+
+@receiver(post_delete, sender=Pedidos)
+def publicar_cambio_bolsa_on_delete(sender, instance, **kwargs):
+    if getattr(instance, '_clave_contada', instance.estado) == "PENDIENTE":
+        publicar_evento_bolsa("CANCELADO", instance)
+
+# ============================================================
+# CONTADORES DEL DASHBOARD ADMIN (ContadorEstadistica)
+# ============================================================
+
+@receiver(post_init, sender=Pedidos)
+@receiver(post_init, sender=Usuarios)
+@receiver(post_init, sender=Empresas)
+def recordar_clave_contada(sender, instance, **kwargs):
+    # Guardamos el estado/tipo con el que se cargó la fila para detectar cambios al guardar
+    _, campo = ENTIDAD_POR_MODELO[sender]
+    instance._clave_contada = instance.__dict__.get(campo)
+
+@receiver(post_save, sender=Pedidos)
+@receiver(post_save, sender=Usuarios)
+@receiver(post_save, sender=Empresas)
+def actualizar_contador_on_save(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    entidad, campo = ENTIDAD_POR_MODELO[sender]
+    if update_fields is not None and campo not in update_fields:
+        return
+    nueva = getattr(instance, campo)
+    anterior = getattr(instance, '_clave_contada', None)
+    if created:
+        registrar_alta(entidad, nueva)
+    elif anterior is not None:
+        # Si el campo se cargó diferido no conocemos el valor anterior; se corrige con reconstruir_estadisticas
+        registrar_cambio(entidad, anterior, nueva)
+    instance._clave_contada = nueva
+
+@receiver(post_delete, sender=Pedidos)
+@receiver(post_delete, sender=Usuarios)
+@receiver(post_delete, sender=Empresas)
+def actualizar_contador_on_delete(sender, instance, **kwargs):
+    entidad, campo = ENTIDAD_POR_MODELO[sender]
+    registrar_baja(entidad, getattr(instance, '_clave_contada', None) or getattr(instance, campo))
+
+# ============================================================
+# CACHÉ DEL USUARIO DE SESIÓN (EmailAuthBackend.get_user)
+# ============================================================
+
+@receiver(post_save, sender=Usuarios)
+@receiver(post_delete, sender=Usuarios)
+def invalidar_usuario_cacheado(sender, instance, **kwargs):
+    invalidar_usuario_en_cache(instance.pk)
+    # Otra vez al confirmar: mientras la transacción estaba abierta otra petición pudo cachear la fila anterior
+    transaction.on_commit(lambda: invalidar_usuario_en_cache(instance.pk))
+
+# ============================================================
+# ÍNDICE DE BÚSQUEDA DE PEDIDOS (TerminoPedido)
+# ============================================================
+
+_CAMPOS_BUSQUEDA = {campo for campo, _ in PESOS_CAMPOS}
+
+@receiver(post_init, sender=Pedidos)
+def recordar_texto_indexado(sender, instance, **kwargs):
+    instance._texto_indexado = texto_indexado(instance)
+
+@receiver(post_save, sender=Pedidos)
+def indexar_pedido_on_save(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields is not None and not _CAMPOS_BUSQUEDA & set(update_fields):
+        return
+    # Los cambios de estado (lo más frecuente) no tocan el índice
+    if created or instance._texto_indexado is None or instance._texto_indexado != texto_indexado(instance):
+        indexar_pedidos([instance])
+    instance._texto_indexado = texto_indexado(instance)
+
+# ============================================================
+# ÚLTIMA POSICIÓN DEL ENVÍO (los lotes del endpoint la actualizan en BACKEND/rastreo.py)
+# ============================================================
+
+@receiver(post_save, sender=RastreoEnvio)
+def actualizar_posicion_on_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        actualizar_ultima_posicion([instance])
+
+# ============================================================
+# PÁGINAS Y FRAGMENTOS EN CACHÉ (BACKEND/cache_paginas.py)
+# ============================================================
+
+# Un despliegue con migraciones puede traer plantillas nuevas
+post_migrate.connect(invalidar_cache_paginas, dispatch_uid='invalidar_cache_paginas')
+
+# ============================================================
+# INSTRUMENTACIÓN DE SQL POR PETICIÓN (BACKEND/instrumentacion.py)
+# ============================================================
+
+# Cada conexión nueva, en cualquier hilo, mide sus consultas cuando la petición está muestreada
+connection_created.connect(instalar_medicion_sql, dispatch_uid='instalar_medicion_sql')
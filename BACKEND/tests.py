@@ -1,3 +1,1359 @@
-from django.test import TestCase
+import base64
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from io import BytesIO, StringIO
+from collections import Counter
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+import requests
+from asgiref.sync import async_to_sync
+from django.contrib.auth import authenticate
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.servers.basehttp import ThreadedWSGIServer
+from django.core.management import call_command
+from django.db import IntegrityError, OperationalError, connection
+from django.db.models import F
+from django.test.testcases import LiveServerThread
+from django.test.utils import CaptureQueriesContext
+from django.test import LiveServerTestCase, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from BACKEND.backends import EmailAuthBackend
+from BACKEND.estadisticas import leer_contadores, reconstruir_contadores
+from BACKEND.asignacion import reclamar_pedido
+from BACKEND.correos import MAX_INTENTOS, encolar_correo, enviar_lote
+from BACKEND.cotizacion import RISK_FACTOR_MAP, EnvioInvalido, calcular_precio_envio, cotizar_lote
+from BACKEND.importacion import importar_pedidos
+from BACKEND.pagination import PAGE_SIZE_DEFAULT, PAGE_SIZE_MAX, decode_cursor, encode_cursor, paginar_por_cursor
+from BACKEND.busqueda import buscar_pedidos, reconstruir_indice, tokenizar
+from BACKEND.facturas_pdf import EDAD_PODA_VERSIONES, obtener_pdf_factura, prerenderizar_periodo
+from BACKEND.limites import AlmacenCubetas, cubetas_login
+from BACKEND.rastreo import BufferRastreo
+from BACKEND.bolsa import cubetas_conductor, paginar_bolsa
+from BACKEND.consolidacion import aprobar_carga, consolidar, descartar_carga, proponer_cargas
+from BACKEND.rutas import ENTREGA, RECOGIDA, costo_ruta, planificar_ruta, secuencia_optima
+from BACKEND.pesos import edicion_masiva_lineas, recalcular_peso_total
+from BACKEND.distancias import FACTOR_SIN_RUTA, RUTA_RED_VIAL, MotorDistancias, motor_distancias
+from BACKEND.eventos import (
+    ESPERA_HUECOS, MAX_EVENTOS_REPETICION, DifusorBolsa, _eventos_desde, difusor_bolsa, stream_bolsa, ultimo_evento_id,
+)
+from BACKEND.instrumentacion import AgregadosPeticiones, agregados_peticiones
+from BACKEND.prueba_carga import (
+    Mediciones, Sesion, comparar, ejecutar, escenario_conductor, limpiar_datos, percentil, preparar_datos,
+)
+from FRONTEND.forms import RegistroForm, UsuarioForm
+from FRONTEND.models import (
+    CargaConsolidada, DetallePedido, EmailOutbox, Empresas, Envios, EventoBolsa, Factura, Pedidos, Productos, RastreoEnvio, TerminoPedido,
+    Usuarios,
+)
+
+
+def crear_pedido(minorista, **kwargs):
+    datos = dict(
+        minorista=minorista, tipo_mercancia='SECAS', peso_total=5, volumen=1,
+        origen='Origen', destino='Destino', fecha_recoleccion=date.today(),
+    )
+    datos.update(kwargs)
+    return Pedidos.objects.create(**datos)
+
+
+class ContadoresEstadisticaTests(TestCase):
+    """Las señales deben dejar los contadores igual que una reconstrucción completa."""
+
+    def test_senales_coinciden_con_reconstruccion(self):
+        minorista = Usuarios.objects.create_user('m@bogocargo.co', 'clave-123', nombre='M', tipo='MINORISTA')
+        Usuarios.objects.create_user('c@bogocargo.co', 'clave-123', nombre='C', tipo='CONDUCTOR')
+        Empresas.objects.create(nombre='Mayorista Uno', nit='9001', tipo='MAYORISTA')
+        pedidos = [crear_pedido(minorista) for _ in range(3)]
+        asignado = Pedidos.objects.get(pk=pedidos[0].pk)
+        asignado.estado = 'ASIGNADO'
+        asignado.save()
+        pedidos[1].delete()
+
+        incrementales = leer_contadores()
+        reconstruir_contadores()
+        self.assertEqual(incrementales, leer_contadores())
+        self.assertEqual(incrementales[('PEDIDOS', '')], 2)
+        self.assertEqual(incrementales[('PEDIDOS', 'ASIGNADO')], 1)
+        self.assertEqual(incrementales[('EMPRESAS', 'MAYORISTA')], 1)
+
+
+class EventosBolsaTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.minorista = Usuarios.objects.create_user('m@bogocargo.co', 'clave-123', nombre='M', tipo='MINORISTA')
+        cls.conductor = Usuarios.objects.create_user('c@bogocargo.co', 'clave-123', nombre='C', tipo='CONDUCTOR')
+
+    def test_cambios_de_estado_publican_eventos(self):
+        tomado = crear_pedido(self.minorista)
+        cancelado = crear_pedido(self.minorista)
+
+        tomado.estado, tomado.conductor = 'ASIGNADO', self.conductor
+        tomado.save()
+        tomado.estado, tomado.conductor = 'PENDIENTE', None  # El conductor lo rechaza
+        tomado.save()
+        cancelado.estado = 'CANCELADO'
+        cancelado.save()
+
+        self.assertEqual(
+            list(EventoBolsa.objects.values_list('tipo', 'pedido_id')),
+            [('CREADO', tomado.pk), ('CREADO', cancelado.pk), ('TOMADO', tomado.pk),
+             ('CREADO', tomado.pk), ('CANCELADO', cancelado.pk)],
+        )
+
+    def test_stream_repite_eventos_desde_last_event_id(self):
+        primero = crear_pedido(self.minorista)
+        segundo = crear_pedido(self.minorista)
+        desde = EventoBolsa.objects.get(pedido_id=primero.pk).id
+
+        async def leer(n):
+            stream = stream_bolsa(ultimo_id=desde, latido=0.01)
+            try:
+                return [await stream.__anext__() for _ in range(n)]
+            finally:
+                await stream.aclose()
+
+        retry, evento = async_to_sync(leer)(2)
+        self.assertTrue(retry.startswith('retry:'))
+        self.assertIn('event: creado', evento)
+        self.assertIn(f'"pedido_id": {segundo.pk}', evento)
+
+    def test_difusor_no_salta_eventos_que_confirman_tarde(self):
+        # En InnoDB el id se asigna al insertar: una transacción larga confirma ids menores a los ya difundidos
+        base = ultimo_evento_id()
+        difusor = DifusorBolsa()
+        difusor._ultimo_id = base
+
+        def crear(n):
+            EventoBolsa.objects.create(id=base + n, tipo='CREADO', pedido_id=n)
+
+        def sondear(ahora=0):
+            eventos = _eventos_desde(difusor._ultimo_id, MAX_EVENTOS_REPETICION, difusor._huecos)
+            return [(evento.id - base, tardio) for evento, tardio in difusor.registrar(eventos, ahora)]
+
+        crear(1)
+        crear(3)
+        self.assertEqual(sondear(), [(1, False), (3, False)])
+        self.assertEqual(sondear(), [])
+        crear(2)  # Confirma después de que se difundió el 3
+        self.assertEqual(sondear(), [(2, True)])
+        self.assertEqual(difusor._huecos, [])
+        self.assertEqual(difusor.tardios_hasta(base + 3), [base + 2])
+
+        # Un hueco que nunca se llena (rollback) se abandona pasado ESPERA_HUECOS
+        crear(5)
+        sondear()
+        self.assertEqual(len(difusor._huecos), 1)
+        sondear(ahora=ESPERA_HUECOS + 1)
+        self.assertEqual((difusor._huecos, difusor.tardios_hasta(base + 5)), ([], []))
+
+    def test_stream_repite_los_tardios_sin_mover_last_event_id(self):
+        tardio = crear_pedido(self.minorista)
+        siguiente = crear_pedido(self.minorista)
+        desde = EventoBolsa.objects.get(pedido_id=siguiente.pk).id
+        evento_tardio = EventoBolsa.objects.get(pedido_id=tardio.pk).id
+
+        async def leer():
+            stream = stream_bolsa(ultimo_id=desde, latido=0.01)
+            try:
+                return [await stream.__anext__() for _ in range(2)]
+            finally:
+                await stream.aclose()
+
+        with mock.patch.object(difusor_bolsa, 'tardios_hasta', return_value=[evento_tardio]):
+            _, evento = async_to_sync(leer)()
+        self.assertIn(f'"evento_id": {evento_tardio}', evento)
+        self.assertFalse(evento.startswith('id:'))
+
+
+class ReclamarPedidoConcurrenteTests(TransactionTestCase):
+    """Muchos conductores aceptan los mismos pedidos a la vez: debe haber exactamente un ganador por pedido."""
+
+    n_conductores = 16
+    n_pedidos = 10
+
+    def setUp(self):
+        # La BD de pruebas SQLite en memoria no admite escrituras desde varios hilos
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest("Requiere una base de datos que acepte varias conexiones concurrentes")
+
+    def test_un_solo_ganador_por_pedido(self):
+        minorista = Usuarios.objects.create_user('m@bogocargo.co', 'clave-123', nombre='M', tipo='MINORISTA')
+        conductores = [
+            Usuarios.objects.create_user(
+                f'c{i}@bogocargo.co', 'clave-123', nombre=f'C{i}', tipo='CONDUCTOR',
+                placas=f'AAA{i:03d}', marca_vehiculo='Chevrolet', referencia_vehiculo='NHR', tipo_vehiculo='FURGON',
+            )
+            for i in range(self.n_conductores)
+        ]
+        pedidos = [crear_pedido(minorista) for _ in range(self.n_pedidos)]
+        reconstruir_contadores()
+
+        barrera = threading.Barrier(self.n_conductores)
+        victorias = Counter()
+        errores = []
+
+        def conductor_acepta_todo(conductor):
+            try:
+                barrera.wait()
+                for pedido in pedidos:
+                    copia = Pedidos.objects.get(pk=pedido.pk)
+                    if reclamar_pedido(copia, conductor):
+                        victorias[pedido.pk] += 1
+            except Exception as e:  # pragma: no cover - se reporta abajo
+                errores.append(e)
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=conductor_acepta_todo, args=(c,)) for c in conductores]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        self.assertEqual(errores, [])
+        self.assertEqual(victorias, Counter({p.pk: 1 for p in pedidos}))
+        for pedido in Pedidos.objects.filter(pk__in=[p.pk for p in pedidos]).select_related('conductor'):
+            self.assertEqual(pedido.estado, 'ASIGNADO')
+            self.assertEqual(pedido.placas_asignadas, pedido.conductor.placas)
+        self.assertEqual(EventoBolsa.objects.filter(tipo='TOMADO').count(), self.n_pedidos)
+        self.assertEqual(leer_contadores()[('PEDIDOS', 'ASIGNADO')], self.n_pedidos)
+
+
+class BackendSmtpCaido(BaseEmailBackend):
+    """EMAIL_BACKEND de prueba que falla siempre al enviar."""
+
+    def send_messages(self, email_messages):
+        raise ConnectionError("SMTP no disponible")
+
+
+class BandejaSalidaCorreosTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.minorista = Usuarios.objects.create_user('m@bogocargo.co', 'clave-123', nombre='M', tipo='MINORISTA')
+        cls.conductor = Usuarios.objects.create_user(
+            'c@bogocargo.co', 'clave-123', nombre='C', tipo='CONDUCTOR',
+            placas='ABC123', marca_vehiculo='Chevrolet', referencia_vehiculo='NHR', tipo_vehiculo='FURGON',
+        )
+
+    def test_aceptar_encola_sin_enviar_en_la_peticion(self):
+        pedido = crear_pedido(self.minorista)
+        self.client.force_login(self.conductor)
+        self.client.post(reverse('frontend:manejar_pedido_action', args=[pedido.pk]), {'action': 'aceptar'})
+
+        self.assertEqual(mail.outbox, [])
+        correo = EmailOutbox.objects.get()
+        self.assertEqual(correo.destinatario, self.minorista.email)
+
+        call_command('enviar_correos', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn('ASIGNADO', mail.outbox[0].subject)
+        correo.refresh_from_db()
+        self.assertEqual(correo.estado, 'ENVIADO')
+
+    @override_settings(EMAIL_BACKEND='BACKEND.tests.BackendSmtpCaido')
+    def test_fallo_reprograma_con_espera_y_luego_marca_fallido(self):
+        correo = encolar_correo('Asunto', 'Cuerpo', 'm@bogocargo.co')
+
+        self.assertEqual(enviar_lote(), (0, 1))
+        correo.refresh_from_db()
+        self.assertEqual((correo.estado, correo.intentos), ('PENDIENTE', 1))
+        self.assertIn('SMTP no disponible', correo.ultimo_error)
+        # Mientras no se cumpla la espera, el correo no se vuelve a intentar
+        self.assertEqual(enviar_lote(), (0, 0))
+
+        EmailOutbox.objects.update(intentos=MAX_INTENTOS - 1, proximo_intento=correo.fecha_creacion)
+        enviar_lote()
+        correo.refresh_from_db()
+        self.assertEqual(correo.estado, 'FALLIDO')
+
+
+class CotizacionLoteTests(TestCase):
+    """El lote vectorizado debe dar exactamente lo mismo que la cotización escalar en Decimal."""
+
+    def assertIgualAEscalar(self, envios, factores):
+        precios, volumenes = cotizar_lote(envios, factores)
+        esperado = [calcular_precio_envio(e, f) for e, f in zip(envios, factores)]
+        self.assertEqual(
+            list(zip(precios, volumenes)),
+            [(int(precio), int(volumen.scaleb(2))) for precio, volumen in esperado],
+        )
+
+    def test_envios_aleatorios(self):
+        rng = random.Random(7)
+        tipos = list(RISK_FACTOR_MAP) + ['desconocido', 'secas']
+        envios = [
+            {
+                'peso_total': str(round(rng.uniform(0, 3000), rng.randint(0, 3))),
+                'unidades': rng.randint(1, 40),
+                'largo': round(rng.uniform(0.01, 4), 2),
+                'alto': str(round(rng.uniform(0.01, 4), 3)),
+                'ancho': round(rng.uniform(0.01, 4), 2),
+                'tipo_mercancia': rng.choice(tipos),
+            }
+            for _ in range(2000)
+        ]
+        self.assertIgualAEscalar(envios, [1.0 + rng.random() * 0.5 for _ in envios])
+
+    def test_bordes_de_redondeo_y_datos_invalidos(self):
+        envios = [
+            # Volumen 0.005 m³: en float da 0.005000000000000001, en Decimal redondea al par (0.00)
+            {'largo': '0.5', 'alto': '0.1', 'ancho': '0.1'},
+            {'largo': 0.5, 'alto': 0.1, 'ancho': 0.1, 'unidades': 3},
+            # Total exacto en múltiplo de 500 (15000 + 2.5 * 1200 = 18000)
+            {'peso_total': '2.5', 'largo': '', 'alto': None},
+            {'peso_total': 'abc', 'unidades': '  ', 'tipo_mercancia': 'peligrosos'},
+            {'peso_total': Decimal('10.125'), 'unidades': True, 'largo': '1e1'},
+            {'peso_total': -50},
+            {},
+        ]
+        self.assertIgualAEscalar(envios, [1.005, 1.0, 1.0, 1.125, Decimal('1.2'), 1.5, 1.25])
+
+    def test_endpoint_cotiza_en_orden(self):
+        minorista = Usuarios.objects.create_user('m@bogocargo.co', 'clave-123', nombre='M', tipo='MINORISTA')
+        self.client.force_login(minorista)
+        envios = [
+            {'peso_total': 10, 'largo': 1, 'alto': 1, 'ancho': 1,
+             'origen': 'Calle 145 # 103B - 56, Localidad de Suba', 'destino': 'Carrera 86 # 61 Sur - 50, Localidad de Bosa'},
+            {'peso_total': 0, 'tipo_mercancia': 'PELIGROSOS'},
+        ]
+        url = reverse('backend:cotizar_envios')
+
+        respuesta = self.client.post(url, json.dumps({'envios': envios}), content_type='application/json')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.json()['cotizaciones'], [
+            {'precio': int(calcular_precio_envio(envios[0])[0]), 'volumen': 1.0},
+            {'precio': int(calcular_precio_envio(envios[1], FACTOR_SIN_RUTA)[0]), 'volumen': 0.0},
+        ])
+
+        self.assertEqual(self.client.post(url, '{"envios": 5}', content_type='application/json').status_code, 400)
+
+    def test_valores_no_finitos_son_error_del_envio(self):
+        minorista = Usuarios.objects.create_user('m@bogocargo.co', 'clave-123', nombre='M', tipo='MINORISTA')
+        self.client.force_login(minorista)
+        url = reverse('backend:cotizar_envios')
+        # Cuerpos crudos: json.dumps no escribe 1e400, y NaN/Infinity sin comillas son extensiones de Python
+        for valor in ('"NaN"', '"Infinity"', '"-inf"', '"sNaN"', '"1e400"', '1e400', 'NaN', '1' + '0' * 400,
+                      '{"largo": "1e200", "alto": "1e200", "ancho": "1e200"}'):
+            envio = valor if valor.startswith('{') else f'{{"peso_total": {valor}}}'
+            with self.subTest(valor=valor):
+                respuesta = self.client.post(url, f'{{"envios": [{{"peso_total": 1}}, {envio}]}}',
+                                             content_type='application/json')
+                self.assertEqual(respuesta.status_code, 400)
+                self.assertEqual(respuesta.json()['indice'], 1)
+
+        with self.assertRaises(EnvioInvalido):
+            calcular_precio_envio({'peso_total': 'NaN'}, 1.0)
+
+
+class MotorDistanciasTests(TestCase):
+
+    def setUp(self):
+        self.directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directorio.cleanup)
+        self.cache = f'{self.directorio.name}/distancias.bin'
+        self.motor = MotorDistancias(ruta_cache=self.cache)
+
+    def test_distancias_repetibles_y_coherentes(self):
+        suba, bosa = 'Calle 145 # 103B - 56, Localidad de Suba', 'Carrera 86 # 61 Sur - 50, Localidad de Bosa'
+        self.assertEqual(self.motor.distancia_km(suba, bosa), self.motor.distancia_km(bosa, suba))
+        self.assertIsNone(self.motor.distancia_km(suba, 'Dirección no encontrada'))
+        self.assertEqual(self.motor.factor_distancia(suba, 'Medellín'), FACTOR_SIN_RUTA)
+        # La calle no engaña: manda la localidad mencionada al final
+        self.assertEqual(self.motor.nombres[self.motor.zona('Avenida Suba # 95 - 10, Engativá')], 'Engativá')
+
+        n = self.motor.n
+        d = self.motor.metros_entre_zonas
+        for i in range(n):
+            for j in range(n):
+                if i != j:
+                    self.assertTrue(0 < d(i, j) < 2 ** 32 - 1)
+                    self.assertTrue(all(d(i, j) <= d(i, k) + d(k, j) for k in range(n) if k not in (i, j)))
+
+    def test_cache_se_reutiliza_y_se_invalida_al_cambiar_la_red(self):
+        self.motor.zona('Suba')
+        with open(self.cache, 'rb') as archivo:
+            original = archivo.read()
+
+        otro = MotorDistancias(ruta_cache=self.cache)
+        self.assertEqual(otro.distancia_km('Suba', 'Bosa'), self.motor.distancia_km('Suba', 'Bosa'))
+
+        red = json.loads(RUTA_RED_VIAL.read_text(encoding='utf-8'))
+        red['tramos'] = [[a, b, km * 2] for a, b, km in red['tramos']]
+        ruta_red = f'{self.directorio.name}/red.json'
+        with open(ruta_red, 'w', encoding='utf-8') as archivo:
+            json.dump(red, archivo)
+        modificado = MotorDistancias(ruta_red=ruta_red, ruta_cache=self.cache)
+        self.assertEqual(modificado.distancia_km('Suba', 'Bosa'), 2 * self.motor.distancia_km('Suba', 'Bosa'))
+        with open(self.cache, 'rb') as archivo:
+            self.assertNotEqual(archivo.read(), original)
+
+
+class EmailAuthBackendTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuarios.objects.create_user('Ana.Perez@BogoCargo.co', 'clave-123', nombre='Ana', tipo='MINORISTA')
+
+    def test_login_por_email_normalizado(self):
+        self.assertEqual(self.usuario.email_normalizado, 'ana.perez@bogocargo.co')
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(authenticate(email='  ANA.perez@bogocargo.CO ', password='clave-123'), self.usuario)
+        sql = consultas.captured_queries[0]['sql']
+        self.assertIn('email_normalizado', sql)
+        self.assertNotIn('LIKE', sql.upper())
+        self.assertIsNone(authenticate(email='ana.perez@bogocargo.co', password='otra'))
+
+    def test_email_repetido_con_otras_mayusculas_es_error_del_formulario(self):
+        datos = {'nombre': 'Otra', 'email': 'ANA.PEREZ@bogocargo.co', 'tipo': 'MINORISTA', 'password': 'clave-456',
+                 'password2': 'clave-456'}
+        registro = RegistroForm(datos)
+        self.assertFalse(registro.is_valid())
+        self.assertIn('email', registro.errors)
+        # Editar al mismo usuario con su propio email no es un duplicado
+        self.assertNotIn('email', UsuarioForm(dict(datos, is_active=True), instance=self.usuario).errors)
+
+        admin = Usuarios.objects.create_user('admin@bogocargo.co', 'clave-123', nombre='A', tipo='ADMIN', is_staff=True)
+        self.client.force_login(admin)
+        respuesta = self.client.post(reverse('frontend:usuarios_create'), dict(datos, is_active=True))
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertContains(respuesta, 'Ya existe un usuario con este email.')
+        self.assertEqual(Usuarios.objects.filter(email_normalizado='ana.perez@bogocargo.co').count(), 1)
+
+    def test_get_user_cacheado_hasta_que_el_usuario_cambia(self):
+        backend = EmailAuthBackend()
+        backend.get_user(self.usuario.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(backend.get_user(self.usuario.pk).nombre, 'Ana')
+
+        self.usuario.nombre = 'Ana María'
+        self.usuario.save()
+        with self.assertNumQueries(1):
+            self.assertEqual(backend.get_user(self.usuario.pk).nombre, 'Ana María')
+        self.assertIsNone(backend.get_user(10 ** 9))
+
+    def test_paginas_sin_consulta_del_usuario_de_sesion(self):
+        self.client.force_login(self.usuario)
+        url = reverse('frontend:dashboard_minorista')
+        with CaptureQueriesContext(connection) as primera:
+            self.client.get(url)
+        with CaptureQueriesContext(connection) as segunda:
+            self.client.get(url)
+        self.assertEqual(len(segunda), len(primera) - 1)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class LimiteIntentosLoginTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuarios.objects.create_user('m@bogocargo.co', 'clave-123', nombre='M', tipo='MINORISTA')
+
+    def setUp(self):
+        cache.clear()
+        cubetas_login.limpiar_local()
+
+    def test_cubeta_de_fichas(self):
+        almacen = AlmacenCubetas('prueba')
+        cubetas = [('a', 3, 10.0), ('b', 100, 1.0)]
+        self.assertEqual([almacen.consumir(cubetas, ahora=0) for _ in range(3)], [0, 0, 0])
+        self.assertEqual(almacen.consumir(cubetas, ahora=0), 10.0)
+        # Todo o nada: la cubeta 'b' no gastó ficha en el intento rechazado
+        self.assertEqual(cache.get('prueba:b'), 3.0)
+        # Aunque la caché compartida pierda el estado, el proceso recuerda el bloqueo
+        cache.clear()
+        self.assertEqual(almacen.consumir(cubetas, ahora=5), 5.0)
+        self.assertEqual(almacen.consumir(cubetas, ahora=10), 0)
+
+    def test_bloqueo_antes_de_bd_y_hash(self):
+        url = reverse('frontend:login')
+        for _ in range(5):
+            self.assertEqual(self.client.post(url, {'email': 'M@bogocargo.co', 'password': 'mala'}).status_code, 302)
+
+        with self.assertNumQueries(0):
+            respuesta = self.client.post(url, {'email': 'm@bogocargo.co', 'password': 'clave-123'})
+        self.assertEqual(respuesta.status_code, 429)
+        self.assertTemplateUsed(respuesta, 'FRONTEND/lockout.html')
+        self.assertEqual(respuesta['Retry-After'], '60')
+
+        # Otra cuenta desde la misma IP sigue pudiendo entrar, y el éxito devuelve su cubeta
+        otro = Usuarios.objects.create_user('c@bogocargo.co', 'clave-123', nombre='C', tipo='MINORISTA')
+        self.client.post(url, {'email': otro.email, 'password': 'mala'})
+        self.client.post(url, {'email': otro.email, 'password': 'clave-123'})
+        self.assertIsNone(cache.get('limite:login:email:c@bogocargo.co'))
+
+
+class PesoTotalIncrementalTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.minorista = Usuarios.objects.create_user('m@bogocargo.co', 'clave-123', nombre='M', tipo='MINORISTA')
+        empresa = Empresas.objects.create(nombre='Mayorista Uno', nit='9001', tipo='MAYORISTA')
+        cls.productos = Productos.objects.bulk_create([
+            Productos(nombre=f'P{i}', peso_kg=Decimal(peso), empresa=empresa)
+            for i, peso in enumerate(['2.50', '10.00', '1.25'] + ['0.50'] * 200)
+        ])
+
+    def peso(self, pedido):
+        return Pedidos.objects.values_list('peso_total', flat=True).get(pk=pedido.pk)
+
+    def assertPesoIgualARecalculo(self, *pedidos):
+        pesos = [self.peso(p) for p in pedidos]
+        recalcular_peso_total([p.pk for p in pedidos])
+        self.assertEqual(pesos, [self.peso(p) for p in pedidos])
+
+    def test_diferencias_coinciden_con_recalculo(self):
+        p1, p2, p3 = self.productos[:3]
+        pedido = crear_pedido(self.minorista, peso_total=5)
+        otro = crear_pedido(self.minorista, peso_total=7)
+
+        linea1 = DetallePedido.objects.create(pedido=pedido, producto=p1, cantidad=4)
+        self.assertEqual(self.peso(pedido), Decimal('10.00'))  # Reemplaza el peso capturado a mano
+        linea2 = DetallePedido.objects.create(pedido=pedido, producto=p2, cantidad=1)
+        self.assertEqual(self.peso(pedido), Decimal('20.00'))
+
+        linea1 = DetallePedido.objects.get(pk=linea1.pk)
+        linea1.cantidad = 2
+        linea1.save()
+        linea2.producto = p3
+        linea2.save()
+        self.assertEqual(self.peso(pedido), Decimal('6.25'))
+        self.assertPesoIgualARecalculo(pedido)
+
+        linea2.pedido = otro
+        linea2.save()
+        self.assertEqual((self.peso(pedido), self.peso(otro)), (Decimal('5.00'), Decimal('1.25')))
+        linea1.delete()
+        self.assertEqual(self.peso(pedido), Decimal('0.00'))
+        self.assertPesoIgualARecalculo(pedido, otro)
+
+    def test_costo_constante_por_linea(self):
+        pedido = crear_pedido(self.minorista)
+        DetallePedido.objects.bulk_create([DetallePedido(pedido=pedido, producto=p, cantidad=1) for p in self.productos[3:]])
+        recalcular_peso_total([pedido.pk])
+
+        # INSERT + UPDATE con F() (el producto ya está en memoria), sin importar cuántas líneas tenga el pedido
+        with self.assertNumQueries(2):
+            DetallePedido.objects.create(pedido=pedido, producto=self.productos[0], cantidad=2)
+        self.assertEqual(self.peso(pedido), Decimal('105.00'))
+
+    def test_edicion_masiva_recalcula_una_vez(self):
+        pedido = crear_pedido(self.minorista)
+        with edicion_masiva_lineas() as pedidos:
+            DetallePedido.objects.bulk_create([DetallePedido(pedido=pedido, producto=p, cantidad=2) for p in self.productos[3:]])
+            pedidos.add(pedido.pk)
+            with self.assertNumQueries(1):
+                DetallePedido.objects.create(pedido=pedido, producto=self.productos[1], cantidad=1)
+            self.assertEqual(self.peso(pedido), Decimal('5.00'))
+        self.assertEqual(self.peso(pedido), Decimal('210.00'))
+
+
+class ImportacionPedidosTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.minorista = Usuarios.objects.create_user('m@bogocargo.co', 'clave-123', nombre='M', tipo='MINORISTA')
+        cls.mayorista = Empresas.objects.create(
+            nombre='Mayorista Uno', nit='9001', tipo='MAYORISTA', direccion='Calle 13 # 68-10 Fontibón', ciudad='Bogotá',
+        )
+
+    def hoja(self, filas, separador=';'):
+        manana = (date.today() + timedelta(days=1)).isoformat()
+        encabezado = ['Mayorista', 'Referencia', 'Destino', 'Tipo Mercancía', 'Fecha Recolección', 'Hora Recolección',
+                      'Valor Declarado', 'Peso Total', 'Unidades', 'Largo', 'Alto', 'Ancho']
+        lineas = [encabezado] + [[f.get('mayorista', '9001'), f.get('referencia', ''), 'Cra 7 # 72-10 Chapinero',
+                                  f.get('tipo', 'SECAS'), f.get('fecha', manana), '09:00', '200000',
+                                  f.get('peso', '12.5'), '2', '0.5', '0.4', '0.3'] for f in filas]
+        return BytesIO('\n'.join(separador.join(linea) for linea in lineas).encode('utf-8-sig'))
+
+    def test_csv_crea_pedidos_facturas_eventos_y_reporta_errores(self):
+        filas = [{'referencia': 'A1'}, {'referencia': 'A2', 'mayorista': str(self.mayorista.pk)},
+                 {'referencia': 'A3', 'mayorista': 'no-existe'}, {'referencia': 'A4', 'peso': 'pesado'},
+                 {'referencia': 'A5', 'fecha': '2000-01-01'}, {'referencia': 'A1'}]
+        resultado = importar_pedidos(self.hoja(filas), 'pedidos.csv', self.minorista, tamano_lote=1)
+
+        self.assertEqual(resultado['creados'], 2)
+        self.assertEqual([(e['fila'], sorted(e['errores'])) for e in resultado['errores']], [
+            (4, ['mayorista']), (5, ['peso_total']), (6, ['fecha_recoleccion']), (7, ['referencia']),
+        ])
+        pedido = Pedidos.objects.get(referencia_importacion=f'{self.minorista.pk}:A1')
+        precio, volumen = calcular_precio_envio({
+            'peso_total': '12.5', 'unidades': 2, 'largo': '0.5', 'alto': '0.4', 'ancho': '0.3',
+            'tipo_mercancia': 'SECAS', 'origen': pedido.origen, 'destino': pedido.destino,
+        })
+        self.assertEqual((pedido.precio_estimado, pedido.volumen), (precio, volumen))
+        self.assertEqual(volumen, Decimal('0.12'))
+        self.assertEqual((pedido.origen, pedido.empresa_mayorista), ('Calle 13 # 68-10 Fontibón, Bogotá', str(self.mayorista.pk)))
+        self.assertEqual(Factura.objects.get(orden=pedido).monto_total, pedido.precio_estimado)
+        self.assertEqual(EventoBolsa.objects.filter(tipo='CREADO').count(), 2)
+        self.assertEqual(leer_contadores()[('PEDIDOS', 'PENDIENTE')], 2)
+
+        # Reimportar el mismo archivo no duplica los pedidos ya creados
+        resultado = importar_pedidos(self.hoja(filas[:2]), 'pedidos.csv', self.minorista)
+        self.assertEqual(resultado['creados'], 0)
+        self.assertEqual(Pedidos.objects.count(), 2)
+
+    def test_xlsx_y_endpoint(self):
+        from openpyxl import Workbook
+
+        libro = Workbook()
+        hoja = libro.active
+        hoja.append(['mayorista', 'destino', 'tipo_mercancia', 'fecha_recoleccion', 'hora_recoleccion',
+                     'valor_declarado', 'peso_total', 'unidades', 'largo', 'alto', 'ancho'])
+        for _ in range(3):
+            hoja.append([9001, 'Cra 7 # 72-10 Chapinero', 'FRAGIL', date.today() + timedelta(days=2),
+                         timedelta(hours=10), 50000, 3.5, 1, 0.2, 0.2, 0.2])
+        contenido = BytesIO()
+        libro.save(contenido)
+
+        self.client.force_login(self.minorista)
+        archivo = SimpleUploadedFile('pedidos.xlsx', contenido.getvalue())
+        respuesta = self.client.post(reverse('backend:importar_pedidos'), {'archivo': archivo})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.json(), {'creados': 3, 'errores': [], 'total_errores': 0})
+        self.assertEqual(Pedidos.objects.filter(minorista=self.minorista, tipo_mercancia='FRAGIL').count(), 3)
+
+        sin_columnas = SimpleUploadedFile('pedidos.csv', b'destino\nCalle 1\n')
+        respuesta = self.client.post(reverse('backend:importar_pedidos'), {'archivo': sin_columnas})
+        self.assertEqual(respuesta.status_code, 400)
+
+
+class FacturaPdfTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.minorista = Usuarios.objects.create_user('m@bogocargo.co', 'clave-123', nombre='M', tipo='MINORISTA')
+        cls.otro = Usuarios.objects.create_user('o@bogocargo.co', 'clave-123', nombre='O', tipo='MINORISTA')
+        cls.facturas = [
+            Factura.objects.create(orden=crear_pedido(cls.minorista), monto_total=25000,
+                                   fecha_emision=date(2026, 9, dia), fecha_vencimiento=date(2026, 9, dia) + timedelta(days=15))
+            for dia in (1, 10, 30)
+        ]
+
+    def setUp(self):
+        # Un directorio por prueba: los PDF de una no cuentan como ya generados en otra
+        directorio = tempfile.TemporaryDirectory(prefix='bogocargo_facturas_')
+        self.addCleanup(directorio.cleanup)
+        ajuste = override_settings(FACTURAS_PDF_DIR=directorio.name)
+        ajuste.enable()
+        self.addCleanup(ajuste.disable)
+
+    def test_pdf_se_genera_una_vez_por_version(self):
+        factura = self.facturas[0]
+        url = reverse('frontend:factura_pdf', args=[factura.pk])
+        self.client.force_login(self.minorista)
+
+        respuesta = self.client.get(url)
+        self.assertEqual(respuesta['Content-Type'], 'application/pdf')
+        self.assertTrue(b''.join(respuesta.streaming_content).startswith(b'%PDF'))
+        ruta, version = obtener_pdf_factura(Factura.objects.select_related('orden__minorista').get(pk=factura.pk))
+        self.assertEqual(respuesta['ETag'], f'"{version}"')
+
+        with mock.patch('BACKEND.facturas_pdf.renderizar_pdf') as renderizar:
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=f'"{version}"').status_code, 304)
+            self.assertEqual(self.client.get(url).status_code, 200)
+            renderizar.assert_not_called()
+
+        # Guardar un dato impreso cambia la versión; la anterior no se borra al servir la descarga
+        factura.estado = 'PAGADA'
+        factura.save()
+        respuesta = self.client.get(url)
+        self.assertNotEqual(respuesta['ETag'], f'"{version}"')
+        self.assertTrue(ruta.exists())
+
+        self.client.force_login(self.otro)
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+    def test_pdf_borrado_antes_de_abrirlo_se_regenera(self):
+        factura = Factura.objects.select_related('orden__minorista').get(pk=self.facturas[1].pk)
+        ruta, version = obtener_pdf_factura(factura)
+        self.client.force_login(self.minorista)
+
+        # Simula una poda que borra el archivo entre la comprobación y la apertura
+        abrir = open
+        def abrir_tras_borrar(archivo, *args, **kwargs):
+            if archivo == ruta and ruta.exists() and not abrir_tras_borrar.borrado:
+                abrir_tras_borrar.borrado = True
+                ruta.unlink()
+            return abrir(archivo, *args, **kwargs)
+        abrir_tras_borrar.borrado = False
+        with mock.patch('builtins.open', abrir_tras_borrar):
+            respuesta = self.client.get(reverse('frontend:factura_pdf', args=[factura.pk]))
+        self.assertTrue(abrir_tras_borrar.borrado)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta['ETag'], f'"{version}"')
+        self.assertTrue(b''.join(respuesta.streaming_content).startswith(b'%PDF'))
+
+    def test_prerender_poda_solo_versiones_viejas(self):
+        factura = self.facturas[2]
+        vigente = obtener_pdf_factura(Factura.objects.select_related('orden__minorista').get(pk=factura.pk))[0]
+        vieja, reciente = vigente.with_name('vieja.pdf'), vigente.with_name('reciente.pdf')
+        vieja.write_bytes(b'%PDF')
+        reciente.write_bytes(b'%PDF')
+        hace = time.time() - EDAD_PODA_VERSIONES - 60
+        os.utime(vieja, (hace, hace))
+        os.utime(vigente, (hace, hace))
+
+        prerenderizar_periodo(date(2026, 9, 30), date(2026, 9, 30), procesos=1)
+        self.assertFalse(vieja.exists())
+        self.assertTrue(reciente.exists())
+        self.assertTrue(vigente.exists())
+
+    def test_prerender_del_periodo(self):
+        salida = StringIO()
+        call_command('prerenderizar_facturas', '2026-09-01:2026-09-10', procesos=1, tarea=1, stdout=salida)
+        self.assertIn('2 facturas', salida.getvalue())
+        self.assertIn('2 PDF generados', salida.getvalue())
+        self.assertEqual(prerenderizar_periodo(date(2026, 9, 1), date(2026, 9, 30), procesos=1), (3, 1))
+
+
+class VencerFacturasTests(TestCase):
+
+    def test_vence_solo_pendientes_atrasadas_por_lotes(self):
+        minorista = Usuarios.objects.create_user('m@bogocargo.co', 'clave-123', nombre='M', tipo='MINORISTA')
+        corte = date(2026, 10, 1)
+        casos = [('PENDIENTE_PAGO', -3)] * 5 + [('PENDIENTE_PAGO', 0), ('PENDIENTE_PAGO', 4), ('PAGADA', -10), ('ANULADA', -1)]
+        for estado, dias in casos:
+            Factura.objects.create(orden=crear_pedido(minorista), monto_total=1000, estado=estado,
+                                   fecha_vencimiento=corte + timedelta(days=dias))
+
+        salida = StringIO()
+        with CaptureQueriesContext(connection) as ctx:
+            call_command('vencer_facturas', fecha='2026-10-01', lote=2, stdout=salida)
+        self.assertIn('5 facturas vencidas al 2026-10-01 en 3 lotes', salida.getvalue())
+        self.assertEqual(len(ctx.captured_queries), 3 * 2 + 1)  # SELECT + UPDATE por lote y el SELECT vacío
+        self.assertEqual(
+            Counter(Factura.objects.values_list('estado', flat=True)),
+            Counter({'VENCIDA': 5, 'PENDIENTE_PAGO': 2, 'PAGADA': 1, 'ANULADA': 1}),
+        )
+
+        call_command('vencer_facturas', fecha='2026-10-01', stdout=salida)
+        self.assertIn('0 facturas vencidas', salida.getvalue())
+
+
+class PaginacionCursorTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        minorista = Usuarios.objects.create_user('m@bogocargo.co', 'clave-123', nombre='M', tipo='MINORISTA')
+        base = timezone.now().replace(microsecond=0)
+        # Tres pedidos con la misma fecha de creación: el id desempata
+        for minutos in (0, 5, 5, 5, 10, 15, 20):
+            pedido = crear_pedido(minorista)
+            Pedidos.objects.filter(pk=pedido.pk).update(fecha_creacion=base - timedelta(minutes=minutos))
+        cls.orden = list(Pedidos.objects.order_by('-fecha_creacion', '-id'))
+
+    def pagina(self, url='/', **params):
+        return paginar_por_cursor(Pedidos.objects.all(), RequestFactory().get(url, params))
+
+    def test_ida_y_vuelta_con_empates_en_la_fecha(self):
+        paginas = [self.pagina(size=3)]
+        while paginas[-1].has_next:
+            paginas.append(self.pagina('/' + paginas[-1].next_url))
+        self.assertEqual([len(p) for p in paginas], [3, 3, 1])
+        self.assertEqual([pedido for p in paginas for pedido in p], self.orden)
+        self.assertFalse(paginas[0].has_prev)
+        self.assertTrue(paginas[-1].has_prev)
+
+        # De vuelta desde la última: las mismas páginas, en el mismo orden interno
+        pagina = paginas[-1]
+        for esperada in reversed(paginas[:-1]):
+            pagina = self.pagina('/' + pagina.prev_url)
+            self.assertEqual(list(pagina), list(esperada))
+            self.assertTrue(pagina.has_next)
+        self.assertFalse(pagina.has_prev)
+
+        # El cursor conserva los demás parámetros del GET
+        self.assertIn('q=kennedy', self.pagina(size=3, q='kennedy').next_url)
+
+    def test_tamano_entre_1_y_el_maximo(self):
+        self.assertEqual(len(self.pagina(size=0)), 1)
+        self.assertEqual(len(self.pagina(size=-4)), 1)
+        self.assertEqual(self.pagina(size=10 ** 6).page_size, PAGE_SIZE_MAX)
+        self.assertEqual(self.pagina(size='diez').page_size, PAGE_SIZE_DEFAULT)
+        self.assertEqual(paginar_por_cursor(Pedidos.objects.all(), RequestFactory().get('/'), page_size=2).page_size, 2)
+
+    def test_cursor_alterado_o_basura_vuelve_a_la_primera_pagina(self):
+        def token(texto):
+            return base64.urlsafe_b64encode(texto.encode()).decode().rstrip('=')
+
+        primera = list(self.pagina(size=3))
+        for cursor in ('basura', '%%%', 'ñandú', token('sin separador'), token('ayer|3'),
+                       token(f'{timezone.now().isoformat()}|tres'), base64.urlsafe_b64encode(b'\xff\xfe|1').decode()):
+            with self.subTest(cursor=cursor):
+                self.assertIsNone(decode_cursor(cursor))
+                self.assertEqual(list(self.pagina(size=3, after=cursor)), primera)
+                self.assertEqual(list(self.pagina(size=3, before=cursor)), primera)
+
+        # Un cursor bien formado de otra posición solo mueve el punto de partida
+        fecha, pk = decode_cursor(encode_cursor(self.orden[1].fecha_creacion, self.orden[1].pk))
+        self.assertEqual((fecha, pk), (self.orden[1].fecha_creacion, self.orden[1].pk))
+        self.assertEqual(list(self.pagina(size=2, after=encode_cursor(fecha, pk))), self.orden[2:4])
+
+
+class BusquedaPedidosTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.minorista = Usuarios.objects.create_user('m@bogocargo.co', 'clave-123', nombre='M', tipo='MINORISTA')
+        cls.otro = Usuarios.objects.create_user('o@bogocargo.co', 'clave-123', nombre='O', tipo='MINORISTA')
+        cls.chapinero = crear_pedido(cls.minorista, origen='Calle 13 # 68-10, Fontibón', destino='Carrera 7 # 72-41, Chapinero')
+        cls.fragil = crear_pedido(cls.minorista, origen='Cra 30 # 45, Teusaquillo', destino='Calle 100, Usaquén',
+                                  observaciones='Cajas frágiles, entregar en Chapinero Alto')
+        cls.ajeno = crear_pedido(cls.otro, origen='Av. Suba # 95, Suba', destino='Calle 72, Chapinero')
+
+    def buscar(self, texto, pedidos=None, **params):
+        request = RequestFactory().get('/', params)
+        return list(buscar_pedidos(texto, pedidos if pedidos is not None else Pedidos.objects.all(), request))
+
+    def test_tokenizacion_y_mantenimiento_del_indice(self):
+        self.assertEqual(tokenizar('Envío a la Cra. 7 #72-41, CHAPINERO'), ['envio', 'cra', '7', '72', '41', 'chapinero'])
+        self.assertEqual(TerminoPedido.objects.get(pedido=self.fragil, termino='chapinero').peso, 1)
+
+        pedido = Pedidos.objects.get(pk=self.chapinero.pk)
+        pedido.estado = 'CANCELADO'
+        with CaptureQueriesContext(connection) as ctx:
+            pedido.save()
+        self.assertFalse([q for q in ctx.captured_queries if 'terminopedido' in q['sql'].lower()])
+
+        pedido.destino = 'Calle 26, Engativá'
+        pedido.save()
+        self.assertEqual(self.buscar('engativa'), [pedido])
+        self.assertNotIn(pedido, self.buscar('chapinero'))
+
+        TerminoPedido.objects.all().delete()
+        reconstruir_indice()
+        self.assertEqual(self.buscar('engativa'), [pedido])
+
+    def test_codigo_palabras_puntaje_y_visibilidad(self):
+        self.assertEqual(self.buscar(f'bocg-{self.fragil.pk:05d}'), [self.fragil])
+        self.assertEqual(self.buscar(f'BOCG{self.ajeno.pk}', Pedidos.objects.filter(minorista=self.minorista)), [])
+
+        # En la dirección pesa más que en las observaciones; el prefijo también coincide
+        self.assertEqual(self.buscar('chapin'), [self.ajeno, self.chapinero, self.fragil])
+        self.assertEqual(self.buscar('chapinero', Pedidos.objects.filter(minorista=self.minorista)),
+                         [self.chapinero, self.fragil])
+        # Todas las palabras deben aparecer
+        self.assertEqual(self.buscar('chapinero frágiles'), [self.fragil])
+        self.assertEqual(self.buscar('chapinero bosa'), [])
+
+    def test_paginacion_por_cursor_de_relevancia(self):
+        for i in range(7):
+            crear_pedido(self.minorista, destino=f'Calle {i}, Kennedy' + ' Kennedy Central' * (i % 2))
+        pagina = buscar_pedidos('kennedy', Pedidos.objects.all(), RequestFactory().get('/', {'size': 3}))
+        vistos = list(pagina)
+        while pagina.has_next:
+            pagina = buscar_pedidos('kennedy', Pedidos.objects.all(), RequestFactory().get('/' + pagina.next_url))
+            vistos += list(pagina)
+        self.assertEqual(len(vistos), 7)
+        self.assertEqual(len(set(vistos)), 7)
+        anterior = buscar_pedidos('kennedy', Pedidos.objects.all(), RequestFactory().get('/' + pagina.prev_url))
+        self.assertEqual(list(anterior), vistos[3:6])
+
+
+class RastreoIngestaTests(TestCase):
+    def setUp(self):
+        minorista = Usuarios.objects.create_user('min@test.co', 'x', nombre='M', tipo='MINORISTA')
+        self.conductor = Usuarios.objects.create_user('cond@test.co', 'x', nombre='C', tipo='CONDUCTOR')
+        otro = Usuarios.objects.create_user('otro@test.co', 'x', nombre='O', tipo='CONDUCTOR')
+        self.envio = Envios.objects.create(pedido=crear_pedido(minorista), conductor=self.conductor)
+        self.ajeno = Envios.objects.create(pedido=crear_pedido(minorista), conductor=otro)
+        self.client.force_login(self.conductor)
+        self.buffer = BufferRastreo(tamano_lote=5, vaciado_periodico=False)
+        parche = mock.patch('BACKEND.rastreo.buffer_rastreo', self.buffer)
+        parche.start()
+        self.addCleanup(parche.stop)
+
+    def enviar(self, puntos):
+        return self.client.post(reverse('backend:rastreo_puntos'), json.dumps({'puntos': puntos}),
+                                content_type='application/json')
+
+    def test_valida_cada_punto_y_encola_los_aceptados(self):
+        respuesta = self.enviar([
+            {'envio': self.envio.pk, 'lat': 4.65, 'lon': -74.05, 'fecha_hora': '2026-10-17T08:00:00-05:00'},
+            {'envio': self.ajeno.pk, 'lat': 4.65, 'lon': -74.05},
+            {'envio': self.envio.pk, 'lat': 91, 'lon': -74.05},
+            {'envio': self.envio.pk, 'lat': 4.6, 'lon': -74.1, 'fecha_hora': '2999-01-01T00:00:00Z'},
+        ])
+        self.assertEqual(respuesta.status_code, 202)
+        datos = respuesta.json()
+        self.assertEqual(datos['aceptados'], 1)
+        self.assertEqual([e['indice'] for e in datos['errores']], [1, 2, 3])
+        # Aún en el búfer: se escribe al completar el lote o al vencer la espera
+        self.assertEqual(RastreoEnvio.objects.count(), 0)
+        self.buffer.vaciar()
+        rastreo = RastreoEnvio.objects.get()
+        self.assertEqual(rastreo.ubicacion, '4.650000,-74.050000')
+        # Se conserva la hora del dispositivo, no la de llegada
+        self.assertEqual(rastreo.fecha_hora.isoformat(), '2026-10-17T13:00:00+00:00')
+
+    def test_envio_que_no_es_un_id_es_error_del_punto(self):
+        respuesta = self.enviar([
+            {'envio': [self.envio.pk], 'lat': 4.65, 'lon': -74.05},
+            {'envio': {'id': self.envio.pk}, 'lat': 4.65, 'lon': -74.05},
+            {'envio': True, 'lat': 4.65, 'lon': -74.05},
+            {'envio': self.envio.pk, 'lat': 4.65, 'lon': -74.05},
+        ])
+        self.assertEqual(respuesta.status_code, 202)
+        datos = respuesta.json()
+        self.assertEqual(datos['aceptados'], 1)
+        self.assertEqual([e['indice'] for e in datos['errores']], [0, 1, 2])
+
+    def test_lote_completo_se_escribe_en_un_insert(self):
+        puntos = [{'envio': self.envio.pk, 'lat': 4.6 + i / 100, 'lon': -74.1} for i in range(5)]
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.enviar(puntos).status_code, 202)
+        self.assertEqual(RastreoEnvio.objects.filter(envio=self.envio).count(), 5)
+        self.assertEqual(len([q for q in ctx.captured_queries if q['sql'].startswith('INSERT')]), 1)
+        self.assertEqual(len(self.buffer), 0)
+
+    def test_fallo_al_escribir_no_pierde_el_lote_ni_da_500(self):
+        puntos = [{'envio': self.envio.pk, 'lat': 4.6 + i / 100, 'lon': -74.1} for i in range(5)]
+        # La base no responde: la petición que completa el lote recibe su 202 y los puntos siguen en el búfer
+        with mock.patch.object(RastreoEnvio.objects, 'bulk_create', side_effect=OperationalError("sin conexión")), \
+                self.assertLogs('BACKEND.rastreo', 'ERROR'):
+            self.assertEqual(self.enviar(puntos).status_code, 202)
+        self.assertEqual(len(self.buffer), 5)
+
+        # Una fila que viola una restricción solo se descarta ella
+        crear = RastreoEnvio.objects.bulk_create
+        def crear_sin_la_cuarta(lote, **kwargs):
+            if any(r.ubicacion.startswith('4.630000') for r in lote):
+                raise IntegrityError("FOREIGN KEY constraint failed")
+            return crear(lote, **kwargs)
+        with mock.patch.object(RastreoEnvio.objects, 'bulk_create', side_effect=crear_sin_la_cuarta), \
+                self.assertLogs('BACKEND.rastreo', 'WARNING'):
+            self.assertEqual(self.buffer.vaciar(), 4)
+        self.assertEqual(len(self.buffer), 0)
+        self.assertEqual(sorted(RastreoEnvio.objects.values_list('ubicacion', flat=True)),
+                         [f'4.6{i}0000,-74.100000' for i in (0, 1, 2, 4)])
+
+    def test_solo_conductores_y_cuerpo_valido(self):
+        self.assertEqual(self.enviar([]).status_code, 400)
+        self.client.force_login(Usuarios.objects.get(email='min@test.co'))
+        self.assertEqual(self.enviar([{'envio': self.envio.pk, 'lat': 1, 'lon': 1}]).status_code, 403)
+
+    def test_ultima_posicion_ignora_lotes_atrasados(self):
+        self.enviar([
+            {'envio': self.envio.pk, 'lat': 4.61, 'lon': -74.1, 'fecha_hora': '2026-10-17T08:05:00-05:00'},
+            {'envio': self.envio.pk, 'lat': 4.60, 'lon': -74.1, 'fecha_hora': '2026-10-17T08:00:00-05:00'},
+        ])
+        self.buffer.vaciar()
+        # Lote reenviado con puntos anteriores: no retrocede la posición
+        self.enviar([{'envio': self.envio.pk, 'lat': 4.50, 'lon': -74.1, 'fecha_hora': '2026-10-17T07:00:00-05:00'}])
+        self.buffer.vaciar()
+        self.envio.refresh_from_db()
+        self.assertEqual(self.envio.ultima_ubicacion, '4.610000,-74.100000')
+        self.assertEqual(self.envio.ultima_fecha_rastreo.isoformat(), '2026-10-17T13:05:00+00:00')
+
+        # Un punto guardado individualmente (admin, shell) también la actualiza
+        RastreoEnvio.objects.create(envio=self.envio, ubicacion='Bodega Fontibón', estado='ENTREGADO')
+        self.envio.refresh_from_db()
+        self.assertEqual(self.envio.ultimo_estado_rastreo, 'ENTREGADO')
+
+    def test_posiciones_de_varios_envios_en_una_consulta(self):
+        RastreoEnvio.objects.create(envio=self.envio, ubicacion='4.6,-74.08', estado='EN_RUTA')
+        RastreoEnvio.objects.create(envio=self.ajeno, ubicacion='4.7,-74.05', estado='EN_RUTA')
+        admin = Usuarios.objects.create_user('admin@test.co', 'x', nombre='A', tipo='ADMIN')
+        self.client.force_login(admin)
+        url = reverse('backend:rastreo_posiciones')
+        with self.assertNumQueries(3):  # sesión, usuario, envíos
+            datos = self.client.get(url, {'envios': f'{self.envio.pk},{self.ajeno.pk}'}).json()
+        self.assertEqual([(p['envio'], p['lat'], p['lon']) for p in datos['posiciones']],
+                         [(self.envio.pk, 4.6, -74.08), (self.ajeno.pk, 4.7, -74.05)])
+
+        # El conductor solo ve sus envíos
+        self.client.force_login(self.conductor)
+        datos = self.client.get(url).json()
+        self.assertEqual([p['envio'] for p in datos['posiciones']], [self.envio.pk])
+        self.assertEqual(self.client.get(url, {'envios': 'x'}).status_code, 400)
+
+
+class RutaConductorTests(TestCase):
+    def test_secuencia_respeta_recogida_antes_de_entrega(self):
+        rng = random.Random(7)
+        puntos = [(rng.uniform(0, 30000), rng.uniform(0, 30000)) for _ in range(101)]
+        d = [[int(((a[0] - b[0]) ** 2 + (a[1] - b[1]) ** 2) ** 0.5) for b in puntos] for a in puntos]
+        # Nodos impares: recogidas; cada par es la entrega de la recogida anterior
+        antes = [None] + [None if i % 2 else i - 1 for i in range(1, 101)]
+
+        secuencia = secuencia_optima(d, antes)
+        self.assertEqual(sorted(secuencia), list(range(1, 101)))
+        posicion = {nodo: k for k, nodo in enumerate(secuencia)}
+        self.assertTrue(all(antes[nodo] is None or posicion[antes[nodo]] < posicion[nodo] for nodo in secuencia))
+        # Mejor que visitar pedido por pedido
+        self.assertLess(costo_ruta([0] + secuencia, d), costo_ruta(list(range(101)), d) / 2)
+
+    def test_ruta_desde_la_ultima_posicion_del_conductor(self):
+        minorista = Usuarios.objects.create_user('min@test.co', 'x', nombre='M', tipo='MINORISTA')
+        conductor = Usuarios.objects.create_user('cond@test.co', 'x', nombre='C', tipo='CONDUCTOR')
+        en_camion = crear_pedido(minorista, conductor=conductor, estado='EN_RUTA', destino='Calle 3, Bosa')
+        lejano = crear_pedido(minorista, conductor=conductor, estado='ASIGNADO',
+                              origen='Calle 1, Usaquén', destino='Calle 2, Suba')
+        Envios.objects.create(pedido=en_camion, conductor=conductor, ultima_ubicacion='4.62,-74.18',
+                              ultima_fecha_rastreo=timezone.now())
+
+        ruta = planificar_ruta(conductor)
+        # El conductor está en Bosa: entrega lo que lleva antes de ir a recoger a Usaquén
+        self.assertEqual([(p['pedido'], p['tipo']) for p in ruta['paradas']],
+                         [(en_camion, ENTREGA), (lejano, RECOGIDA), (lejano, ENTREGA)])
+        self.assertLess(ruta['metros_total'], ruta['metros_sin_optimizar'])
+
+
+class BolsaConductorTests(TestCase):
+    def setUp(self):
+        minorista = Usuarios.objects.create_user('min@test.co', 'x', nombre='M', tipo='MINORISTA')
+        self.sobre_suba = crear_pedido(minorista, origen='Calle 145, Suba', peso_total=3, volumen=Decimal('0.05'))
+        self.caja_suba = crear_pedido(minorista, origen='Calle 140, Suba', peso_total=300, volumen=2)
+        self.estiba_suba = crear_pedido(minorista, origen='Calle 130, Suba', peso_total=3000, volumen=15)
+        self.sobre_usme = crear_pedido(minorista, origen='Calle 90 sur, Usme', peso_total=3, volumen=Decimal('0.05'))
+        self.sin_zona = crear_pedido(minorista, origen='Vereda El Hato', peso_total=3, volumen=Decimal('0.05'))
+        crear_pedido(minorista, origen='Calle 150, Suba', estado='ASIGNADO', peso_total=3, volumen=Decimal('0.05'))
+
+    def conductor(self, email, tipo_vehiculo, en_suba=True):
+        conductor = Usuarios.objects.create_user(email, 'x', nombre='C', tipo='CONDUCTOR', tipo_vehiculo=tipo_vehiculo)
+        if en_suba:
+            pedido = crear_pedido(self.sobre_suba.minorista, conductor=conductor, estado='EN_RUTA')
+            Envios.objects.create(pedido=pedido, conductor=conductor, ultima_ubicacion='4.74,-74.08',
+                                  ultima_fecha_rastreo=timezone.now())
+        return conductor
+
+    def bolsa(self, conductor, **params):
+        return list(paginar_bolsa(cubetas_conductor(conductor), RequestFactory().get('/', params)))
+
+    def test_solo_lo_que_el_vehiculo_lleva_y_recoge_cerca(self):
+        self.assertEqual(self.bolsa(self.conductor('moto@test.co', 'MOTO')), [self.sin_zona, self.sobre_suba])
+        self.assertEqual(self.bolsa(self.conductor('camion@test.co', 'CAMION_PEQUEÑO')),
+                         [self.sin_zona, self.estiba_suba, self.caja_suba, self.sobre_suba])
+        # Sin posición reciente: toda la ciudad
+        self.assertEqual(self.bolsa(self.conductor('lejos@test.co', 'MOTO', en_suba=False)),
+                         [self.sin_zona, self.sobre_usme, self.sobre_suba])
+        # Sin vehículo registrado no hay bolsa
+        self.assertEqual(self.bolsa(self.conductor('sinvehiculo@test.co', None)), [])
+
+    def test_clase_sigue_al_peso_aunque_se_actualice_con_f(self):
+        Pedidos.objects.filter(pk=self.sobre_suba.pk).update(peso_total=F('peso_total') + 500)
+        self.assertNotIn(self.sobre_suba, self.bolsa(self.conductor('moto@test.co', 'MOTO')))
+
+    def test_zona_se_recalcula_solo_si_se_guarda_el_origen(self):
+        self.assertEqual(self.sobre_suba.zona_origen, motor_distancias.zona('Suba'))
+        with mock.patch.object(motor_distancias, 'zona', wraps=motor_distancias.zona) as zona:
+            self.sobre_suba.estado = 'CANCELADO'
+            self.sobre_suba.save(update_fields=['estado'])
+            zona.assert_not_called()
+
+            self.sobre_suba.origen = 'Calle 90 sur, Usme'
+            self.sobre_suba.save(update_fields=['origen'])
+            zona.assert_called_once()
+        self.sobre_suba.refresh_from_db()
+        self.assertEqual(self.sobre_suba.zona_origen, motor_distancias.zona('Usme'))
+
+    def test_carga_aprobada_se_reclama_entera(self):
+        carga = CargaConsolidada.objects.create(fecha_recoleccion=date.today(), origen='Calle 145, Suba',
+                                                tipo_vehiculo='CAMIONETA', peso_total=6, volumen=Decimal('0.1'),
+                                                ocupacion=1, estado='APROBADA')
+        otro = crear_pedido(self.sobre_suba.minorista, origen='Calle 145, Suba', peso_total=3, volumen=Decimal('0.05'))
+        Pedidos.objects.filter(pk__in=[self.sobre_suba.pk, otro.pk]).update(carga=carga)
+
+        # La moto lleva cada pedido, pero no el viaje: ni lo ve ni lo puede reclamar
+        moto = self.conductor('moto@test.co', 'MOTO')
+        self.assertEqual(self.bolsa(moto), [self.sin_zona])
+        self.assertFalse(reclamar_pedido(Pedidos.objects.get(pk=otro.pk), moto))
+
+        camioneta = self.conductor('camioneta@test.co', 'CAMIONETA')
+        self.assertEqual(self.bolsa(camioneta), [otro, self.sin_zona, self.caja_suba, self.sobre_suba])
+        self.assertTrue(reclamar_pedido(Pedidos.objects.get(pk=otro.pk), camioneta))
+        self.assertEqual(set(carga.pedidos.values_list('estado', 'conductor')),
+                         {('ASIGNADO', camioneta.pk)})
+        self.assertEqual(self.bolsa(camioneta), [self.sin_zona, self.caja_suba])
+        self.assertFalse(reclamar_pedido(Pedidos.objects.get(pk=self.sobre_suba.pk),
+                                         self.conductor('furgon@test.co', 'FURGON')))
+
+    def test_paginas_por_cursor_sobre_varias_cubetas(self):
+        conductor = self.conductor('camion@test.co', 'CAMION_PEQUEÑO')
+        cubetas = cubetas_conductor(conductor)
+        with CaptureQueriesContext(connection) as ctx:
+            pagina = paginar_bolsa(cubetas, RequestFactory().get('/', {'size': 3}))
+        # Una consulta por cubeta (zona cercana o sin zona, clase) y una para cargar la página
+        self.assertEqual(len(ctx.captured_queries), (len(cubetas['zonas']) + 1) * len(cubetas['clases']) + 1)
+        siguiente = paginar_bolsa(cubetas, RequestFactory().get('/' + pagina.next_url))
+        self.assertEqual(list(pagina) + list(siguiente), [self.sin_zona, self.estiba_suba, self.caja_suba, self.sobre_suba])
+        anterior = paginar_bolsa(cubetas, RequestFactory().get('/' + siguiente.prev_url))
+        self.assertEqual(list(anterior), list(pagina))
+
+
+class ConsolidacionCargasTests(TestCase):
+    def caja(self, pk, lado, unidades=1, peso=10.0, alto=None):
+        alto = lado if alto is None else alto
+        return {'id': pk, 'peso': peso, 'volumen': unidades * lado * lado * alto, 'unidades': unidades,
+                'largo': lado, 'ancho': lado, 'alto': alto}
+
+    def test_vehiculo_mas_pequeno_que_respeta_peso_y_medidas(self):
+        viajes, sin_vehiculo = consolidar([self.caja(1, 0.1), self.caja(2, 0.1)])
+        self.assertEqual([(v['tipo_vehiculo'], v['pedidos']) for v in viajes], [('MOTO', [1, 2])])
+        # 2100 kg: la camioneta y el furgón no los cargan
+        viajes, _ = consolidar([self.caja(i, 0.3, peso=700) for i in range(3)])
+        self.assertEqual([v['tipo_vehiculo'] for v in viajes], ['CAMION_PEQUEÑO'])
+        # 2 m³ caben en el volumen de la camioneta, pero dos cubos de 1 m no caben en su piso de 1.8 × 1.5
+        viajes, _ = consolidar([self.caja(1, 1.0), self.caja(2, 1.0)])
+        self.assertEqual([v['tipo_vehiculo'] for v in viajes], ['FURGON'])
+        # Las unidades se apilan hasta el techo: 20 cajas de 0.5 m son 10 columnas de 2 en la camioneta
+        # (no caben en su piso) y 7 columnas de 3 en el furgón
+        viajes, _ = consolidar([self.caja(1, 0.5, unidades=20)])
+        self.assertEqual(viajes[0]['tipo_vehiculo'], 'FURGON')
+        # Más alto que cualquier vehículo
+        viajes, sin_vehiculo = consolidar([self.caja(1, 0.5, alto=2.8), self.caja(2, 0.5, alto=2.6)])
+        self.assertEqual((sin_vehiculo, [v['tipo_vehiculo'] for v in viajes]), ([1], ['CAMION_GRANDE']))
+
+    def test_se_abren_viajes_cuando_no_cabe_todo(self):
+        pedidos = [self.caja(i, 0.5, unidades=10, peso=2000) for i in range(20)]
+        viajes, sin_vehiculo = consolidar(pedidos)
+        self.assertEqual(sin_vehiculo, [])
+        self.assertEqual(sorted(pk for viaje in viajes for pk in viaje['pedidos']), list(range(20)))
+        # 17000 kg por camión grande: 8 pedidos por viaje
+        self.assertEqual([len(v['pedidos']) for v in viajes], [8, 8, 4])
+        self.assertEqual([v['tipo_vehiculo'] for v in viajes], ['CAMION_GRANDE', 'CAMION_GRANDE', 'CAMION_GRANDE'])
+
+    def test_pedidos_sin_unidades(self):
+        # consolidar() no falla con un pedido de 0 unidades aunque abra el viaje
+        viajes, sin_vehiculo = consolidar([self.caja(1, 0.5, unidades=0)])
+        self.assertEqual((sin_vehiculo, [v['pedidos'] for v in viajes]), ([], [[1]]))
+
+        # y proponer_cargas ni siquiera los considera
+        minorista = Usuarios.objects.create_user('min@test.co', 'x', nombre='M', tipo='MINORISTA')
+        manana = date.today() + timedelta(days=1)
+        for unidades in (0, 1, 1):
+            crear_pedido(minorista, origen='Calle 13 # 68-10, Bogotá', fecha_recoleccion=manana, unidades=unidades)
+        self.assertEqual(proponer_cargas(manana)['pedidos'], 2)
+
+    def test_propuestas_por_dia_y_origen_y_aprobacion(self):
+        minorista = Usuarios.objects.create_user('min@test.co', 'x', nombre='M', tipo='MINORISTA')
+        manana = date.today() + timedelta(days=1)
+        mismo_origen = [
+            crear_pedido(minorista, origen='Calle 13 # 68-10, Bogotá', fecha_recoleccion=manana),
+            crear_pedido(minorista, origen='calle 13 # 68-10,  Bogotá', fecha_recoleccion=manana),
+        ]
+        suelto = crear_pedido(minorista, origen='Av. Boyacá # 1-1, Bogotá', fecha_recoleccion=manana)
+        crear_pedido(minorista, origen='Calle 13 # 68-10, Bogotá', fecha_recoleccion=manana, estado='ASIGNADO')
+        crear_pedido(minorista, origen='Calle 13 # 68-10, Bogotá')
+
+        resumen = proponer_cargas(manana)
+        self.assertEqual(resumen, {'cargas': 1, 'pedidos': 2, 'sin_vehiculo': 0, 'viajes_ahorrados': 1})
+        carga = CargaConsolidada.objects.get()
+        self.assertEqual((carga.tipo_vehiculo, carga.estado), ('MOTO', 'PROPUESTA'))
+        self.assertEqual(set(carga.pedidos.all()), set(mismo_origen))
+        suelto.refresh_from_db()
+        self.assertIsNone(suelto.carga)
+
+        # Recalcular reemplaza la propuesta; una aprobada ya no se toca
+        proponer_cargas(manana)
+        carga = CargaConsolidada.objects.get(estado='PROPUESTA')
+        self.assertTrue(aprobar_carga(carga))
+        self.assertFalse(aprobar_carga(carga))
+        self.assertEqual(proponer_cargas(manana)['cargas'], 0)
+        self.assertEqual(carga.pedidos.count(), 2)
+
+        # Si un pedido cambió desde la propuesta no se aprueba; al descartarla sus pedidos vuelven a consolidarse
+        crear_pedido(minorista, origen='Av. Boyacá # 1-1, Bogotá', fecha_recoleccion=manana)
+        proponer_cargas(manana)
+        nueva = CargaConsolidada.objects.get(estado='PROPUESTA')
+        Pedidos.objects.filter(pk=suelto.pk).update(estado='CANCELADO')
+        self.assertFalse(aprobar_carga(nueva))
+        self.assertEqual(CargaConsolidada.objects.get(pk=nueva.pk).estado, 'PROPUESTA')
+        self.assertTrue(descartar_carga(nueva))
+        self.assertFalse(Pedidos.objects.filter(carga=nueva).exists())
+
+    def test_pantalla_del_admin(self):
+        minorista = Usuarios.objects.create_user('min@test.co', 'x', nombre='M', tipo='MINORISTA')
+        admin = Usuarios.objects.create_user('admin@test.co', 'x', nombre='A', tipo='ADMIN')
+        for _ in range(3):
+            crear_pedido(minorista, origen='Calle 13 # 68-10, Bogotá')
+        url = reverse('frontend:cargas_consolidadas')
+
+        self.client.force_login(minorista)
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.client.force_login(admin)
+        self.assertRedirects(self.client.post(url, {'fecha': date.today().isoformat()}),
+                             f"{url}?fecha={date.today().isoformat()}")
+        carga = CargaConsolidada.objects.get()
+        respuesta = self.client.get(url)
+        self.assertContains(respuesta, f"BOCG-{carga.pedidos.first().pk:05d}")
+        self.client.post(reverse('frontend:carga_accion', args=[carga.pk]), {'accion': 'aprobar'})
+        carga.refresh_from_db()
+        self.assertEqual(carga.estado, 'APROBADA')
+        self.assertEqual(self.client.post(reverse('frontend:carga_accion', args=[carga.pk]), {'accion': 'x'}).status_code, 400)
+
+
+
+class _WSGISecuencial(ThreadedWSGIServer):
+    # La base SQLite en memoria de las pruebas es una sola conexión compartida: una petición a la vez
+    def set_app(self, application):
+        turno = threading.Lock()
+
+        def secuencial(environ, start_response):
+            with turno:
+                return application(environ, start_response)
+
+        super().set_app(secuencial)
+
+
+class ServidorSecuencial(LiveServerThread):
+    server_class = _WSGISecuencial
+
+
+@override_settings(SESSION_COOKIE_SECURE=False, CSRF_COOKIE_SECURE=False, SECURE_SSL_REDIRECT=False)
+class PruebaCargaTests(LiveServerTestCase):
+    server_thread_class = ServidorSecuencial
+
+    def test_percentiles_y_comparacion(self):
+        self.assertEqual([percentil(list(range(1, 101)), p) for p in (50, 95, 99)], [50, 95, 99])
+        self.assertIsNone(percentil([], 95))
+        mediciones = Mediciones()
+        for ms in range(1, 11):
+            mediciones.registrar('listar', ms / 1000, ok=ms != 10)
+        fila = mediciones.resumen(duracion=2)['listar']
+        self.assertEqual((fila['peticiones'], fila['errores'], fila['rps'], fila['p50_ms'], fila['p99_ms']),
+                         (10, 1, 5.0, 5.0, 10.0))
+        anterior = {'endpoints': {'listar': dict(fila, p95_ms=5.0)}}
+        self.assertEqual(comparar({'endpoints': {'listar': fila}}, anterior), [('listar', 5.0, 10.0, 100.0, 5.0, 5.0)])
+
+    def test_corrida_corta_contra_el_servidor(self):
+        cuentas = preparar_datos(minoristas=1, conductores=1, admins=1)
+        resultado = ejecutar(self.live_server_url, cuentas, duracion=1.5, pausa=0.05, semilla=7)
+
+        self.assertEqual(resultado['sesiones_fallidas'], [])
+        endpoints = resultado['endpoints']
+        for endpoint in ('crear_pedido', 'listar_pedidos', 'dashboard_conductor', 'pedidos_crud_admin'):
+            self.assertGreater(endpoints[endpoint]['peticiones'], 0, endpoint)
+        self.assertEqual(endpoints['TOTAL']['errores'], 0)
+        self.assertTrue(Pedidos.objects.filter(minorista__email=cuentas['MINORISTA'][0]).exists())
+
+        limpiar_datos()
+        self.assertFalse(Usuarios.objects.filter(email__endswith='@carga.bogocargo.test').exists())
+
+    def test_conductores_virtuales_solo_aceptan_pedidos_de_la_prueba(self):
+        class SesionFalsa:
+            def __init__(self):
+                self.acciones = []
+
+            def pedir(self, endpoint, metodo, ruta, esperado=(200,), datos=None, params=None):
+                if metodo == 'POST':
+                    self.acciones.append(ruta)
+                respuesta = requests.Response()
+                respuesta.status_code = 200 if metodo == 'GET' else 302
+                respuesta._content = b'<li id="pedido-pendiente-7"></li><li id="pedido-pendiente-8"></li>'
+                respuesta.headers['Location'] = ruta.replace('action/', '')
+                return respuesta
+
+        siempre = random.Random(0)
+        siempre.random = lambda: 0.0
+        sesion = SesionFalsa()
+        escenario_conductor(sesion, siempre, creados=set())
+        self.assertEqual(sesion.acciones, [])
+        escenario_conductor(sesion, siempre, creados={'8'})
+        self.assertEqual(sesion.acciones, ['/pedido/8/action/'] * 3)
+
+        # En una corrida real un pedido de un cliente sigue pendiente
+        real = crear_pedido(Usuarios.objects.create_user('cliente@bogocargo.co', 'x', nombre='C', tipo='MINORISTA'))
+        cuentas = preparar_datos(minoristas=1, conductores=2, admins=0)
+        resultado = ejecutar(self.live_server_url, cuentas, duracion=1.5, pausa=0.05, semilla=3)
+        real.refresh_from_db()
+        self.assertEqual((real.estado, real.conductor_id), ('PENDIENTE', None))
+        # ...mientras los creados por la prueba sí se aceptan
+        self.assertIn('manejar_pedido_action (aceptar)', resultado['endpoints'])
+
+    def test_explica_por_que_no_inicia_sesion(self):
+        cuentas = preparar_datos(minoristas=1, conductores=0, admins=0)
+        with override_settings(CSRF_COOKIE_SECURE=True):
+            fallida, = ejecutar(self.live_server_url, cuentas, duracion=0)['sesiones_fallidas']
+        self.assertIn('csrftoken', fallida['motivo'])
+
+        # SecurityMiddleware lee SECURE_SSL_REDIRECT al arrancar: la redirección se simula
+        redireccion = requests.Response()
+        redireccion.status_code = 301
+        redireccion.headers['Location'] = 'https://testserver/mi-cuenta/'
+        self.assertIn('https', Sesion(self.live_server_url, Mediciones())._motivo_sin_sesion(redireccion, 'csrftoken'))
+
+
+@override_settings(INSTRUMENTACION_MUESTREO=1.0, INSTRUMENTACION_UMBRAL_MS=60000, INSTRUMENTACION_UMBRAL_CONSULTAS=1000)
+class InstrumentacionPeticionesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        agregados_peticiones.limpiar_local()
+        self.minorista = Usuarios.objects.create_user('min@test.co', 'x', nombre='M', tipo='MINORISTA')
+        self.client.force_login(self.minorista)
+
+    def test_mide_tiempo_y_sql_por_vista(self):
+        for _ in range(2):
+            self.client.get(reverse('frontend:dashboard_minorista'))
+        fila = next(f for f in agregados_peticiones.resumen(5) if f['vista'] == 'GET frontend:dashboard_minorista')
+        self.assertEqual(fila['peticiones'], 2)
+        self.assertGreater(fila['consultas_promedio'], 0)
+        self.assertGreater(fila['p95_ms'], 0)
+        self.assertEqual(fila['sobre_umbral'], 0)
+        self.assertTrue(fila['sentencias_lentas'][0]['sql'].upper().startswith('SELECT'))
+
+    def test_muestreo(self):
+        url = reverse('frontend:dashboard_minorista')
+        # Sin muestreo no se mide nada
+        with override_settings(INSTRUMENTACION_MUESTREO=0):
+            self.client.get(url)
+        self.assertEqual(agregados_peticiones.resumen(5), [])
+
+        # Con muestreo parcial se mide la petición solo si el sorteo cae bajo la tasa
+        with override_settings(INSTRUMENTACION_MUESTREO=0.5), \
+                mock.patch('BACKEND.instrumentacion.random.random', side_effect=[0.7, 0.2, 0.9]):
+            for _ in range(3):
+                self.client.get(url)
+        self.assertEqual([(f['vista'], f['peticiones']) for f in agregados_peticiones.resumen(5)],
+                         [('GET frontend:dashboard_minorista', 1)])
+
+    def test_registra_en_el_log_las_peticiones_sobre_el_umbral(self):
+        with self.assertNoLogs('BACKEND.instrumentacion', 'WARNING'):
+            self.client.get(reverse('frontend:listar_pedidos'))
+        with override_settings(INSTRUMENTACION_UMBRAL_CONSULTAS=1), \
+                self.assertLogs('BACKEND.instrumentacion', 'WARNING') as logs:
+            self.client.get(reverse('frontend:listar_pedidos'))
+        self.assertIn('GET frontend:listar_pedidos', logs.output[0])
+        self.assertIn('consultas SQL', logs.output[0])
+        fila = next(f for f in agregados_peticiones.resumen(5) if f['vista'] == 'GET frontend:listar_pedidos')
+        self.assertEqual((fila['peticiones'], fila['sobre_umbral']), (2, 1))
+
+    def test_suma_los_minutos_publicados_por_otros_procesos(self):
+        class Medicion:
+            consultas, sql, lentas = 3, 0.002, [(0.001, 'SELECT 1')]
+
+        ahora = 1_800_000_000
+        otro_worker = AgregadosPeticiones()
+        otro_worker.registrar('GET x', 0.040, Medicion, False, ahora=ahora - 120)
+        otro_worker.registrar('GET x', 0.900, Medicion, True, ahora=ahora - 60)  # Cierra y publica el minuto anterior
+        agregados_peticiones.registrar('GET x', 0.010, Medicion, False, ahora=ahora)
+
+        fila = agregados_peticiones.resumen(5, ahora=ahora)[0]
+        # Del otro worker solo se ve el minuto que ya publicó
+        self.assertEqual((fila['peticiones'], fila['consultas_max'], fila['p50_ms'], fila['max_ms']), (2, 3, 10, 40.0))
+        self.assertEqual(agregados_peticiones.resumen(1, ahora=ahora)[0]['peticiones'], 1)
+
+    def test_endpoint_solo_para_admin(self):
+        url = reverse('backend:instrumentacion')
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        admin = Usuarios.objects.create_user('admin@test.co', 'x', nombre='A', tipo='ADMIN')
+        self.client.force_login(admin)
+        self.assertEqual(self.client.get(url, {'minutos': 0}).status_code, 400)
+        datos = self.client.get(url, {'minutos': 5}).json()
+        self.assertEqual((datos['minutos'], datos['muestreo']), (5, 1.0))
+        # Las peticiones anteriores al endpoint también se midieron
+        self.assertIn('GET backend:instrumentacion', [fila['vista'] for fila in datos['vistas']])
@@ -1,5 +1,19 @@
 from django.urls import path
 from . import views
 
+app_name = 'backend'
+
 urlpatterns = [
-]
\ No newline at end of file
+    # Tablero en vivo de la bolsa de pedidos (SSE, servido por ASGI)
+    path('conductor/bolsa/eventos/', views.bolsa_eventos_stream, name='bolsa_eventos'),
+    # Cotización vectorizada de muchos envíos
+    path('cotizaciones/', views.cotizar_envios, name='cotizar_envios'),
+    # Importación masiva de pedidos del minorista (CSV / XLSX)
+    path('pedidos/importar/', views.importar_pedidos_archivo, name='importar_pedidos'),
+    # Ingesta por lotes de la ubicación GPS de los conductores
+    path('rastreo/puntos/', views.recibir_puntos_rastreo, name='rastreo_puntos'),
+    # Posición actual de varios envíos (mapas del minorista y del admin)
+    path('rastreo/posiciones/', views.posiciones_envios, name='rastreo_posiciones'),
+    # Tiempos y consultas SQL por vista medidos por el middleware de instrumentación (solo admin)
+    path('instrumentacion/', views.instrumentacion_resumen, name='instrumentacion'),
+]
@@ -1,3 +1,200 @@
-from django.shortcuts import render
+import json
 
-# Create your views here.
+from django.contrib.auth.decorators import login_required
+from django.http import HttpResponseForbidden, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET, require_POST
+
+from BACKEND.cotizacion import EnvioInvalido, cotizar_lote
+from BACKEND.eventos import stream_bolsa
+from BACKEND.importacion import ArchivoInvalido, importar_pedidos
+from BACKEND.instrumentacion import VENTANA_MAX_MINUTOS, agregados_peticiones, tasa_muestreo, umbrales
+from FRONTEND.models import Envios
+from BACKEND.rastreo import MAX_ENVIOS_POR_CONSULTA, MAX_PUNTOS_POR_PETICION, posiciones_actuales, registrar_puntos
+
+# Tope de envíos por petición de cotización
+MAX_ENVIOS_POR_COTIZACION = 5000
+# Tope de errores detallados en la respuesta de una importación
+MAX_ERRORES_IMPORTACION = 1000
+
+
+# ============================================================
+# 1. TABLERO EN VIVO DEL CONDUCTOR (Server-Sent Events)
+# ============================================================
+
+async def bolsa_eventos_stream(request):
+    """
+    Stream SSE con los cambios de la bolsa global de pedidos PENDIENTES (creado, tomado, cancelado).
+    Vista asíncrona: debe servirse con el servidor ASGI (config/asgi.py) para no ocupar un worker por conexión.
+    """
+    user = await request.auser()
+    if not user.is_authenticated or getattr(user, 'tipo', None) != 'CONDUCTOR':
+        return HttpResponseForbidden("Solo los conductores pueden suscribirse a la bolsa de pedidos.")
+
+    # El navegador envía Last-Event-ID al reconectarse; en la primera conexión el dashboard pasa ?desde=
+    ultimo_id = request.headers.get('Last-Event-ID') or request.GET.get('desde')
+    try:
+        ultimo_id = int(ultimo_id) if ultimo_id else None
+    except ValueError:
+        ultimo_id = None
+
+    response = StreamingHttpResponse(stream_bolsa(ultimo_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Evita que nginx acumule el stream
+    return response
+
+
+# ============================================================
+# 2. COTIZACIÓN POR LOTES (JSON)
+# ============================================================
+
+@login_required
+@require_POST
+def cotizar_envios(request):
+    """
+    Cotiza varios envíos en una sola pasada vectorizada.
+    Cuerpo: {"envios": [{"peso_total", "unidades", "largo", "alto", "ancho", "tipo_mercancia", "origen", "destino"}, ...]}
+    Respuesta: {"cotizaciones": [{"precio": COP, "volumen": m³}, ...]} en el mismo orden.
+    """
+    try:
+        envios = json.loads(request.body).get('envios')
+    except (ValueError, AttributeError):
+        return JsonResponse({'error': "El cuerpo debe ser un objeto JSON con la lista 'envios'."}, status=400)
+
+    if not isinstance(envios, list) or not envios:
+        return JsonResponse({'error': "'envios' debe ser una lista no vacía."}, status=400)
+    if len(envios) > MAX_ENVIOS_POR_COTIZACION:
+        return JsonResponse({'error': f"Máximo {MAX_ENVIOS_POR_COTIZACION} envíos por cotización."}, status=400)
+    if not all(isinstance(e, dict) and isinstance(e.get('tipo_mercancia', 'SECAS'), str) for e in envios):
+        return JsonResponse({'error': "Cada envío debe ser un objeto con 'tipo_mercancia' de texto."}, status=400)
+
+    try:
+        precios, volumenes = cotizar_lote(envios)
+    except EnvioInvalido as e:
+        return JsonResponse({'error': f"Envío {e.indice}: {e}", 'indice': e.indice}, status=400)
+    return JsonResponse({
+        'cotizaciones': [{'precio': p, 'volumen': v / 100} for p, v in zip(precios, volumenes)],
+    })
+
+
+# ============================================================
+# 3. IMPORTACIÓN MASIVA DE PEDIDOS (CSV / XLSX)
+# ============================================================
+
+@login_required
+@require_POST
+def importar_pedidos_archivo(request):
+    """
+    Crea los pedidos de una hoja de cálculo subida en el campo 'archivo' (multipart).
+    Respuesta: {"creados": n, "errores": [{"fila": n, "errores": {campo: [mensajes]}}, ...], "total_errores": n}.
+    """
+    if getattr(request.user, 'tipo', None) != 'MINORISTA':
+        return HttpResponseForbidden("Solo los minoristas pueden importar pedidos.")
+    archivo = request.FILES.get('archivo')
+    if archivo is None:
+        return JsonResponse({'error': "Adjunte el archivo en el campo 'archivo'."}, status=400)
+
+    try:
+        resultado = importar_pedidos(archivo, archivo.name, request.user)
+    except ArchivoInvalido as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    errores = resultado['errores']
+    return JsonResponse({
+        'creados': resultado['creados'],
+        'errores': errores[:MAX_ERRORES_IMPORTACION],
+        'total_errores': len(errores),
+    })
+
+
+# ============================================================
+# 4. RASTREO: INGESTA DE PUNTOS GPS Y POSICIÓN ACTUAL DE LOS ENVÍOS
+# ============================================================
+
+@login_required
+@require_POST
+def recibir_puntos_rastreo(request):
+    """
+    Recibe un lote de ubicaciones del celular del conductor y las encola para escribirlas por lotes.
+    Cuerpo: {"puntos": [{"envio": id, "lat", "lon", "fecha_hora"?, "estado"?, "observaciones"?}, ...]}
+    Respuesta 202: {"aceptados": n, "errores": [{"indice": i, "error": mensaje}, ...]}.
+    """
+    if getattr(request.user, 'tipo', None) != 'CONDUCTOR':
+        return HttpResponseForbidden("Solo los conductores reportan ubicaciones.")
+    try:
+        puntos = json.loads(request.body).get('puntos')
+    except (ValueError, AttributeError):
+        return JsonResponse({'error': "El cuerpo debe ser un objeto JSON con la lista 'puntos'."}, status=400)
+
+    if not isinstance(puntos, list) or not puntos:
+        return JsonResponse({'error': "'puntos' debe ser una lista no vacía."}, status=400)
+    if len(puntos) > MAX_PUNTOS_POR_PETICION:
+        return JsonResponse({'error': f"Máximo {MAX_PUNTOS_POR_PETICION} puntos por petición."}, status=400)
+
+    aceptados, errores = registrar_puntos(request.user, puntos)
+    return JsonResponse({'aceptados': aceptados, 'errores': errores}, status=202)
+
+
+@login_required
+@require_GET
+def posiciones_envios(request):
+    """
+    Posición actual de varios envíos para los mapas: ?envios=1,2,3 (máximo MAX_ENVIOS_POR_CONSULTA).
+    Sin 'envios', los envíos aún en curso (ASIGNADO, EN_RUTA) visibles para el usuario.
+    Lee la copia de la última posición en Envios: no recorre RastreoEnvio.
+    """
+    user = request.user
+    tipo = 'ADMIN' if user.is_superuser else getattr(user, 'tipo', None)
+    if tipo == 'ADMIN':
+        envios = Envios.objects.all()
+    elif tipo == 'MINORISTA':
+        envios = Envios.objects.filter(pedido__minorista=user)
+    elif tipo == 'CONDUCTOR':
+        envios = Envios.objects.filter(conductor=user)
+    else:
+        return HttpResponseForbidden("No autorizado.")
+
+    ids = request.GET.get('envios')
+    if ids:
+        try:
+            ids = {int(i) for i in ids.split(',') if i.strip()}
+        except ValueError:
+            return JsonResponse({'error': "'envios' debe ser una lista de ids separados por coma."}, status=400)
+        if len(ids) > MAX_ENVIOS_POR_CONSULTA:
+            return JsonResponse({'error': f"Máximo {MAX_ENVIOS_POR_CONSULTA} envíos por consulta."}, status=400)
+        envios = envios.filter(pk__in=ids)
+    else:
+        envios = envios.filter(estado__in=('ASIGNADO', 'EN_RUTA'))
+
+    return JsonResponse({'posiciones': posiciones_actuales(envios)})
+
+
+# ============================================================
+# 5. INSTRUMENTACIÓN: TIEMPOS Y SQL POR VISTA (ADMIN)
+# ============================================================
+
+@login_required
+@require_GET
+def instrumentacion_resumen(request):
+    """
+    Agregados de las peticiones medidas por el middleware de instrumentación en los últimos
+    ?minutos= (15 por defecto, máximo VENTANA_MAX_MINUTOS), de la vista más costosa a la menos.
+    Los conteos son de la muestra: con muestreo 0.1, cada petición medida representa unas 10.
+    """
+    user = request.user
+    if not (user.is_superuser or getattr(user, 'tipo', None) == 'ADMIN'):
+        return HttpResponseForbidden("Solo los administradores pueden ver la instrumentación.")
+    try:
+        minutos = int(request.GET.get('minutos', 15))
+    except ValueError:
+        return JsonResponse({'error': "'minutos' debe ser un número entero."}, status=400)
+    if not 1 <= minutos <= VENTANA_MAX_MINUTOS:
+        return JsonResponse({'error': f"'minutos' debe estar entre 1 y {VENTANA_MAX_MINUTOS}."}, status=400)
+
+    umbral_ms, umbral_consultas = umbrales()
+    return JsonResponse({
+        'minutos': minutos,
+        'muestreo': tasa_muestreo(),
+        'umbral_ms': umbral_ms,
+        'umbral_consultas': umbral_consultas,
+        'vistas': agregados_peticiones.resumen(minutos),
+    })
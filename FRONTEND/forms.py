@@ -1,7 +1,7 @@
 from django import forms
 from django.core.exceptions import ValidationError
 from django_recaptcha.fields import ReCaptchaField
-from FRONTEND.models import Pedidos, TIPO_MERCANCIA_CHOICES, Usuarios, Empresas, TIPOS_USUARIO 
+from FRONTEND.models import Pedidos, TIPO_MERCANCIA_CHOICES, Usuarios, Empresas, TIPOS_USUARIO, normalizar_email
 from decimal import Decimal
 from datetime import datetime, time, timedelta 
 
@@ -36,6 +36,18 @@ class MayoristaForm(forms.ModelForm):
         }
 
 
+def _validar_email_disponible(form):
+    """
+    clean_email de los formularios de usuario. La unicidad sin distinguir mayúsculas vive en
+    'email_normalizado', que no es editable: validate_unique del ModelForm no la revisa y el
+    duplicado llegaría a la base como IntegrityError.
+    """
+    email = form.cleaned_data.get("email")
+    if email and Usuarios.objects.filter(email_normalizado=normalizar_email(email)).exclude(pk=form.instance.pk).exists():
+        raise ValidationError("Ya existe un usuario con este email.")
+    return email
+
+
 # =======================================================
 # 1. FORMULARIO DE USUARIO (ADMIN)
 # =======================================================
@@ -68,6 +80,9 @@ class UsuarioForm(forms.ModelForm):
             "tipo_vehiculo": forms.Select(attrs={"class": "form-select"}),
         }
 
+    def clean_email(self):
+        return _validar_email_disponible(self)
+
     def clean_password(self):
         password = self.cleaned_data.get("password")
         if not self.instance.pk and not password:
@@ -227,6 +242,9 @@ class RegistroForm(forms.ModelForm):
             "email": forms.EmailInput(attrs={"class": "form-control"}),
         }
 
+    def clean_email(self):
+        return _validar_email_disponible(self)
+
     def clean(self):
         cleaned_data = super().clean()
         p1 = cleaned_data.get("password")
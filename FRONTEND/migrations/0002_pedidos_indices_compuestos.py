@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('FRONTEND', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pedidos',
+            index=models.Index(fields=['minorista', 'fecha_creacion', 'id'], name='pedido_minorista_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pedidos',
+            index=models.Index(fields=['conductor', 'estado', 'fecha_creacion'], name='pedido_conductor_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pedidos',
+            index=models.Index(fields=['estado', 'fecha_creacion', 'id'], name='pedido_estado_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pedidos',
+            index=models.Index(fields=['fecha_creacion', 'id'], name='pedido_fecha_id_idx'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:35
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def poblar_contadores(apps, schema_editor):
+    # Carga inicial de los contadores con los datos existentes
+    ContadorEstadistica = apps.get_model('FRONTEND', 'ContadorEstadistica')
+    entidades = {
+        'PEDIDOS': (apps.get_model('FRONTEND', 'Pedidos'), 'estado'),
+        'USUARIOS': (apps.get_model('FRONTEND', 'Usuarios'), 'tipo'),
+        'EMPRESAS': (apps.get_model('FRONTEND', 'Empresas'), 'tipo'),
+    }
+    filas = []
+    for entidad, (modelo, campo) in entidades.items():
+        total = 0
+        for fila in modelo.objects.order_by().values(campo).annotate(n=Count('id')):
+            if fila[campo]:
+                filas.append(ContadorEstadistica(entidad=entidad, clave=fila[campo], total=fila['n']))
+            total += fila['n']
+        filas.append(ContadorEstadistica(entidad=entidad, clave='', total=total))
+    ContadorEstadistica.objects.bulk_create(filas)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('FRONTEND', '0002_pedidos_indices_compuestos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContadorEstadistica',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entidad', models.CharField(choices=[('PEDIDOS', 'Pedidos'), ('USUARIOS', 'Usuarios'), ('EMPRESAS', 'Empresas')], max_length=20)),
+                ('clave', models.CharField(blank=True, default='', help_text="Estado o tipo ('' = total)", max_length=50)),
+                ('total', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'Contadores de Estadísticas',
+                'unique_together': {('entidad', 'clave')},
+            },
+        ),
+        migrations.RunPython(poblar_contadores, migrations.RunPython.noop),
+    ]
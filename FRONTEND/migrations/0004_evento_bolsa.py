@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('FRONTEND', '0003_contador_estadistica'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventoBolsa',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('CREADO', 'Pedido disponible'), ('TOMADO', 'Pedido tomado'), ('CANCELADO', 'Pedido cancelado')], max_length=10)),
+                ('pedido_id', models.BigIntegerField()),
+                ('datos', models.JSONField(blank=True, default=dict)),
+                ('fecha', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Eventos de la Bolsa',
+                'ordering': ['id'],
+            },
+        ),
+    ]
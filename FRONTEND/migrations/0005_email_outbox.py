@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:41
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('FRONTEND', '0004_evento_bolsa'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmailOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('destinatario', models.EmailField(max_length=254)),
+                ('asunto', models.CharField(max_length=255)),
+                ('cuerpo', models.TextField()),
+                ('estado', models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('ENVIADO', 'Enviado'), ('FALLIDO', 'Fallido')], default='PENDIENTE', max_length=10)),
+                ('intentos', models.PositiveIntegerField(default=0)),
+                ('proximo_intento', models.DateTimeField(default=django.utils.timezone.now)),
+                ('ultimo_error', models.TextField(blank=True)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('fecha_envio', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Correo en Cola',
+                'verbose_name_plural': 'Correos en Cola',
+                'indexes': [models.Index(fields=['estado', 'proximo_intento'], name='outbox_estado_proximo_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:50
+
+from django.db import migrations, models
+
+
+def poblar_email_normalizado(apps, schema_editor):
+    # Si dos cuentas solo difieren en mayúsculas, la más antigua conserva el email normalizado
+    # y las demás quedan en NULL (ya hoy su login fallaba por MultipleObjectsReturned).
+    Usuarios = apps.get_model('FRONTEND', 'Usuarios')
+    vistos = set()
+    pendientes = []
+    for usuario in Usuarios.objects.order_by('id').only('id', 'email').iterator():
+        normalizado = usuario.email.strip().lower() if usuario.email else None
+        if normalizado and normalizado not in vistos:
+            vistos.add(normalizado)
+            usuario.email_normalizado = normalizado
+            pendientes.append(usuario)
+    Usuarios.objects.bulk_update(pendientes, ['email_normalizado'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('FRONTEND', '0005_email_outbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usuarios',
+            name='email_normalizado',
+            field=models.CharField(editable=False, max_length=254, null=True),
+        ),
+        migrations.RunPython(poblar_email_normalizado, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='usuarios',
+            name='email_normalizado',
+            field=models.CharField(editable=False, max_length=254, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('FRONTEND', '0006_usuarios_email_normalizado'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pedidos',
+            name='referencia_importacion',
+            field=models.CharField(blank=True, editable=False, max_length=120, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('FRONTEND', '0007_pedidos_referencia_importacion'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='factura',
+            index=models.Index(fields=['estado', 'fecha_vencimiento'], name='factura_estado_venc_idx'),
+        ),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:12
+
+import re
+import unicodedata
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Copia congelada de la tokenización de BACKEND.busqueda al crear el índice: la migración
+# debe dar el mismo resultado aunque el código en vivo cambie después.
+PESOS_CAMPOS = (('origen', 2), ('destino', 2), ('observaciones', 1))
+LONGITUD_MAXIMA_TERMINO = 40
+PALABRAS_VACIAS = frozenset(
+    'a al con de del el en la las lo los para por que se su un una y o'.split()
+)
+_PALABRA = re.compile(r'[a-z0-9]+')
+
+
+def _tokenizar(texto):
+    texto = unicodedata.normalize('NFKD', texto or '')
+    palabras = _PALABRA.findall(''.join(c for c in texto if not unicodedata.combining(c)).lower())
+    return [
+        p[:LONGITUD_MAXIMA_TERMINO] for p in palabras
+        if p not in PALABRAS_VACIAS and (len(p) > 1 or p.isdigit())
+    ]
+
+
+def _terminos_pedido(origen, destino, observaciones):
+    valores = {'origen': origen, 'destino': destino, 'observaciones': observaciones}
+    terminos = {}
+    for campo, peso in PESOS_CAMPOS:
+        for termino in set(_tokenizar(valores[campo])):
+            terminos[termino] = terminos.get(termino, 0) + peso
+    return terminos
+
+
+def indexar_pedidos_existentes(apps, schema_editor):
+    Pedidos = apps.get_model('FRONTEND', 'Pedidos')
+    TerminoPedido = apps.get_model('FRONTEND', 'TerminoPedido')
+    ultimo_id = 0
+    while True:
+        lote = list(
+            Pedidos.objects.filter(id__gt=ultimo_id).order_by('id')
+            .values_list('id', 'origen', 'destino', 'observaciones')[:1000]
+        )
+        if not lote:
+            break
+        TerminoPedido.objects.bulk_create([
+            TerminoPedido(termino=termino, pedido_id=pk, peso=peso)
+            for pk, origen, destino, observaciones in lote
+            for termino, peso in _terminos_pedido(origen, destino, observaciones).items()
+        ], batch_size=1000)
+        ultimo_id = lote[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('FRONTEND', '0008_factura_estado_vencimiento_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TerminoPedido',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('termino', models.CharField(max_length=40)),
+                ('peso', models.PositiveSmallIntegerField(default=1)),
+                ('pedido', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='terminos_busqueda', to='FRONTEND.pedidos')),
+            ],
+            options={
+                'verbose_name': 'Término de Búsqueda',
+                'verbose_name_plural': 'Términos de Búsqueda',
+                'constraints': [models.UniqueConstraint(fields=('termino', 'pedido'), name='termino_pedido_unico')],
+            },
+        ),
+        migrations.RunPython(indexar_pedidos_existentes, migrations.RunPython.noop),
+    ]
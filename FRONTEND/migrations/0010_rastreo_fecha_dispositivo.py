@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:15
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('FRONTEND', '0009_termino_pedido'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='rastreoenvio',
+            name='fecha_hora',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddIndex(
+            model_name='rastreoenvio',
+            index=models.Index(fields=['envio', 'fecha_hora'], name='rastreo_envio_fecha_idx'),
+        ),
+    ]
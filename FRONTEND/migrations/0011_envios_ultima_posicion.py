@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:18
+
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef, Subquery
+
+
+def copiar_ultima_posicion(apps, schema_editor):
+    Envios = apps.get_model('FRONTEND', 'Envios')
+    RastreoEnvio = apps.get_model('FRONTEND', 'RastreoEnvio')
+    ultimo = RastreoEnvio.objects.filter(envio=OuterRef('pk')).order_by('-fecha_hora', '-id')
+    Envios.objects.filter(Exists(RastreoEnvio.objects.filter(envio=OuterRef('pk')))).update(
+        ultima_ubicacion=Subquery(ultimo.values('ubicacion')[:1]),
+        ultimo_estado_rastreo=Subquery(ultimo.values('estado')[:1]),
+        ultima_fecha_rastreo=Subquery(ultimo.values('fecha_hora')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('FRONTEND', '0010_rastreo_fecha_dispositivo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='envios',
+            name='ultima_fecha_rastreo',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='envios',
+            name='ultima_ubicacion',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='envios',
+            name='ultimo_estado_rastreo',
+            field=models.CharField(blank=True, max_length=30),
+        ),
+        migrations.RunPython(copiar_ultima_posicion, migrations.RunPython.noop),
+    ]
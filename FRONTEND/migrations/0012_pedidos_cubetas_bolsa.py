@@ -0,0 +1,82 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:26
+
+import re
+import unicodedata
+from decimal import Decimal
+from django.db import migrations, models
+
+# Copia congelada de la detección de localidad de BACKEND.distancias con la red vial de esta
+# migración: el índice de cada localidad es su posición. Editar la red después no la cambia.
+ALIAS_LOCALIDADES = (
+    ('USAQUEN',), ('CHAPINERO',), ('SANTA FE', 'SANTAFE'), ('SAN CRISTOBAL',), ('USME',),
+    ('TUNJUELITO',), ('BOSA',), ('KENNEDY',), ('FONTIBON',), ('ENGATIVA',), ('SUBA',),
+    ('BARRIOS UNIDOS',), ('TEUSAQUILLO',), ('LOS MARTIRES', 'MARTIRES'), ('ANTONIO NARINO',),
+    ('PUENTE ARANDA',), ('LA CANDELARIA', 'CANDELARIA'), ('RAFAEL URIBE URIBE', 'RAFAEL URIBE'),
+    ('CIUDAD BOLIVAR',), ('SUMAPAZ',),
+)
+
+
+def _normalizar_texto(texto):
+    texto = unicodedata.normalize('NFKD', texto)
+    return ''.join(c for c in texto if not unicodedata.combining(c)).upper()
+
+
+def _detector_zona():
+    # Alias más largos primero; se toma la última localidad mencionada en la dirección
+    alias = sorted(((a, i) for i, nombres in enumerate(ALIAS_LOCALIDADES) for a in nombres), key=lambda par: -len(par[0]))
+    zona_por_alias = dict(alias)
+    patron = re.compile(r'\b(' + '|'.join(re.escape(a) for a, _ in alias) + r')\b')
+
+    def zona(direccion):
+        if not isinstance(direccion, str):
+            return None
+        coincidencias = patron.findall(_normalizar_texto(direccion))
+        return zona_por_alias[coincidencias[-1]] if coincidencias else None
+    return zona
+
+
+def asignar_zona_origen(apps, schema_editor):
+    zona_de = _detector_zona()
+    Pedidos = apps.get_model('FRONTEND', 'Pedidos')
+    ultimo_id = 0
+    while True:
+        lote = list(Pedidos.objects.filter(id__gt=ultimo_id).order_by('id').values_list('id', 'origen')[:2000])
+        if not lote:
+            break
+        por_zona = {}
+        for pk, origen in lote:
+            por_zona.setdefault(zona_de(origen), []).append(pk)
+        # Una UPDATE por localidad presente en el lote
+        for zona, ids in por_zona.items():
+            if zona is not None:
+                Pedidos.objects.filter(pk__in=ids).update(zona_origen=zona)
+        ultimo_id = lote[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('FRONTEND', '0011_envios_ultima_posicion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pedidos',
+            name='clase_carga',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(peso_total__lte=Decimal('20'), then=models.Value(0), volumen__lte=Decimal('0.15')), models.When(peso_total__lte=Decimal('800'), then=models.Value(1), volumen__lte=Decimal('3')), models.When(peso_total__lte=Decimal('1500'), then=models.Value(2), volumen__lte=Decimal('9')), models.When(peso_total__lte=Decimal('4500'), then=models.Value(3), volumen__lte=Decimal('22')), models.When(peso_total__lte=Decimal('17000'), then=models.Value(4), volumen__lte=Decimal('60')), default=models.Value(5)), output_field=models.PositiveSmallIntegerField()),
+        ),
+        migrations.AddField(
+            model_name='pedidos',
+            name='zona_origen',
+            field=models.PositiveSmallIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(asignar_zona_origen, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='pedidos',
+            index=models.Index(fields=['estado', 'zona_origen', 'clase_carga', 'fecha_creacion', 'id'], name='pedido_bolsa_zona_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pedidos',
+            index=models.Index(fields=['estado', 'clase_carga', 'fecha_creacion', 'id'], name='pedido_bolsa_clase_idx'),
+        ),
+    ]
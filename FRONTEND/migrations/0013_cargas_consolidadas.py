@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('FRONTEND', '0012_pedidos_cubetas_bolsa'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CargaConsolidada',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha_recoleccion', models.DateField()),
+                ('origen', models.CharField(max_length=255)),
+                ('tipo_vehiculo', models.CharField(choices=[('CAMIONETA', 'Camioneta'), ('FURGON', 'Furgón'), ('CAMION_PEQUEÑO', 'Camión Pequeño'), ('CAMION_GRANDE', 'Camión Grande'), ('MOTO', 'Motocicleta')], max_length=20)),
+                ('peso_total', models.DecimalField(decimal_places=2, help_text='Peso en Kg', max_digits=10)),
+                ('volumen', models.DecimalField(decimal_places=2, help_text='Volumen en m³', max_digits=10)),
+                ('ocupacion', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('estado', models.CharField(choices=[('PROPUESTA', 'Propuesta'), ('APROBADA', 'Aprobada'), ('DESCARTADA', 'Descartada')], default='PROPUESTA', max_length=12)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Carga Consolidada',
+                'verbose_name_plural': 'Cargas Consolidadas',
+                'ordering': ['fecha_recoleccion', 'origen', 'id'],
+                'indexes': [models.Index(fields=['fecha_recoleccion', 'estado'], name='carga_fecha_estado_idx')],
+            },
+        ),
+        migrations.AddField(
+            model_name='pedidos',
+            name='carga',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='pedidos', to='FRONTEND.cargaconsolidada'),
+        ),
+    ]
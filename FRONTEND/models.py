@@ -71,6 +71,32 @@ TIPO_VEHICULO_CHOICES = (
     ('MOTO', 'Motocicleta'),
 )
 
+# Carga máxima por tipo de vehículo (kg, m³), de la clase más pequeña a la más grande.
+# Un vehículo lleva todo lo que cabe en su clase o en las anteriores.
+CAPACIDAD_VEHICULO = (
+    ('MOTO', Decimal('20'), Decimal('0.15')),
+    ('CAMIONETA', Decimal('800'), Decimal('3')),
+    ('FURGON', Decimal('1500'), Decimal('9')),
+    ('CAMION_PEQUEÑO', Decimal('4500'), Decimal('22')),
+    ('CAMION_GRANDE', Decimal('17000'), Decimal('60')),
+)
+# clase_carga de un pedido que no cabe en ningún vehículo
+CLASE_SIN_VEHICULO = len(CAPACIDAD_VEHICULO)
+# Espacio de carga de cada vehículo (largo, ancho, alto en m); su volumen no pasa de CAPACIDAD_VEHICULO
+DIMENSIONES_VEHICULO = {
+    'MOTO': (Decimal('0.6'), Decimal('0.5'), Decimal('0.5')),
+    'CAMIONETA': (Decimal('1.8'), Decimal('1.5'), Decimal('1.1')),
+    'FURGON': (Decimal('3.0'), Decimal('1.7'), Decimal('1.75')),
+    'CAMION_PEQUEÑO': (Decimal('4.2'), Decimal('2.1'), Decimal('2.5')),
+    'CAMION_GRANDE': (Decimal('9.0'), Decimal('2.45'), Decimal('2.7')),
+}
+
+ESTADOS_CARGA = (
+    ('PROPUESTA', 'Propuesta'),
+    ('APROBADA', 'Aprobada'),
+    ('DESCARTADA', 'Descartada'),
+)
+
 ESTADOS_ASIGNACION = (
     ('PENDIENTE', 'Pendiente'),
     ('ACEPTADA', 'Aceptada'),
@@ -89,6 +115,11 @@ ESTADOS_ENVIO = (
 # CUSTOM USER MANAGER
 # ============================================================
 
+def normalizar_email(email):
+    """Forma canónica del email para el login (sin espacios y en minúsculas)."""
+    return email.strip().lower() if email else email
+
+
 class CustomUserManager(BaseUserManager):
     def create_user(self, email, password=None, **extra_fields):
         if not email:
@@ -118,6 +149,9 @@ class CustomUserManager(BaseUserManager):
 
 class Usuarios(AbstractBaseUser, PermissionsMixin):
     email = models.EmailField(unique=True)
+    # Copia normalizada del email: el login la busca por igualdad exacta sobre su índice único
+    # (email__iexact no puede usar el índice de 'email' en MySQL). Se mantiene en save().
+    email_normalizado = models.CharField(max_length=254, unique=True, null=True, editable=False)
     nombre = models.CharField(max_length=100)
     apellido = models.CharField(max_length=100, blank=True)
     tipo = models.CharField(max_length=10, choices=TIPOS_USUARIO, default='MINORISTA')
@@ -144,6 +178,13 @@ class Usuarios(AbstractBaseUser, PermissionsMixin):
     def __str__(self):
         return f"{self.email} ({self.get_tipo_display()})"
 
+    def save(self, *args, **kwargs):
+        self.email_normalizado = normalizar_email(self.email)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'email' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'email_normalizado'}
+        super().save(*args, **kwargs)
+
 
 # ============================================================
 # MODELOS DE SOPORTE (Empresas, Productos)
@@ -228,14 +269,63 @@ class Pedidos(models.Model):
     # Campo crucial añadido para la lógica de facturación
     precio_estimado = models.DecimalField(max_digits=10, decimal_places=0, default=Decimal('0'))
 
+    # Referencia de la importación masiva (minorista:referencia): evita duplicados al reimportar
+    referencia_importacion = models.CharField(max_length=120, unique=True, null=True, blank=True, editable=False)
+
+    # Cubetas de la bolsa de pendientes (BACKEND/bolsa.py):
+    # - clase_carga: la clase de vehículo más pequeña que lo lleva (índice en CAPACIDAD_VEHICULO).
+    #   La calcula la base de datos, así sigue al peso aunque se actualice con F() o bulk_create.
+    # - zona_origen: localidad de recogida (MotorDistancias.zona), None si no se reconoce.
+    clase_carga = models.GeneratedField(
+        expression=models.Case(
+            *(models.When(peso_total__lte=peso, volumen__lte=volumen, then=models.Value(clase))
+              for clase, (_, peso, volumen) in enumerate(CAPACIDAD_VEHICULO)),
+            default=models.Value(CLASE_SIN_VEHICULO),
+        ),
+        output_field=models.PositiveSmallIntegerField(),
+        db_persist=True,
+    )
+    zona_origen = models.PositiveSmallIntegerField(null=True, blank=True, editable=False)
+
+    # Viaje consolidado en el que va el pedido (propuesto por BACKEND.consolidacion)
+    carga = models.ForeignKey('CargaConsolidada', on_delete=models.SET_NULL, null=True, blank=True,
+                              related_name='pedidos')
+
     class Meta:
         verbose_name = "Pedido/Orden"
         verbose_name_plural = "Pedidos/Ordenes"
         ordering = ['-fecha_creacion']
+        # Índices compuestos para las consultas más frecuentes (listados paginados por (fecha_creacion, id))
+        indexes = [
+            # Historial del minorista: minorista=... ORDER BY -fecha_creacion
+            models.Index(fields=['minorista', 'fecha_creacion', 'id'], name='pedido_minorista_fecha_idx'),
+            # Pedidos del conductor: conductor=... AND estado IN (ASIGNADO, EN_RUTA)
+            models.Index(fields=['conductor', 'estado', 'fecha_creacion'], name='pedido_conductor_estado_idx'),
+            # Bolsa global de pendientes: estado='PENDIENTE' ORDER BY -fecha_creacion
+            models.Index(fields=['estado', 'fecha_creacion', 'id'], name='pedido_estado_fecha_idx'),
+            # Listado del admin: ORDER BY -fecha_creacion, -id
+            models.Index(fields=['fecha_creacion', 'id'], name='pedido_fecha_id_idx'),
+            # Bolsa del conductor, una cubeta por (zona, clase): estado='PENDIENTE' AND zona_origen=... AND clase_carga=...
+            models.Index(fields=['estado', 'zona_origen', 'clase_carga', 'fecha_creacion', 'id'],
+                         name='pedido_bolsa_zona_idx'),
+            # Misma bolsa sin posición conocida del conductor: solo por clase
+            models.Index(fields=['estado', 'clase_carga', 'fecha_creacion', 'id'], name='pedido_bolsa_clase_idx'),
+        ]
 
     def __str__(self):
         return f"Pedido BOCG-{self.id:05d} - {self.get_estado_display()}"
 
+    def save(self, *args, **kwargs):
+        # La localidad de origen solo se recalcula si se guarda el origen
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'origen' in update_fields:
+            # Import diferido: cargar los modelos no debe cargar los servicios de BACKEND
+            from BACKEND.distancias import motor_distancias
+            self.zona_origen = motor_distancias.zona(self.origen)
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {'zona_origen'}
+        super().save(*args, **kwargs)
+
 # ============================================================
 # MODELO DE DETALLE DE PEDIDO (Resuelve ImportError en signals.py)
 # ============================================================
@@ -277,6 +367,10 @@ class Factura(models.Model):
         verbose_name = "Factura"
         verbose_name_plural = "Facturas"
         ordering = ['-fecha_emision']
+        indexes = [
+            # Vencimiento de cartera: estado='PENDIENTE_PAGO' AND fecha_vencimiento < hoy
+            models.Index(fields=['estado', 'fecha_vencimiento'], name='factura_estado_venc_idx'),
+        ]
 
     def __str__(self):
         return f"Factura #{self.id} de BOCG-{self.orden.id:05d}"
@@ -304,6 +398,10 @@ class Envios(models.Model):
     fecha_salida = models.DateTimeField(null=True, blank=True)
     fecha_entrega = models.DateTimeField(null=True, blank=True)
     estado = models.CharField(max_length=20, choices=ESTADOS_ENVIO, default='ASIGNADO')
+    # Última posición conocida: copia del RastreoEnvio más reciente, se actualiza al ingerir puntos
+    ultima_ubicacion = models.CharField(max_length=255, blank=True)
+    ultimo_estado_rastreo = models.CharField(max_length=30, blank=True)
+    ultima_fecha_rastreo = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         verbose_name_plural = "Envios"
@@ -314,13 +412,163 @@ class Envios(models.Model):
 class RastreoEnvio(models.Model):
     envio = models.ForeignKey(Envios, on_delete=models.CASCADE, related_name='rastreos')
     ubicacion = models.CharField(max_length=255)
-    fecha_hora = models.DateTimeField(auto_now_add=True)
+    # Hora en que el dispositivo tomó el punto (los puntos llegan en lotes, después de tomados)
+    fecha_hora = models.DateTimeField(default=timezone.now)
     estado = models.CharField(max_length=30)
     observaciones = models.TextField(blank=True)
 
     class Meta:
         verbose_name_plural = "Rastreo de Envíos"
         ordering = ['fecha_hora']
+        indexes = [
+            # Recorrido de un envío: envio=... ORDER BY fecha_hora
+            models.Index(fields=['envio', 'fecha_hora'], name='rastreo_envio_fecha_idx'),
+        ]
 
     def __str__(self):
         return f"Rastreo {self.estado} para Envío {self.envio.id}"
+
+
+# ============================================================
+# CONTADORES AGREGADOS (Dashboard Admin)
+# ============================================================
+
+class ContadorEstadistica(models.Model):
+    """
+    Conteos precalculados por entidad y estado/tipo, mantenidos por las señales de BACKEND/signals.py.
+    La clave vacía ('') guarda el total de la entidad.
+    """
+    ENTIDADES = (
+        ('PEDIDOS', 'Pedidos'),
+        ('USUARIOS', 'Usuarios'),
+        ('EMPRESAS', 'Empresas'),
+    )
+    entidad = models.CharField(max_length=20, choices=ENTIDADES)
+    clave = models.CharField(max_length=50, blank=True, default='', help_text="Estado o tipo ('' = total)")
+    total = models.BigIntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = "Contadores de Estadísticas"
+        unique_together = ('entidad', 'clave')
+
+    def __str__(self):
+        return f"{self.entidad}[{self.clave or 'TOTAL'}] = {self.total}"
+
+
+# ============================================================
+# EVENTOS DE LA BOLSA DE PEDIDOS (Tablero en vivo del Conductor)
+# ============================================================
+
+TIPOS_EVENTO_BOLSA = (
+    ('CREADO', 'Pedido disponible'),
+    ('TOMADO', 'Pedido tomado'),
+    ('CANCELADO', 'Pedido cancelado'),
+)
+
+class EventoBolsa(models.Model):
+    """
+    Registro de cambios en la bolsa global de pedidos PENDIENTES.
+    El id autoincremental sirve como cursor (Last-Event-ID) para el stream SSE de los conductores.
+    """
+    tipo = models.CharField(max_length=10, choices=TIPOS_EVENTO_BOLSA)
+    pedido_id = models.BigIntegerField()
+    datos = models.JSONField(default=dict, blank=True)
+    fecha = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        verbose_name_plural = "Eventos de la Bolsa"
+        ordering = ['id']
+
+    def __str__(self):
+        return f"Evento {self.id}: {self.tipo} BOCG-{self.pedido_id:05d}"
+
+
+# ============================================================
+# BANDEJA DE SALIDA DE CORREOS (Outbox transaccional)
+# ============================================================
+
+ESTADOS_CORREO = (
+    ('PENDIENTE', 'Pendiente'),
+    ('ENVIADO', 'Enviado'),
+    ('FALLIDO', 'Fallido'),
+)
+
+class EmailOutbox(models.Model):
+    """
+    Correo por enviar, guardado en la misma transacción que el cambio que lo origina.
+    El comando 'enviar_correos' lo despacha en lotes por una sola conexión SMTP.
+    """
+    destinatario = models.EmailField()
+    asunto = models.CharField(max_length=255)
+    cuerpo = models.TextField()
+    estado = models.CharField(max_length=10, choices=ESTADOS_CORREO, default='PENDIENTE')
+    intentos = models.PositiveIntegerField(default=0)
+    proximo_intento = models.DateTimeField(default=timezone.now)
+    ultimo_error = models.TextField(blank=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_envio = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Correo en Cola"
+        verbose_name_plural = "Correos en Cola"
+        indexes = [
+            # Consulta del worker: estado='PENDIENTE' AND proximo_intento <= ahora
+            models.Index(fields=['estado', 'proximo_intento'], name='outbox_estado_proximo_idx'),
+        ]
+
+    def __str__(self):
+        return f"Correo a {self.destinatario} ({self.get_estado_display()})"
+
+
+class TerminoPedido(models.Model):
+    """
+    Índice invertido para la búsqueda de pedidos: una fila por palabra (normalizada, sin tildes)
+    de origen, destino u observaciones. Lo mantienen BACKEND.signals y la importación masiva.
+    """
+    termino = models.CharField(max_length=40)
+    pedido = models.ForeignKey(Pedidos, on_delete=models.CASCADE, related_name='terminos_busqueda')
+    # Relevancia de la palabra en el pedido (las direcciones pesan más que las observaciones)
+    peso = models.PositiveSmallIntegerField(default=1)
+
+    class Meta:
+        verbose_name = "Término de Búsqueda"
+        verbose_name_plural = "Términos de Búsqueda"
+        constraints = [
+            # También es el índice de la búsqueda: termino LIKE 'abc%' recorre solo ese rango
+            models.UniqueConstraint(fields=['termino', 'pedido'], name='termino_pedido_unico'),
+        ]
+
+    def __str__(self):
+        return f"{self.termino} → BOCG-{self.pedido_id:05d}"
+
+
+# ============================================================
+# CARGAS CONSOLIDADAS (varios pedidos en un mismo viaje)
+# ============================================================
+
+class CargaConsolidada(models.Model):
+    """
+    Viaje que lleva juntos varios pedidos del mismo día y mismo origen (mayorista).
+    Lo propone BACKEND.consolidacion con el vehículo más pequeño en que caben; el admin lo aprueba o descarta.
+    """
+    fecha_recoleccion = models.DateField()
+    origen = models.CharField(max_length=255)
+    tipo_vehiculo = models.CharField(max_length=20, choices=TIPO_VEHICULO_CHOICES)
+    peso_total = models.DecimalField(max_digits=10, decimal_places=2, help_text="Peso en Kg")
+    volumen = models.DecimalField(max_digits=10, decimal_places=2, help_text="Volumen en m³")
+    # Porcentaje del espacio de carga del vehículo ocupado por las unidades
+    ocupacion = models.DecimalField(max_digits=5, decimal_places=2)
+    estado = models.CharField(max_length=12, choices=ESTADOS_CARGA, default='PROPUESTA')
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Carga Consolidada"
+        verbose_name_plural = "Cargas Consolidadas"
+        ordering = ['fecha_recoleccion', 'origen', 'id']
+        indexes = [
+            # Pantalla del admin: fecha_recoleccion=... AND estado=...
+            models.Index(fields=['fecha_recoleccion', 'estado'], name='carga_fecha_estado_idx'),
+        ]
+
+    def __str__(self):
+        return f"Carga #{self.id} {self.get_tipo_vehiculo_display()} ({self.get_estado_display()})"
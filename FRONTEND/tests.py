@@ -1,3 +1,296 @@
-from django.test import TestCase
+import csv
+import io
+import re
+from datetime import date, timedelta
+
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from BACKEND.cache_paginas import generacion_paginas, invalidar_cache_paginas
+from BACKEND.exportacion import filas_csv
+from FRONTEND.models import Factura, Pedidos, Usuarios
+
+
+def crear_usuarios_base():
+    """Crea un minorista, un conductor con vehículo completo y un admin."""
+    minorista = Usuarios.objects.create_user('minorista@bogocargo.co', 'clave-123', nombre='Mina', tipo='MINORISTA')
+    conductor = Usuarios.objects.create_user(
+        'conductor@bogocargo.co', 'clave-123', nombre='Carlos', tipo='CONDUCTOR',
+        placas='ABC123', marca_vehiculo='Chevrolet', referencia_vehiculo='NHR', tipo_vehiculo='FURGON',
+    )
+    admin = Usuarios.objects.create_user('admin@bogocargo.co', 'clave-123', nombre='Ana', tipo='ADMIN', is_staff=True)
+    return minorista, conductor, admin
+
+
+def crear_pedidos(minorista, n, conductor=None, estado='PENDIENTE'):
+    """Inserta n pedidos de prueba con bulk_create."""
+    return Pedidos.objects.bulk_create([
+        Pedidos(
+            minorista=minorista, conductor=conductor, estado=estado,
+            tipo_mercancia='SECAS', peso_total=10, volumen=1,
+            origen='Calle 13 # 68-10, Bogotá', destino='Carrera 7 # 72-41, Bogotá',
+            fecha_recoleccion=date.today(), precio_estimado=25000,
+        )
+        for _ in range(n)
+    ])
+
+
+# ============================================================
+# PLANES DE CONSULTA (EXPLAIN) DE LOS LISTADOS DE PEDIDOS
+# ============================================================
+
+class PlanesDeConsultaPedidosTests(TestCase):
+    """Verifica que ninguna consulta de los listados recorra completa la tabla de pedidos."""
+
+    tabla = Pedidos._meta.db_table
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.minorista, cls.conductor, cls.admin = crear_usuarios_base()
+        otros = [
+            Usuarios.objects.create_user(f'minorista{i}@bogocargo.co', 'clave-123', nombre=f'M{i}', tipo='MINORISTA')
+            for i in range(5)
+        ]
+        for i, estado in enumerate(['PENDIENTE', 'ENTREGADO', 'CANCELADO', 'EN_RUTA', 'ENTREGADO']):
+            crear_pedidos(otros[i], 200, conductor=None if estado == 'PENDIENTE' else cls.conductor, estado=estado)
+        crear_pedidos(cls.minorista, 50)
+        crear_pedidos(cls.minorista, 30, conductor=cls.conductor, estado='ASIGNADO')
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE' if connection.vendor != 'mysql' else f'ANALYZE TABLE {cls.tabla}')
+
+    def _full_scans(self, sql):
+        """Devuelve los pasos del plan que recorren la tabla de pedidos sin usar un índice."""
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                pasos = [row[-1] for row in cursor.fetchall()]
+                return [p for p in pasos if p.startswith(f'SCAN {self.tabla}') and 'INDEX' not in p]
+            if connection.vendor == 'mysql':
+                cursor.execute(f'EXPLAIN {sql}')
+                columnas = [col[0] for col in cursor.description]
+                filas = [dict(zip(columnas, row)) for row in cursor.fetchall()]
+                return [f for f in filas if f['table'] == self.tabla and f['type'] == 'ALL']
+            cursor.execute(f'EXPLAIN {sql}')
+            return [row[0] for row in cursor.fetchall() if f'Seq Scan on "{self.tabla}"' in row[0]]
+
+    def assertSinFullScan(self, user, url):
+        self.client.force_login(user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+        consultas = [q['sql'] for q in ctx.captured_queries
+                     if q['sql'].startswith('SELECT') and self.tabla in q['sql']]
+        self.assertTrue(consultas, f'{url} no consultó la tabla de pedidos')
+        for sql in consultas:
+            with self.subTest(url=url, sql=sql):
+                self.assertEqual(self._full_scans(sql), [])
+
+    def test_listar_pedidos_minorista(self):
+        self.assertSinFullScan(self.minorista, reverse('frontend:listar_pedidos'))
+
+    def test_listar_pedidos_conductor_con_bolsa_global(self):
+        self.assertSinFullScan(self.conductor, reverse('frontend:listar_pedidos'))
+
+    def test_listar_pedidos_asignados_al_conductor(self):
+        self.assertSinFullScan(self.conductor, reverse('frontend:listar_pedidos_conductor'))
+
+    def test_dashboard_minorista(self):
+        self.assertSinFullScan(self.minorista, reverse('frontend:dashboard_minorista'))
+
+    def test_dashboard_conductor(self):
+        self.assertSinFullScan(self.conductor, reverse('frontend:dashboard_conductor'))
+
+    def test_pedidos_crud_admin(self):
+        self.assertSinFullScan(self.admin, reverse('frontend:pedidos_crud_admin'))
+
+    def test_pedidos_crud_admin_pagina_profunda(self):
+        self.client.force_login(self.admin)
+        primera = self.client.get(reverse('frontend:pedidos_crud_admin'))
+        self.assertSinFullScan(self.admin, reverse('frontend:pedidos_crud_admin') + primera.context['pedidos'].next_url)
+
+
+# ============================================================
+# PRESUPUESTO DE CONSULTAS (N+1)
+# ============================================================
+
+class PresupuestoConsultasMixin:
+    """
+    Renderiza una vista con pocos y con muchos pedidos sembrados y exige que el
+    número de consultas SQL sea el mismo en ambos casos (sin consultas por fila).
+    """
+
+    n_pocos = 2
+    n_muchos = 20
+
+    def contar_consultas(self, user, url):
+        self.client.force_login(user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        return len(ctx.captured_queries)
+
+    def assertConsultasConstantes(self, user, url, sembrar, maximo=None):
+        """'sembrar(n)' crea n pedidos adicionales; 'url' puede ser un callable evaluado tras sembrar."""
+        sembrar(self.n_pocos)
+        pocos = self.contar_consultas(user, url() if callable(url) else url)
+        sembrar(self.n_muchos - self.n_pocos)
+        muchos = self.contar_consultas(user, url() if callable(url) else url)
+        self.assertEqual(pocos, muchos, f'{url}: {pocos} consultas con {self.n_pocos} pedidos, {muchos} con {self.n_muchos}')
+        if maximo is not None:
+            self.assertLessEqual(muchos, maximo)
+
+
+class PresupuestoConsultasVistasTests(PresupuestoConsultasMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.minorista, cls.conductor, cls.admin = crear_usuarios_base()
+
+    def sembrar_con_factura(self, n, **kwargs):
+        pedidos = crear_pedidos(self.minorista, n, **kwargs)
+        Factura.objects.bulk_create([
+            Factura(orden=p, monto_total=25000, fecha_vencimiento=date.today() + timedelta(days=15))
+            for p in pedidos
+        ])
+        return pedidos
+
+    def sembrar_asignados(self, n):
+        crear_pedidos(self.minorista, n, conductor=self.conductor, estado='ASIGNADO')
+
+    def test_pedidos_crud_admin(self):
+        self.assertConsultasConstantes(self.admin, reverse('frontend:pedidos_crud_admin'), self.sembrar_asignados)
+
+    def test_listar_pedidos_minorista(self):
+        self.assertConsultasConstantes(self.minorista, reverse('frontend:listar_pedidos'), self.sembrar_con_factura)
+
+    def test_busqueda_admin_y_minorista(self):
+        self.assertConsultasConstantes(self.admin, reverse('frontend:pedidos_crud_admin') + '?q=carrera+bogota',
+                                       self.sembrar_asignados)
+        self.assertConsultasConstantes(self.minorista, reverse('frontend:listar_pedidos') + '?q=calle+13',
+                                       self.sembrar_con_factura)
+
+    def test_listar_pedidos_conductor(self):
+        self.assertConsultasConstantes(self.conductor, reverse('frontend:listar_pedidos_conductor'), self.sembrar_asignados)
+
+    def test_dashboard_conductor(self):
+        def sembrar(n):
+            self.sembrar_asignados(n)
+            crear_pedidos(self.minorista, n)
+        self.assertConsultasConstantes(self.conductor, reverse('frontend:dashboard_conductor'), sembrar)
+
+    def test_detalle_pedido(self):
+        url = lambda: reverse('frontend:detalle_pedido', args=[Pedidos.objects.latest('id').pk])
+        self.assertConsultasConstantes(self.minorista, url, self.sembrar_con_factura, maximo=3)
+
+    def test_procesar_pago(self):
+        url = lambda: reverse('frontend:procesar_pago_view', args=[Factura.objects.latest('id').pk])
+        self.assertConsultasConstantes(self.minorista, url, self.sembrar_con_factura, maximo=3)
+
+
+# ============================================================
+# EXPORTACIÓN CSV EN STREAMING
+# ============================================================
+
+class ExportacionPedidosCsvTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.minorista, cls.conductor, cls.admin = crear_usuarios_base()
+        otro = Usuarios.objects.create_user('otro@bogocargo.co', 'clave-123', nombre='Otro', tipo='MINORISTA')
+        cls.pedidos = crear_pedidos(cls.minorista, 15)
+        crear_pedidos(cls.minorista, 3, conductor=cls.conductor, estado='ASIGNADO')
+        crear_pedidos(otro, 4)
+        Factura.objects.create(orden=cls.pedidos[0], monto_total=25000, referencia='F-0001',
+                               fecha_vencimiento=date.today() + timedelta(days=15))
+
+    def descargar(self, **filtros):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('frontend:exportar_pedidos_csv'), filtros)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        filas = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode('utf-8-sig'))))
+        return filas[0], filas[1:]
+
+    def test_exporta_pedidos_con_factura_y_filtros(self):
+        encabezado, filas = self.descargar()
+        self.assertEqual(len(filas), 22)
+        fila = dict(zip(encabezado, next(f for f in filas if f[0] == str(self.pedidos[0].pk))))
+        self.assertEqual((fila['minorista_email'], fila['factura_referencia'], fila['factura_estado']),
+                         ('minorista@bogocargo.co', 'F-0001', 'PENDIENTE_PAGO'))
+
+        _, filas = self.descargar(estado='ASIGNADO', minorista='MINORISTA@bogocargo.co')
+        self.assertEqual([f[2] for f in filas], ['ASIGNADO'] * 3)
+        _, filas = self.descargar(desde=date.today().isoformat(), hasta=date.today().isoformat(), minorista='nadie@x.co')
+        self.assertEqual(filas, [])
+
+    def test_lee_por_bloques_y_valida_filtros(self):
+        with CaptureQueriesContext(connection) as ctx:
+            texto = ''.join(filas_csv(Pedidos.objects.all(), tamano_bloque=5))
+        self.assertEqual(len(ctx.captured_queries), 6)  # 22 pedidos en bloques de 5 + la consulta vacía final
+        self.assertEqual(texto.count('\n'), 23)
+
+        self.client.force_login(self.admin)
+        self.assertEqual(self.client.get(reverse('frontend:exportar_pedidos_csv'), {'desde': 'ayer'}).status_code, 400)
+        self.client.force_login(self.minorista)
+        self.assertEqual(self.client.get(reverse('frontend:exportar_pedidos_csv')).status_code, 302)
+
+
+# ============================================================
+# CACHÉ DE PÁGINAS PÚBLICAS Y FRAGMENTOS
+# ============================================================
+
+class CachePaginasTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.minorista, _, self.admin = crear_usuarios_base()
+
+    def test_pagina_anonima_se_guarda_con_token_csrf_de_cada_visitante(self):
+        url = reverse('frontend:mi_cuenta')
+        with self.assertTemplateUsed('FRONTEND/mi_cuenta.html'):
+            self.client.get(url)
+        visitante = Client(enforce_csrf_checks=True)
+        with self.assertTemplateNotUsed('FRONTEND/mi_cuenta.html'):
+            pagina = visitante.get(url)
+        token = re.search(r'name="csrfmiddlewaretoken" value="([^"]+)"', pagina.content.decode()).group(1)
+        respuesta = visitante.post(reverse('frontend:login'),
+                                   {'email': 'minorista@bogocargo.co', 'password': 'clave-123', 'csrfmiddlewaretoken': token})
+        self.assertRedirects(respuesta, reverse('frontend:dashboard_minorista'), fetch_redirect_response=False)
+
+    def test_no_se_guarda_con_sesion_mensajes_o_parametros(self):
+        url = reverse('frontend:servicios')
+        self.client.get(url)
+        with self.assertTemplateUsed('FRONTEND/servicios.html'):
+            self.client.get(url, {'utm': 'x'})
+        # El error de login se muestra en mi_cuenta: esa visita no sale de la caché
+        self.client.get(reverse('frontend:mi_cuenta'))
+        respuesta = self.client.post(reverse('frontend:login'), {'email': 'nadie@bogocargo.co', 'password': 'x'}, follow=True)
+        self.assertContains(respuesta, 'Credenciales incorrectas')
+        self.client.force_login(self.minorista)
+        with self.assertTemplateUsed('FRONTEND/servicios.html'):
+            self.client.get(url)
+
+    def test_invalidacion_y_desactivacion(self):
+        url = reverse('frontend:index')
+        self.client.get(url)
+        invalidar_cache_paginas()
+        with self.assertTemplateUsed('FRONTEND/index.html'):
+            self.client.get(url)
+        with override_settings(CACHE_PAGINAS_SEGUNDOS=0), self.assertTemplateUsed('FRONTEND/index.html'):
+            self.client.get(url)
+
+    def test_fragmentos_por_rol_y_seccion(self):
+        self.client.force_login(self.admin)
+        self.client.get(reverse('frontend:dashboard_admin'))
+        self.client.get(reverse('frontend:pedidos_crud_admin'))
+        version = generacion_paginas()
+        for seccion in ('dashboard_admin', 'pedidos_crud_admin'):
+            self.assertIsNotNone(cache.get(make_template_fragment_key('navbar_admin', [version, seccion])))
+        # El menú marca la sección activa de cada página
+        respuesta = self.client.get(reverse('frontend:pedidos_crud_admin'))
+        self.assertContains(respuesta, 'font-bold text-white bg-gray-700', count=1)
 
-# Create your tests here.
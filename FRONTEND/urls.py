@@ -13,8 +13,8 @@ urlpatterns = [
     path('mi-cuenta/', views.mi_cuenta_view, name='mi_cuenta'),
     path('login/', views.login_view, name='login'),
     path('register/', views.register_view, name='register'),
-    # CORRECCIÓN: Cambiamos 'logout' por 'logout_view' si ese es el nombre que se usa en las plantillas.
-    path('logout/', views.logout_view, name='logout_view'), 
+    # Las plantillas usan {% url 'frontend:logout' %}
+    path('logout/', views.logout_view, name='logout'), 
 
     # ----------------------------------------------------
     # 2. Recuperación de Contraseña (CORREGIDO)
@@ -89,12 +89,20 @@ urlpatterns = [
     # 4.1 CRUD Administrativo de Pedidos (Admin)
     # ----------------------------------------------------
     path('gestion/pedidos/', views.pedidos_crud_admin, name='pedidos_crud_admin'),
+    path('gestion/pedidos/exportar/', views.exportar_pedidos_csv, name='exportar_pedidos_csv'),
     path('gestion/pedidos/<int:pk>/editar/', views.pedidos_update, name='pedidos_update'),
     path('gestion/pedidos/<int:pk>/eliminar/', views.pedidos_delete, name='pedidos_delete'),
+
+    # ----------------------------------------------------
+    # 4.2 Cargas consolidadas (Admin)
+    # ----------------------------------------------------
+    path('gestion/cargas/', views.cargas_consolidadas, name='cargas_consolidadas'),
+    path('gestion/cargas/<int:pk>/accion/', views.carga_accion, name='carga_accion'),
     
     # ----------------------------------------------------
     # 5. Pagos
     # ----------------------------------------------------
     path('pago/<int:factura_id>/', views.procesar_pago_view, name='procesar_pago_view'),
+    path('facturas/<int:factura_id>/pdf/', views.factura_pdf, name='factura_pdf'),
     path('pago/manejar/<int:factura_id>/', views.manejar_pago_action, name='manejar_pago_action'),
 ]
\ No newline at end of file
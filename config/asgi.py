@@ -3,6 +3,10 @@ ASGI config for config project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Las conexiones de larga duración (stream SSE de la bolsa de pedidos en
+/api/conductor/bolsa/eventos/) requieren servir la app con un servidor ASGI,
+por ejemplo: uvicorn config.asgi:application
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
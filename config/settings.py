@@ -36,6 +36,8 @@ INSTALLED_APPS = [
 # MIDDLEWARE
 # =================================================================
 MIDDLEWARE = [
+    # Primero, para que el tiempo medido incluya la sesión y la autenticación
+    'BACKEND.instrumentacion.InstrumentacionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -45,6 +47,12 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Instrumentación por petición (BACKEND/instrumentacion.py): fracción de peticiones medidas (0 la desactiva)
+# y umbrales de tiempo (ms) y de consultas SQL a partir de los cuales una petición medida va al log
+INSTRUMENTACION_MUESTREO = float(os.getenv('INSTRUMENTACION_MUESTREO', '0.1'))
+INSTRUMENTACION_UMBRAL_MS = int(os.getenv('INSTRUMENTACION_UMBRAL_MS', '1000'))
+INSTRUMENTACION_UMBRAL_CONSULTAS = int(os.getenv('INSTRUMENTACION_UMBRAL_CONSULTAS', '100'))
+
 ROOT_URLCONF = 'config.urls'
 
 # =================================================================
@@ -61,6 +69,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'BACKEND.cache_paginas.fragmentos',
             ],
         },
     },
@@ -86,6 +95,29 @@ DATABASES = {
     }
 }
 
+# =================================================================
+# CACHÉ
+# =================================================================
+# Sin REDIS_URL se usa la memoria de cada proceso. Con varios workers, Redis hace que las páginas
+# y fragmentos guardados, el usuario de sesión y los límites de login sean comunes a todos.
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'bogocargo',
+        }
+    }
+
+# Vigencia de las páginas públicas y fragmentos de la interfaz en caché (BACKEND/cache_paginas.py); 0 la desactiva
+CACHE_PAGINAS_SEGUNDOS = int(os.getenv('CACHE_PAGINAS_SEGUNDOS', '600'))
+
 # =================================================================
 # AUTHENTICATION CONFIG
 # =================================================================
@@ -133,3 +165,6 @@ SESSION_COOKIE_SECURE = not DEBUG
 CSRF_COOKIE_SECURE = not DEBUG
 SECURE_SSL_REDIRECT = not DEBUG
 
+
+# Las pruebas corren sobre http sin importar DEBUG (config/test_runner.py)
+TEST_RUNNER = 'config.test_runner.RunnerPruebas'
@@ -0,0 +1,23 @@
+# config/test_runner.py
+
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class RunnerPruebas(DiscoverRunner):
+    """
+    Las pruebas corren sobre http (Client, LiveServerTestCase): sin esto, con DEBUG=False
+    la redirección a https y las cookies seguras rompen todas las vistas, y el resultado
+    dependería del .env de cada desarrollador.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._sin_https = override_settings(
+            SECURE_SSL_REDIRECT=False, SESSION_COOKIE_SECURE=False, CSRF_COOKIE_SECURE=False,
+        )
+        self._sin_https.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._sin_https.disable()
+        super().teardown_test_environment(**kwargs)